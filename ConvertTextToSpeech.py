@@ -1,18 +1,48 @@
+import importlib.util
 import os
 import sys
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import threading
-import time
-import asyncio
 from datetime import datetime
-import edge_tts
+# 启动时只导入轻量模块；asyncio、edge_tts和转换引擎在第一次合成时才导入
+from tts_core import (SynthesisCache, DEFAULT_CONCURRENCY, DEFAULT_VOICE, DEFAULT_VOICE_NAME,
+                      MAX_CONCURRENCY)
+from tts_core.events import EventChannel
+from tts_core.logsink import LogSink, level_prefix
+from tts_core.postprocess import (DEFAULT_FORMAT, DEFAULT_LOUDNESS, MAX_PARAGRAPH_GAP,
+                                  OUTPUT_FORMATS, find_ffmpeg, format_extension,
+                                  needs_transcoding, parse_bitrate)
+from tts_core.subtitles import FORMATTERS as SUBTITLE_FORMATS
+from tts_core.voices import (catalog_path, fetch_catalog, load_catalog, save_catalog,
+                             set_catalog)
+
+# 日志级别对应的显示颜色
+LOG_COLORS = {
+    "ERROR": "#ff4444",
+    "WARNING": "#ffaa00",
+    "SUCCESS": "#44aa44",
+    "INFO": "#333333",
+}
+
+# 界面事件处理间隔（毫秒）
+UI_TICK_MS = 100
+
+# 窗口显示后多久再在后台更新过期的语音列表（毫秒）
+CATALOG_REFRESH_DELAY_MS = 3000
+
+# 码率下拉框中的选项，"默认"表示使用该格式的默认码率
+DEFAULT_BITRATE_LABEL = "默认"
+BITRATE_CHOICES = [DEFAULT_BITRATE_LABEL, "16k", "24k", "32k", "48k", "64k", "96k", "128k"]
+
+# 运行所需的第三方包
+REQUIRED_PACKAGES = ['edge-tts']
 
 class TextToAudioConverterGUI:
     def __init__(self):
         self.root = tk.Tk()
         self.root.title("文本转音频工具 v1.0")
-        self.root.geometry("850x650")  # 稍微增加宽度以容纳语音选择
+        self.root.geometry("850x820")  # 稍微增加宽度以容纳语音选择
         self.root.resizable(True, True)
         
         # 设置图标和样式
@@ -22,32 +52,60 @@ class TextToAudioConverterGUI:
         self.log_file_path = self.get_dated_log_file()  # 按日期命名的日志文件
         self.init_log_file()  # 初始化日志文件
         
+        # 日志先入队：文件由后台线程批量写入
+        self.log_sink = LogSink(self.log_file_path)
+        
+        # 工作线程只向通道投递事件，Tk主线程定时取出并更新界面
+        self.ui_events = EventChannel()
+        
+        # 合成结果缓存
+        self.cache = self.init_cache()
+        
+        # 所有转换和语音测试共用的常驻事件循环与合成后端，第一次合成时才创建
+        self._loop_thread = None
+        self._backend = None
+        self._runtime_lock = threading.Lock()
+        
         # 语音配置
         self.setup_voice_config()
         
         # 创建主界面
         self.create_widgets()
+        self.root.after(UI_TICK_MS, self.process_ui_events)
+        
+        # 语音列表快照过期时，窗口显示后再在后台更新，不影响启动速度
+        self.root.after(CATALOG_REFRESH_DELAY_MS, self.refresh_voice_catalog)
         
         # 状态变量
         self.is_processing = False
         self.input_files = []  # 改为支持多个文件
         self.output_dir = ""
-        
-        # 语言到文件后缀的映射
-        self.language_suffix_map = {
-            "zh-CN": "Chinese",
-            "en-US": "English",
-            "ja-JP": "Japanese",
-            "ko-KR": "Korean",
-            "fr-FR": "French",
-            "de-DE": "German",
-            "es-ES": "Spanish",
-            "ru-RU": "Russian"
-        }
+        # 本次转换的后处理设置 (目标响度, 段落停顿)，开始转换时读取并校验
+        self.postprocess_options = (None, 0.0)
+        # 本次转换的输出格式和码率 (格式, 码率或None)
+        self.format_options = (DEFAULT_FORMAT, None)
         
         # 日志文本
         self.log_content = ""
         
+    @property
+    def loop_thread(self):
+        """常驻事件循环线程（第一次使用时创建）"""
+        with self._runtime_lock:
+            if self._loop_thread is None:
+                from tts_core.loop import LoopThread
+                self._loop_thread = LoopThread()
+            return self._loop_thread
+    
+    @property
+    def backend(self):
+        """Edge-TTS合成后端（第一次使用时创建，合成时才导入edge_tts）"""
+        with self._runtime_lock:
+            if self._backend is None:
+                from tts_core.backends import EdgeTTSBackend
+                self._backend = EdgeTTSBackend()
+            return self._backend
+    
     def setup_style(self):
         """设置界面样式"""
         style = ttk.Style()
@@ -62,63 +120,16 @@ class TextToAudioConverterGUI:
     
     def setup_voice_config(self):
         """设置语音配置"""
-        # 可用的语音列表 - Edge-TTS支持的神经语音
-        self.voice_options = {
-            # 中文语音
-            "晓晓 (年轻女声-推荐)": "zh-CN-XiaoxiaoNeural",
-            "云希 (年轻男声)": "zh-CN-YunxiNeural",
-            "云扬 (新闻男声)": "zh-CN-YunyangNeural",
-            "晓萱 (成熟女声)": "zh-CN-XiaoxuanNeural",
-            "晓梦 (情感女声)": "zh-CN-XiaomengNeural",
-            "晓颜 (聊天女声)": "zh-CN-XiaoruiNeural",
-            
-            # 英文语音
-            "Jenny (美式英文-女)": "en-US-JennyNeural",
-            "Guy (美式英文-男)": "en-US-GuyNeural",
-            "Aria (美式英文-女)": "en-US-AriaNeural",
-            "Davis (美式英文-男)": "en-US-DavisNeural",
-            "Amber (美式英文-女)": "en-US-AmberNeural",
-            "Ana (美式英文-女童)": "en-US-AnaNeural",
-            
-            # 日文语音
-            "Nanami (日文-女)": "ja-JP-NanamiNeural",
-            "Keita (日文-男)": "ja-JP-KeitaNeural",
-            "Aoi (日文-女)": "ja-JP-AoiNeural",
-            
-            # 其他语言
-            "法语-女声": "fr-FR-DeniseNeural",
-            "德语-女声": "de-DE-KatjaNeural",
-            "西班牙语-女声": "es-ES-ElviraNeural",
-            "韩语-女声": "ko-KR-SunHiNeural",
-            "俄语-女声": "ru-RU-SvetlanaNeural",
-        }
-        
-        # 语音到语言的映射
-        self.voice_to_language = {
-            "zh-CN-XiaoxiaoNeural": "zh-CN",
-            "zh-CN-YunxiNeural": "zh-CN",
-            "zh-CN-YunyangNeural": "zh-CN",
-            "zh-CN-XiaoxuanNeural": "zh-CN",
-            "zh-CN-XiaomengNeural": "zh-CN",
-            "zh-CN-XiaoruiNeural": "zh-CN",
-            "en-US-JennyNeural": "en-US",
-            "en-US-GuyNeural": "en-US",
-            "en-US-AriaNeural": "en-US",
-            "en-US-DavisNeural": "en-US",
-            "en-US-AmberNeural": "en-US",
-            "en-US-AnaNeural": "en-US",
-            "ja-JP-NanamiNeural": "ja-JP",
-            "ja-JP-KeitaNeural": "ja-JP",
-            "ja-JP-AoiNeural": "ja-JP",
-            "fr-FR-DeniseNeural": "fr-FR",
-            "de-DE-KatjaNeural": "de-DE",
-            "es-ES-ElviraNeural": "es-ES",
-            "ko-KR-SunHiNeural": "ko-KR",
-            "ru-RU-SvetlanaNeural": "ru-RU",
-        }
+        # 可用的语音列表 - 启动时只读本地快照（没有则用内置列表），不联网
+        self.voice_catalog_path = catalog_path(self.cache.cache_dir if self.cache else None)
+        self.voice_catalog = load_catalog(os.path.dirname(self.voice_catalog_path), offline=True)
+        self.voice_options = dict(self.voice_catalog.options)
         
         # 默认语音
-        self.selected_voice = tk.StringVar(value="zh-CN-XiaoxiaoNeural")
+        self.selected_voice = tk.StringVar(value=DEFAULT_VOICE)
+        
+        # 额外生成的语音（显示名称），同一文件只读取和分段一次
+        self.extra_voice_names = []
     
     def get_dated_log_file(self):
         """获取按日期命名的日志文件路径"""
@@ -158,6 +169,14 @@ class TextToAudioConverterGUI:
             except Exception as e2:
                 print(f"创建备用日志文件失败: {e2}")
     
+    def init_cache(self):
+        """初始化合成缓存，失败时不使用缓存"""
+        try:
+            return SynthesisCache()
+        except Exception as e:
+            print(f"初始化缓存失败: {e}")
+            return None
+    
     def create_widgets(self):
         """创建界面组件"""
         
@@ -244,7 +263,7 @@ class TextToAudioConverterGUI:
         
         # 在 create_widgets 方法中找到命名规则标签部分
         self.naming_rule_label = tk.Label(naming_frame, 
-                                 text="[原文件名]_[英文语音名].mp3",  # 修改这里
+                                 text=self.naming_rule_text(DEFAULT_FORMAT),
                                  font=("微软雅黑", 9, "italic"), 
                                  bg=self.bg_color, fg="#4CAF50")
         
@@ -277,7 +296,16 @@ class TextToAudioConverterGUI:
         self.voice_combobox['values'] = voice_display_names
         
         # 设置默认值
-        self.voice_combobox.set("晓晓 (年轻女声-推荐)")
+        self.voice_combobox.set(DEFAULT_VOICE_NAME)
+        
+        ttk.Button(voice_select_frame, text="多语音...", 
+                  command=self.choose_extra_voices,
+                  width=10).pack(side="left", padx=5)
+        
+        self.extra_voice_label = tk.Label(voice_frame, text="", 
+                                         font=("微软雅黑", 9), 
+                                         bg=self.bg_color, fg="#666666", anchor="w")
+        self.extra_voice_label.pack(fill="x")
         
         # 语速设置
         speed_frame = tk.Frame(voice_frame, bg=self.bg_color)
@@ -311,6 +339,118 @@ class TextToAudioConverterGUI:
                           value=value, bg=self.bg_color, 
                           font=("微软雅黑", 9)).pack(side="left", padx=10)
         
+        # 并发设置
+        concurrency_frame = tk.Frame(voice_frame, bg=self.bg_color)
+        concurrency_frame.pack(fill="x", pady=5)
+        
+        tk.Label(concurrency_frame, text="并发数:", 
+                font=("微软雅黑", 10), 
+                bg=self.bg_color, width=10, anchor="w").pack(side="left")
+        
+        self.concurrency_var = tk.IntVar(value=DEFAULT_CONCURRENCY)
+        ttk.Spinbox(concurrency_frame, from_=1, to=MAX_CONCURRENCY, 
+                   textvariable=self.concurrency_var, 
+                   width=5, state="readonly").pack(side="left", padx=10)
+        
+        tk.Label(concurrency_frame, text="同时转换的文件数量", 
+                font=("微软雅黑", 9), 
+                bg=self.bg_color, fg="#666666").pack(side="left")
+        
+        # 输出设置区域
+        output_options_frame = tk.LabelFrame(self.root, text=" 输出设置 ", 
+                                            font=("微软雅黑", 11, "bold"),
+                                            bg=self.bg_color, padx=20, pady=10)
+        output_options_frame.pack(pady=(0, 10), padx=20, fill="x")
+        
+        # 输出格式与码率：非MP3格式由合成的MP3转码得到（需要ffmpeg）
+        format_frame = tk.Frame(output_options_frame, bg=self.bg_color)
+        format_frame.pack(fill="x", pady=2)
+        
+        tk.Label(format_frame, text="输出格式:", 
+                font=("微软雅黑", 10), 
+                bg=self.bg_color, width=10, anchor="w").pack(side="left")
+        
+        self.format_var = tk.StringVar(value=DEFAULT_FORMAT)
+        format_combobox = ttk.Combobox(format_frame, 
+                                      textvariable=self.format_var,
+                                      values=sorted(OUTPUT_FORMATS),
+                                      font=("微软雅黑", 10),
+                                      width=8,
+                                      state="readonly")
+        format_combobox.pack(side="left", padx=10)
+        format_combobox.bind("<<ComboboxSelected>>", self.on_format_selected)
+        
+        tk.Label(format_frame, text="码率:", 
+                font=("微软雅黑", 9), 
+                bg=self.bg_color).pack(side="left", padx=(20, 0))
+        
+        self.bitrate_var = tk.StringVar(value=DEFAULT_BITRATE_LABEL)
+        ttk.Combobox(format_frame, 
+                    textvariable=self.bitrate_var,
+                    values=BITRATE_CHOICES,
+                    font=("微软雅黑", 10),
+                    width=8).pack(side="left", padx=5)
+        
+        tk.Label(format_frame, text="默认为48kbps MP3，其他格式或码率需要ffmpeg", 
+                font=("微软雅黑", 9), 
+                bg=self.bg_color, fg="#666666").pack(side="left")
+        
+        # 字幕设置：合成时收集逐词时间，在每个音频文件旁边写出同名字幕
+        subtitle_frame = tk.Frame(output_options_frame, bg=self.bg_color)
+        subtitle_frame.pack(fill="x", pady=2)
+        
+        tk.Label(subtitle_frame, text="字幕:", 
+                font=("微软雅黑", 10), 
+                bg=self.bg_color, width=10, anchor="w").pack(side="left")
+        
+        self.subtitle_vars = {}
+        for subtitle_format in SUBTITLE_FORMATS:
+            self.subtitle_vars[subtitle_format] = tk.BooleanVar(value=False)
+            tk.Checkbutton(subtitle_frame, text=subtitle_format.upper(), 
+                          variable=self.subtitle_vars[subtitle_format], 
+                          bg=self.bg_color, 
+                          font=("微软雅黑", 9)).pack(side="left", padx=10)
+        
+        tk.Label(subtitle_frame, text="在音频旁边写出同名字幕文件", 
+                font=("微软雅黑", 9), 
+                bg=self.bg_color, fg="#666666").pack(side="left")
+        
+        # 后处理设置：响度归一化和段落停顿（需要ffmpeg）
+        postprocess_frame = tk.Frame(output_options_frame, bg=self.bg_color)
+        postprocess_frame.pack(fill="x", pady=2)
+        
+        tk.Label(postprocess_frame, text="后处理:", 
+                font=("微软雅黑", 10), 
+                bg=self.bg_color, width=10, anchor="w").pack(side="left")
+        
+        self.loudness_enabled_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(postprocess_frame, text="响度归一化到", 
+                      variable=self.loudness_enabled_var, 
+                      bg=self.bg_color, 
+                      font=("微软雅黑", 9)).pack(side="left", padx=(10, 0))
+        
+        self.loudness_var = tk.StringVar(value=f"{DEFAULT_LOUDNESS:g}")
+        ttk.Spinbox(postprocess_frame, from_=-40, to=-5, increment=1, 
+                   textvariable=self.loudness_var, 
+                   width=5).pack(side="left", padx=5)
+        
+        tk.Label(postprocess_frame, text="LUFS", 
+                font=("微软雅黑", 9), 
+                bg=self.bg_color).pack(side="left")
+        
+        tk.Label(postprocess_frame, text="段落停顿:", 
+                font=("微软雅黑", 9), 
+                bg=self.bg_color).pack(side="left", padx=(20, 0))
+        
+        self.paragraph_gap_var = tk.StringVar(value="0")
+        ttk.Spinbox(postprocess_frame, from_=0, to=MAX_PARAGRAPH_GAP, increment=0.1, 
+                   textvariable=self.paragraph_gap_var, 
+                   width=5).pack(side="left", padx=5)
+        
+        tk.Label(postprocess_frame, text="秒（需要ffmpeg）", 
+                font=("微软雅黑", 9), 
+                bg=self.bg_color, fg="#666666").pack(side="left")
+        
         # 控制按钮区域
         button_frame = tk.Frame(self.root, bg=self.bg_color)
         button_frame.pack(pady=20)
@@ -394,6 +534,10 @@ class TextToAudioConverterGUI:
                                wrap="word", height=10)
         self.log_text.pack(side="left", fill="both", expand=True)
         
+        # 为不同级别的日志设置颜色
+        for level, color in LOG_COLORS.items():
+            self.log_text.tag_config(level, foreground=color)
+        
         scrollbar.config(command=self.log_text.yview)
         
         # 默认输出路径
@@ -404,62 +548,104 @@ class TextToAudioConverterGUI:
         style = ttk.Style()
         style.configure("Accent.TButton", foreground="white", background="#4CAF50")
         
-    def get_output_filename(self, input_file):
-        """根据规则生成输出文件名"""
-        # 获取原文件名（不含扩展名）
-        base_name = os.path.splitext(os.path.basename(input_file))[0]
+    def choose_extra_voices(self):
+        """选择额外的语音，每个文件为每个语音各生成一个MP3"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("选择额外的语音")
+        dialog.transient(self.root)
+        dialog.grab_set()
+        
+        tk.Label(dialog, text="除当前选择的语音外，还为每个文件生成以下语音（可多选）:", 
+                font=("微软雅黑", 10)).pack(padx=10, pady=(10, 5), anchor="w")
+        
+        listbox = tk.Listbox(dialog, selectmode=tk.MULTIPLE, height=15, width=45, 
+                            font=("微软雅黑", 10), exportselection=False)
+        listbox.pack(padx=10, fill="both", expand=True)
+        for index, name in enumerate(self.voice_options):
+            listbox.insert(tk.END, name)
+            if name in self.extra_voice_names:
+                listbox.selection_set(index)
+        
+        def apply_selection():
+            names = list(self.voice_options)
+            self.extra_voice_names = [names[index] for index in listbox.curselection()]
+            if self.extra_voice_names:
+                self.extra_voice_label.config(text="另外生成: " + "、".join(
+                    name.split(" ")[0] for name in self.extra_voice_names))
+            else:
+                self.extra_voice_label.config(text="")
+            dialog.destroy()
+        
+        button_row = tk.Frame(dialog)
+        button_row.pack(pady=10)
+        ttk.Button(button_row, text="确定", command=apply_selection, width=10).pack(side="left", padx=5)
+        ttk.Button(button_row, text="清空", 
+                  command=lambda: listbox.selection_clear(0, tk.END), width=10).pack(side="left", padx=5)
     
-        # 获取选中的语音ID
-        voice_display_name = self.voice_combobox.get()
-        voice_id = self.voice_options.get(voice_display_name, "")
+    def refresh_voice_catalog(self):
+        """快照不存在或已过期时，在后台线程的事件循环中获取在线语音列表"""
+        if not self.voice_catalog.is_stale():
+            return
+        future = self.loop_thread.submit(fetch_catalog())
+        
+        def on_done(future):
+            try:
+                catalog = future.result()
+            except Exception as e:
+                self.log(f"获取在线语音列表失败，继续使用{len(self.voice_catalog)}个已知语音: {e}",
+                         "WARNING")
+                return
+            save_catalog(catalog, self.voice_catalog_path, self.log)
+            self.ui_events.call(self.apply_voice_catalog, catalog)
+        
+        future.add_done_callback(on_done)
     
-        # 语音后缀映射表
-        voice_suffix_map = {
-            "zh-CN-XiaoxiaoNeural": "Xiaoxiao",
-            "zh-CN-YunxiNeural": "Yunxi",
-            "zh-CN-YunyangNeural": "Yunyang",
-            "zh-CN-XiaoxuanNeural": "Xiaoxuan",
-            "zh-CN-XiaomengNeural": "Xiaomeng",
-            "zh-CN-XiaoruiNeural": "Xiaorui",
-            "en-US-JennyNeural": "Jenny",
-            "en-US-GuyNeural": "Guy",
-            "en-US-AriaNeural": "Aria",
-            "en-US-DavisNeural": "Davis",
-            "en-US-AmberNeural": "Amber",
-            "en-US-AnaNeural": "Ana",
-            "ja-JP-NanamiNeural": "Nanami",
-            "ja-JP-KeitaNeural": "Keita",
-            "ja-JP-AoiNeural": "Aoi",
-            "fr-FR-DeniseNeural": "Denise",
-            "de-DE-KatjaNeural": "Katja",
-            "es-ES-ElviraNeural": "Elvira",
-            "ko-KR-SunHiNeural": "SunHi",
-            "ru-RU-SvetlanaNeural": "Svetlana",
-        }
+    def apply_voice_catalog(self, catalog):
+        """用新的语音目录更新下拉框（界面线程中调用）"""
+        set_catalog(catalog)
+        self.voice_catalog = catalog
+        self.voice_options = dict(catalog.options)
+        self.voice_combobox['values'] = list(self.voice_options.keys())
+        self.log(f"语音列表已更新: {len(self.voice_options)} 种")
     
-        # 获取英文后缀
-        if voice_id in voice_suffix_map:
-            voice_suffix = voice_suffix_map[voice_id]
-        else:
-            # 如果不在映射表中，尝试从ID提取
-            if voice_id and "-" in voice_id:
-                parts = voice_id.split("-")
-                if len(parts) >= 3:
-                    name = parts[-1]
-                    # 去掉"Neural"后缀
-                    if name.endswith("Neural"):
-                        voice_suffix = name[:-6]
-                    else:
-                        voice_suffix = name
-                else:
-                    voice_suffix = voice_id
-            else:
-                voice_suffix = "Unknown"
+    def get_selected_voice_ids(self):
+        """当前语音加额外语音的ID列表（去重，保持顺序）"""
+        names = [self.voice_combobox.get()] + self.extra_voice_names
+        voice_ids = [self.voice_options.get(name) for name in names]
+        return list(dict.fromkeys(voice_id for voice_id in voice_ids if voice_id))
+    
+    def get_subtitle_formats(self):
+        """勾选的字幕格式列表"""
+        return [subtitle_format for subtitle_format, var in self.subtitle_vars.items() if var.get()]
     
-        # 生成文件名
-        filename = f"{base_name}_{voice_suffix}.mp3"
+    def get_postprocess_options(self):
+        """读取后处理设置，返回 (目标响度或None, 段落停顿秒数)；数值无效时抛出ValueError"""
+        loudness = None
+        if self.loudness_enabled_var.get():
+            loudness = float(self.loudness_var.get())
+            if not -70 <= loudness <= 0:
+                raise ValueError(f"目标响度应在 -70 到 0 LUFS 之间: {loudness:g}")
+        paragraph_gap = float(self.paragraph_gap_var.get() or 0)
+        if not 0 <= paragraph_gap <= MAX_PARAGRAPH_GAP:
+            raise ValueError(f"段落停顿应在 0 到 {MAX_PARAGRAPH_GAP:g} 秒之间: {paragraph_gap:g}")
+        return loudness, paragraph_gap
     
-        return filename
+    def naming_rule_text(self, output_format):
+        """输出命名规则提示"""
+        return f"[原文件名]_[英文语音名].{format_extension(output_format)}"
+    
+    def on_format_selected(self, event=None):
+        """切换输出格式时更新命名规则提示"""
+        self.naming_rule_label.config(text=self.naming_rule_text(self.format_var.get()))
+    
+    def get_format_options(self):
+        """读取输出格式设置，返回 (格式, 码率或None)；码率无效时抛出ValueError"""
+        output_format = self.format_var.get() or DEFAULT_FORMAT
+        value = self.bitrate_var.get().strip()
+        # wav为无损PCM，不使用码率
+        if value in ("", DEFAULT_BITRATE_LABEL) or OUTPUT_FORMATS[output_format]["bitrate"] is None:
+            return output_format, None
+        return output_format, parse_bitrate(value)
     
     def browse_input_files(self):
         """浏览多个输入文件"""
@@ -522,57 +708,55 @@ class TextToAudioConverterGUI:
             self.log(f"设置输出目录: {dir_path}")
     
     def log(self, message, level="INFO"):
-        """添加日志消息并保存到文件"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        
-        # 确定日志级别
-        if level == "ERROR":
-            color = "#ff4444"
-            prefix = "[错误]"
-        elif level == "WARNING":
-            color = "#ffaa00"
-            prefix = "[警告]"
-        elif level == "SUCCESS":
-            color = "#44aa44"
-            prefix = "[成功]"
-        else:
-            color = "#333333"
-            prefix = "[信息]"
-        
-        # 文件日志消息
-        file_log_message = f"{timestamp} {prefix} {message}"
-        
-        # GUI显示消息
-        gui_log_message = f"{timestamp} {prefix} {message}\n"
-        
-        # 1. 写入日志文件
-        try:
-            with open(self.log_file_path, 'a', encoding='utf-8') as f:
-                f.write(file_log_message + "\n")
-        except Exception as e:
-            # 如果写入失败，尝试在控制台输出
-            print(f"写入日志文件失败: {e}")
-            print(f"原日志内容: {file_log_message}")
-        
-        # 2. 显示在GUI文本框
-        self.log_text.insert(tk.END, gui_log_message)
-        
-        # 为不同级别的日志设置颜色
-        start_index = self.log_text.search(prefix, "end-2l linestart", stopindex="end")
-        if start_index:
-            end_index = f"{start_index}+{len(prefix)}c"
-            self.log_text.tag_add(level, start_index, end_index)
-            self.log_text.tag_config(level, foreground=color)
-        
-        # 滚动到底部
-        self.log_text.see(tk.END)
+        """添加日志消息并保存到文件
+
+        可以在任意线程中调用：只把消息放入队列，不直接操作文件和界面。
+        """
+        # 1. 写入日志文件（后台线程批量写入）
+        self.log_sink.write(message, level)
         
+        # 2. 交给Tk主线程显示在GUI文本框
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        self.ui_events.append("log", (timestamp, level, message))
+    
+    def process_ui_events(self):
+        """在Tk主线程中处理工作线程投递的界面事件"""
+        latest, ordered = self.ui_events.drain()
+        
+        insert_args = []
+        calls = []
+        status_message = None
+        for kind, payload in ordered:
+            if kind == "log":
+                timestamp, level, message = payload
+                tag = level if level in LOG_COLORS else "INFO"
+                insert_args += [f"{timestamp} ", (), level_prefix(level), (tag,), f" {message}\n", ()]
+                if level != "INFO":
+                    status_message = message
+            elif kind == "call":
+                calls.append(payload)
+        
+        if insert_args:
+            self.log_text.insert(tk.END, *insert_args)
+            # 滚动到底部
+            self.log_text.see(tk.END)
+        
+        # 进度事件只处理最新的一次
+        if "progress" in latest:
+            value, status_message = latest["progress"]
+            self.progress_var.set(value)
+        if "progress_info" in latest:
+            self.progress_info.config(text=latest["progress_info"])
         # 更新状态标签
-        if level != "INFO":
-            self.status_label.config(text=message)
-        
-        # 强制刷新界面
-        self.root.update_idletasks()
+        if status_message is not None:
+            self.status_label.config(text=status_message)
+        if "finish" in latest:
+            self.show_finish_state(latest["finish"])
+        
+        # 最后执行回调（可能弹出对话框），确保界面已显示最新状态
+        self.root.after(UI_TICK_MS, self.process_ui_events)
+        for func, args in calls:
+            func(*args)
     
     def clear_log(self):
         """清除日志"""
@@ -628,8 +812,8 @@ class TextToAudioConverterGUI:
         
         self.log(f"开始测试语音: {voice_display_name}")
         
-        # 在新线程中运行测试
-        threading.Thread(target=self.run_voice_test, args=(voice_id, test_text), daemon=True).start()
+        # 提交到常驻事件循环中运行，不阻塞界面
+        self.run_voice_test(voice_id, test_text)
     
     async def async_test_voice(self, voice_id, test_text):
         """异步测试语音"""
@@ -637,16 +821,18 @@ class TextToAudioConverterGUI:
             # 创建临时文件
             temp_file = os.path.join(os.getcwd(), "voice_test_temp.mp3")
             
-            # 使用Edge-TTS生成语音
-            communicate = edge_tts.Communicate(
+            # 使用Edge-TTS生成语音（相同设置下直接使用缓存）
+            from tts_core.engine import BatchEngine
+            engine = BatchEngine(concurrency=1, cache=self.cache, backend=self.backend,
+                                 log=self.log)
+            await engine.synthesize_cached(
                 test_text,
-                voice=voice_id,
+                temp_file,
+                voice_id,
                 rate=self.speed_var.get(),
                 volume=self.volume_var.get()
             )
             
-            await communicate.save(temp_file)
-            
             # 播放音频文件
             if os.path.exists(temp_file):
                 # 根据操作系统播放音频
@@ -660,7 +846,7 @@ class TextToAudioConverterGUI:
                 self.log(f"语音测试完成，正在播放: {voice_id}")
                 
                 # 5秒后删除临时文件
-                self.root.after(5000, lambda: self.cleanup_test_file(temp_file))
+                self.ui_events.call(self.root.after, 5000, lambda: self.cleanup_test_file(temp_file))
             else:
                 self.log("测试文件生成失败", "ERROR")
                 
@@ -670,10 +856,7 @@ class TextToAudioConverterGUI:
     def run_voice_test(self, voice_id, test_text):
         """运行语音测试"""
         try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(self.async_test_voice(voice_id, test_text))
-            loop.close()
+            self.loop_thread.submit(self.async_test_voice(voice_id, test_text))
         except Exception as e:
             self.log(f"语音测试运行时错误: {str(e)}", "ERROR")
     
@@ -702,6 +885,27 @@ class TextToAudioConverterGUI:
             messagebox.showerror("错误", "请设置输出目录！")
             return
         
+        # 后处理需要ffmpeg，转换开始前检查
+        try:
+            self.postprocess_options = self.get_postprocess_options()
+        except ValueError as e:
+            messagebox.showerror("错误", f"后处理设置无效：\n{str(e)}")
+            return
+        loudness, paragraph_gap = self.postprocess_options
+        if (loudness is not None or paragraph_gap) and find_ffmpeg() is None:
+            messagebox.showerror("错误", "响度归一化和段落停顿需要ffmpeg，请先安装并加入PATH！")
+            return
+        try:
+            self.format_options = self.get_format_options()
+        except ValueError as e:
+            messagebox.showerror("错误", f"码率设置无效：\n{str(e)}")
+            return
+        output_format, bitrate = self.format_options
+        if needs_transcoding(output_format, bitrate, self.backend.output_format) \
+                and find_ffmpeg() is None:
+            messagebox.showerror("错误", f"输出格式 {output_format} 需要ffmpeg，请先安装并加入PATH！")
+            return
+        
         # 检查输出目录是否存在，不存在则创建
         if not os.path.exists(self.output_dir):
             try:
@@ -723,40 +927,65 @@ class TextToAudioConverterGUI:
         try:
             total_files = len(self.input_files)
             voice_display_name = self.voice_combobox.get()
-            voice_id = self.voice_options.get(voice_display_name)
+            voice_ids = self.get_selected_voice_ids()
+            if len(voice_ids) > 1:
+                voice_display_name = "、".join(
+                    [voice_display_name] + [name for name in self.extra_voice_names
+                                            if name != voice_display_name])
+            
+            try:
+                concurrency = int(self.concurrency_var.get())
+            except (tk.TclError, ValueError):
+                concurrency = DEFAULT_CONCURRENCY
+            
+            subtitles = self.get_subtitle_formats()
+            loudness, paragraph_gap = self.postprocess_options
+            output_format, bitrate = self.format_options
+            
+            from tts_core.converter import TextToSpeechConverter
+            converter = TextToSpeechConverter(
+                self.output_dir,
+                voice_ids=voice_ids,
+                rate=self.speed_var.get(),
+                volume=self.volume_var.get(),
+                concurrency=concurrency,
+                cache=self.cache,
+                backend=self.backend,
+                subtitles=subtitles,
+                loudness=loudness,
+                paragraph_gap=paragraph_gap,
+                output_format=output_format,
+                bitrate=bitrate,
+                log=self.log,
+                progress=self.update_progress,
+                progress_info=self.update_progress_info,
+            )
+            if self.cache is not None:
+                self.cache.reset_stats()
             
             self.log("=" * 60)
             self.log(f"开始批量转换，共 {total_files} 个文件")
             self.log(f"输出目录: {self.output_dir}")
             self.log(f"选择语音: {voice_display_name}")
-            self.log(f"语音ID: {voice_id}")
+            self.log(f"语音ID: {', '.join(voice_ids)}")
             self.log(f"语速: {self.speed_var.get()}")
             self.log(f"音量: {self.volume_var.get()}")
+            self.log(f"并发数: {converter.engine.concurrency}")
+            self.log(f"输出格式: {output_format}" + (f" {bitrate}k" if bitrate else ""))
+            if subtitles:
+                self.log(f"字幕: {', '.join(subtitles)}")
+            if loudness is not None:
+                self.log(f"响度归一化: {loudness:g} LUFS")
+            if paragraph_gap:
+                self.log(f"段落停顿: {paragraph_gap:g} 秒")
             
-            success_count = 0
-            fail_count = 0
+            # 在常驻事件循环中执行，由引擎的工作池并发处理所有文件
+            results = converter.run_batch(self.input_files,
+                                          should_continue=lambda: self.is_processing,
+                                          loop_thread=self.loop_thread)
             
-            for i, input_file in enumerate(self.input_files):
-                if not self.is_processing:  # 用户可能中途取消
-                    break
-                    
-                self.log(f"正在处理文件 {i+1}/{total_files}: {os.path.basename(input_file)}")
-                self.update_progress_info(f"正在处理文件 {i+1}/{total_files}: {os.path.basename(input_file)}")
-                
-                # 更新总体进度
-                progress = (i / total_files) * 100
-                self.update_progress(progress, f"处理文件 {i+1}/{total_files}")
-                
-                # 处理单个文件
-                success = self.convert_single_file(input_file, voice_id)
-                
-                if success:
-                    success_count += 1
-                else:
-                    fail_count += 1
-                
-                # 短暂暂停，避免请求过快
-                time.sleep(0.5)
+            success_count = results.count(True)
+            fail_count = results.count(False)
             
             # 完成所有文件
             self.update_progress(100, "批量转换完成")
@@ -767,13 +996,18 @@ class TextToAudioConverterGUI:
             self.log(f"📁 输出目录: {self.output_dir}")
             self.log(f"🎙️ 使用语音: {voice_display_name}")
             self.log(f"⏰ 完成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+            self.log(f"🔁 合成请求: {converter.engine.synthesis_count} 次")
+            self.log(f"🚦 限流: {converter.engine.limiter.summary()}")
+            self.log(f"⏱️ 耗时: {converter.metrics.summary()}")
+            if self.cache is not None:
+                self.log(f"💾 缓存: {self.cache.summary()}")
             self.log("=" * 60)
             
             # 记录转换摘要
             self.log_batch_summary(total_files, success_count, fail_count, voice_display_name)
             
             # 询问是否打开输出目录
-            self.root.after(100, lambda: self.ask_open_output_dir(success_count, fail_count))
+            self.ui_events.call(self.ask_open_output_dir, success_count, fail_count)
             
             self.finish_conversion(True)
             
@@ -781,192 +1015,38 @@ class TextToAudioConverterGUI:
             self.log(f"批量转换过程中发生错误: {str(e)}", "ERROR")
             self.finish_conversion(False)
     
-    async def async_convert_file(self, text_content, output_file, voice_id):
-        """异步转换单个文件"""
-        try:
-            communicate = edge_tts.Communicate(
-                text_content,
-                voice=voice_id,
-                rate=self.speed_var.get(),
-                volume=self.volume_var.get()
-            )
-            
-            await communicate.save(output_file)
-            return True
-        except Exception as e:
-            self.log(f"Edge-TTS转换失败: {str(e)}", "ERROR")
-            return False
-    
-    def convert_single_file(self, input_file, voice_id):
-        """转换单个文件"""
-        try:
-            self.log(f"--- 开始转换文件: {os.path.basename(input_file)} ---")
-            
-            # 检查文件是否存在
-            if not os.path.exists(input_file):
-                self.log(f"文件不存在: {input_file}", "ERROR")
-                return False
-            
-            # 步骤1：读取文件
-            text_content = self.read_text_file(input_file)
-            
-            if text_content is None:
-                self.log(f"读取文件失败: {input_file}", "ERROR")
-                return False
-            
-            text_length = len(text_content)
-            self.log(f"读取成功，文本长度: {text_length} 字符")
-            
-            # 检查文本长度（Edge-TTS支持较长文本，但建议分段处理）
-            if text_length > 10000:
-                self.log(f"文本较长 ({text_length} 字符)，建议分割处理", "WARNING")
-                # 这里可以添加文本分割逻辑
-            
-            # 步骤2：生成输出文件名
-            output_filename = self.get_output_filename(input_file)
-            output_file = os.path.join(self.output_dir, output_filename)
-            
-            # 避免文件名重复（如果重名才添加序号）
-            counter = 1
-            original_output_file = output_file
-            base_name_without_ext = os.path.splitext(output_filename)[0]
-            
-            while os.path.exists(output_file):
-                # 如果文件已存在，添加序号
-                new_filename = f"{base_name_without_ext}_{counter:03d}.mp3"
-                output_file = os.path.join(self.output_dir, new_filename)
-                counter += 1
-                if counter > 100:  # 避免无限循环
-                    break
-            
-            if output_file != original_output_file:
-                self.log(f"文件名重复，添加序号: {os.path.basename(output_file)}", "WARNING")
-            
-            # 步骤3：使用Edge-TTS转换为音频
-            self.log(f"正在使用Edge-TTS生成音频...")
-            
-            # 创建异步事件循环
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            try:
-                # 异步执行转换
-                success = loop.run_until_complete(
-                    self.async_convert_file(text_content, output_file, voice_id)
-                )
-            finally:
-                loop.close()
-            
-            if not success:
-                return False
-            
-            # 检查最终文件
-            if os.path.exists(output_file):
-                file_size = os.path.getsize(output_file)
-                file_size_mb = file_size / (1024 * 1024)
-                
-                self.log(f"✅ 文件转换成功: {os.path.basename(output_file)} ({file_size_mb:.2f} MB)", "SUCCESS")
-                self.log(f"--- 完成转换文件: {os.path.basename(input_file)} ---")
-                return True
-            else:
-                self.log("音频文件生成失败", "ERROR")
-                return False
-                
-        except Exception as e:
-            self.log(f"转换文件时出错: {str(e)}", "ERROR")
-            return False
-    
     def log_batch_summary(self, total_files, success_count, fail_count, voice_name):
         """记录批量转换摘要到日志文件"""
-        try:
-            with open(self.log_file_path, 'a', encoding='utf-8') as f:
-                f.write("\n" + "=" * 70 + "\n")
-                f.write("批量转换摘要\n")
-                f.write("=" * 70 + "\n")
-                f.write(f"转换时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write(f"总文件数: {total_files}\n")
-                f.write(f"成功: {success_count}\n")
-                f.write(f"失败: {fail_count}\n")
-                f.write(f"输出目录: {self.output_dir}\n")
-                f.write(f"使用语音: {voice_name}\n")
-                f.write(f"语速设置: {self.speed_var.get()}\n")
-                f.write(f"音量设置: {self.volume_var.get()}\n")
-                f.write("=" * 70 + "\n\n")
-        except Exception as e:
-            print(f"记录批量转换摘要失败: {e}")
-    
-    def read_text_file(self, file_path):
-        """读取文本文件"""
-        try:
-            # 尝试不同编码
-            encodings = ['utf-8', 'gbk', 'gb2312', 'utf-16', 'latin-1']
-            
-            for encoding in encodings:
-                try:
-                    with open(file_path, 'r', encoding=encoding) as f:
-                        return f.read()
-                except (UnicodeDecodeError, LookupError):
-                    continue
-            
-            # 如果都失败，使用二进制读取
-            with open(file_path, 'rb') as f:
-                content = f.read()
-                return content.decode('utf-8', errors='ignore')
-                
-        except Exception as e:
-            self.log(f"读取文件失败: {str(e)}", "ERROR")
-            return None
-    
-    def split_long_text(self, text, max_length=10000):
-        """分割长文本（Edge-TTS支持较长文本，这里保持原逻辑）"""
-        if len(text) <= max_length:
-            return [text]
-        
-        chunks = []
-        current_chunk = ""
-        
-        # 按句子分割（中文标点）
-        sentences = []
-        current_sentence = ""
-        
-        for char in text:
-            current_sentence += char
-            if char in ['。', '！', '？', '.', '!', '?', '\n']:
-                sentences.append(current_sentence)
-                current_sentence = ""
-        
-        if current_sentence:
-            sentences.append(current_sentence)
-        
-        # 合并句子成合适的块
-        for sentence in sentences:
-            if len(current_chunk) + len(sentence) <= max_length:
-                current_chunk += sentence
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk)
-                current_chunk = sentence
-        
-        if current_chunk:
-            chunks.append(current_chunk)
-        
-        return chunks
+        self.log_sink.write_raw(
+            "\n" + "=" * 70 + "\n"
+            "批量转换摘要\n"
+            + "=" * 70 + "\n"
+            f"转换时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+            f"总文件数: {total_files}\n"
+            f"成功: {success_count}\n"
+            f"失败: {fail_count}\n"
+            f"输出目录: {self.output_dir}\n"
+            f"使用语音: {voice_name}\n"
+            f"语速设置: {self.speed_var.get()}\n"
+            f"音量设置: {self.volume_var.get()}\n"
+            + "=" * 70 + "\n\n"
+        )
     
     def update_progress(self, value, message):
-        """更新进度"""
-        self.progress_var.set(value)
-        self.status_label.config(text=message)
-        self.root.update_idletasks()
+        """更新进度（可在任意线程中调用）"""
+        self.ui_events.post("progress", (value, message))
     
     def update_progress_info(self, message):
-        """更新进度信息"""
-        self.progress_info.config(text=message)
-        self.root.update_idletasks()
+        """更新进度信息（可在任意线程中调用）"""
+        self.ui_events.post("progress_info", message)
     
     def finish_conversion(self, success):
         """完成转换"""
         self.is_processing = False
-        
+        self.ui_events.post("finish", success)
+    
+    def show_finish_state(self, success):
+        """在界面上显示转换结束状态"""
         if success:
             self.progress_var.set(100)
             self.status_label.config(text="批量转换完成！", fg="#44aa44")
@@ -1005,44 +1085,46 @@ class TextToAudioConverterGUI:
         self.log(f"日志文件位置: {self.log_file_path}")
         self.log(f"当前工作目录: {os.getcwd()}")
         self.log(f"可用语音数量: {len(self.voice_options)} 种")
+        if self.cache is not None:
+            self.log(f"缓存目录: {self.cache.cache_dir} ({len(self.cache)} 条)")
         self.log("=" * 50)
         self.log("欢迎使用文本转音频批量工具")
         self.log("支持多种高质量语音，请选择语音和文件开始转换")
         self.log("点击'测试语音'按钮可以预览当前选择的语音效果")
         self.log("=" * 50)
         self.root.mainloop()
-
-# 安装检查函数
-def check_dependencies():
-    """检查依赖包"""
-    required_packages = ['edge-tts']
+        if self._loop_thread is not None:
+            self._loop_thread.stop()
+        self.log_sink.close()
     
-    print("正在检查依赖包...")
-    
-    for package in required_packages:
-        try:
-            __import__(package.replace('-', '_'))
-            print(f"✓ {package} 已安装")
-        except ImportError:
-            print(f"✗ {package} 未安装")
-            
-            # 询问是否安装
-            response = input(f"是否要安装 {package}？(y/n): ")
-            if response.lower() == 'y':
+    def offer_install(self, packages):
+        """提示安装缺少的依赖包，在后台线程中运行pip，不阻塞界面"""
+        names = "、".join(packages)
+        self.log(f"缺少依赖包: {names}，转换和语音测试需要先安装", "WARNING")
+        if not messagebox.askyesno("缺少依赖", f"未安装 {names}，转换和语音测试需要它。\n\n是否现在安装？"):
+            self.log(f"可以稍后运行: pip install {' '.join(packages)}", "WARNING")
+            return
+        
+        def install():
+            import subprocess
+            for package in packages:
+                self.log(f"正在安装 {package}...")
                 try:
-                    import subprocess
                     subprocess.check_call([sys.executable, "-m", "pip", "install", package])
-                    print(f"✓ {package} 安装成功")
+                    self.log(f"✓ {package} 安装成功", "SUCCESS")
                 except Exception as e:
-                    print(f"安装 {package} 失败: {e}")
-                    return False
-            else:
-                return False
-    
-    print("\n" + "="*50)
-    print("依赖检查完成！")
-    print("="*50 + "\n")
-    return True
+                    self.log(f"安装 {package} 失败: {e}", "ERROR")
+        
+        threading.Thread(target=install, daemon=True).start()
+
+# 安装检查函数
+def check_dependencies():
+    """检查依赖包是否已安装，返回缺少的包名列表
+
+    只查找模块而不导入，不会拖慢启动；缺少时由界面提示安装。
+    """
+    return [package for package in REQUIRED_PACKAGES
+            if importlib.util.find_spec(package.replace('-', '_')) is None]
 
 def main():
     """主函数"""
@@ -1061,15 +1143,15 @@ def main():
     print("\n注意: Edge-TTS需要网络连接才能工作")
     print("="*50 + "\n")
     
-    # 检查依赖
-    if not check_dependencies():
-        print("请先安装必要的依赖包！")
-        print("运行命令: pip install edge-tts")
-        input("按回车键退出...")
-        return
+    # 检查依赖（只查找不导入），缺少时在窗口显示后提示安装
+    missing = check_dependencies()
+    if missing:
+        print(f"✗ 未安装: {', '.join(missing)}，运行命令: pip install {' '.join(missing)}")
     
     # 运行图形界面
     app = TextToAudioConverterGUI()
+    if missing:
+        app.root.after(0, app.offer_install, missing)
     app.run()
 
 if __name__ == "__main__":
@@ -0,0 +1,69 @@
+"""批量引擎并发吞吐量基准测试
+
+用本地FakeCommunicate模拟固定往返延迟，比较不同并发数下的吞吐量。
+
+运行: python benchmarks/bench_concurrency.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts_core import BatchEngine  # noqa: E402
+from tts_core.ratelimit import AdaptiveLimiter  # noqa: E402
+from fake_tts import make_fake_communicate  # noqa: E402
+
+FILE_COUNT = 32
+LATENCY = 0.1
+CONCURRENCY_LEVELS = [1, 2, 4, 8, 16]
+# 只比较并发数的影响，令牌桶速率设得足够高
+UNLIMITED_RATE = 10000.0
+
+
+async def convert_all(engine, output_dir):
+    """用引擎并发转换FILE_COUNT个模拟文件"""
+    async def worker(index, text):
+        output_file = os.path.join(output_dir, f"{index:04d}.mp3")
+        await engine.synthesize(text, output_file, "zh-CN-XiaoxiaoNeural")
+        return True
+
+    items = [f"第{i}章 测试文本。" for i in range(FILE_COUNT)]
+    return await engine.run(items, worker)
+
+
+def run(file_count=FILE_COUNT, latency=LATENCY, levels=CONCURRENCY_LEVELS):
+    """返回每个并发数下的耗时与吞吐量"""
+    communicate = make_fake_communicate(latency=latency)
+    results = []
+    for concurrency in levels:
+        with tempfile.TemporaryDirectory() as output_dir:
+            engine = BatchEngine(concurrency=concurrency, communicate_factory=communicate,
+                                 limiter=AdaptiveLimiter(concurrency, rate=UNLIMITED_RATE))
+            start = time.perf_counter()
+            outcome = asyncio.run(convert_all(engine, output_dir))
+            elapsed = time.perf_counter() - start
+        results.append({
+            "concurrency": concurrency,
+            "files": file_count,
+            "succeeded": outcome.count(True),
+            "seconds": round(elapsed, 4),
+            "files_per_second": round(file_count / elapsed, 2),
+        })
+    return results
+
+
+def main():
+    print(f"文件数: {FILE_COUNT}，模拟延迟: {LATENCY}s")
+    print(f"{'并发数':>6} {'耗时(s)':>10} {'文件/秒':>10} {'加速比':>8}")
+    results = run()
+    baseline = results[0]["seconds"]
+    for row in results:
+        print(f"{row['concurrency']:>6} {row['seconds']:>10.3f} "
+              f"{row['files_per_second']:>10.2f} {baseline / row['seconds']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""分布式模式基准测试
+
+同一批文件分别用单进程转换器和 "协调进程 + N个本机工作进程" 转换（StubBackend，离线），
+比较耗时。工作进程通过任务目录的原子重命名领取分段任务。
+
+运行: python benchmarks/bench_distributed.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts_core import StubBackend, TextToSpeechConverter  # noqa: E402
+from tts_core.distributed import SpoolCoordinator, spawn_local_workers, stop_workers  # noqa: E402
+from bench_pipeline import write_corpus  # noqa: E402
+
+FILE_COUNT = 16
+PARAGRAPHS_PER_FILE = 150
+# 每个进程内的并发数
+CONCURRENCY = 4
+WORKER_COUNTS = [1, 2, 4]
+VOICE = "zh-CN-XiaoxiaoNeural"
+# 模拟每次请求0.2秒往返、1000倍实时的服务；每个进程有自己的限流器和连接
+STUB_OPTIONS = {"latency": 0.2, "realtime_factor": 1000.0}
+
+
+def run_single(input_files, output_dir):
+    converter = TextToSpeechConverter(output_dir, voice_id=VOICE, concurrency=CONCURRENCY,
+                                      resume=False, backend=StubBackend(**STUB_OPTIONS))
+    start = time.perf_counter()
+    results = converter.run_batch(input_files)
+    return results, time.perf_counter() - start
+
+
+def run_distributed(input_files, work_dir, worker_count):
+    spool_dir = os.path.join(work_dir, f"spool{worker_count}")
+    output_dir = os.path.join(work_dir, f"out{worker_count}")
+    coordinator = SpoolCoordinator(spool_dir, output_dir, [VOICE], backend="stub",
+                                   backend_options=STUB_OPTIONS, resume=False, poll_interval=0.05)
+    start = time.perf_counter()
+    coordinator.submit(input_files)
+    workers = spawn_local_workers(spool_dir, worker_count, CONCURRENCY, no_cache=True)
+    try:
+        results = coordinator.wait()
+    finally:
+        stop_workers(workers)
+    return results, time.perf_counter() - start
+
+
+def run():
+    rows = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_files = write_corpus(work_dir, FILE_COUNT, PARAGRAPHS_PER_FILE)
+        results, seconds = run_single(input_files, os.path.join(work_dir, "single"))
+        rows.append({"mode": "single", "processes": 1, "succeeded": results.count(True),
+                     "seconds": round(seconds, 3)})
+        for worker_count in WORKER_COUNTS:
+            results, seconds = run_distributed(input_files, work_dir, worker_count)
+            rows.append({"mode": "spool", "processes": worker_count,
+                         "succeeded": results.count(True), "seconds": round(seconds, 3)})
+    return rows
+
+
+def main():
+    print(f"文件数: {FILE_COUNT}，每进程并发: {CONCURRENCY}")
+    print(f"{'模式':<8} {'进程数':>6} {'成功':>5} {'耗时(s)':>9}")
+    for row in run():
+        mode = "单进程" if row["mode"] == "single" else "任务目录"
+        print(f"{mode:<8} {row['processes']:>6} {row['succeeded']:>5} {row['seconds']:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
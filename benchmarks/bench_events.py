@@ -0,0 +1,76 @@
+"""界面事件通道基准测试
+
+多个工作线程高频投递进度事件，模拟的界面线程每100毫秒取走一次。
+统计投递速率、界面线程实际处理的更新次数以及每次处理的耗时。
+
+运行: python benchmarks/bench_events.py
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts_core.events import EventChannel  # noqa: E402
+
+DURATION = 1.0
+TICK = 0.1
+PRODUCERS = 8
+
+
+def run(duration=DURATION, tick=TICK, producers=PRODUCERS):
+    """返回投递次数、界面更新次数与单次处理耗时"""
+    channel = EventChannel()
+    stop = threading.Event()
+
+    def producer(worker_id):
+        i = 0
+        while not stop.is_set():
+            channel.post("progress", (i % 100, f"worker {worker_id}"))
+            i += 1
+            if i % 50 == 0:
+                channel.append("log", ("00:00:00", "INFO", f"worker {worker_id} 进度 {i}"))
+
+    threads = [threading.Thread(target=producer, args=(n,)) for n in range(producers)]
+    for thread in threads:
+        thread.start()
+
+    ticks = 0
+    applied = 0
+    drain_time = 0.0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        time.sleep(tick)
+        t0 = time.perf_counter()
+        latest, ordered = channel.drain()
+        applied += len(latest) + len(ordered)
+        drain_time += time.perf_counter() - t0
+        ticks += 1
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "producers": producers,
+        "posted": channel.posted,
+        "posts_per_second": round(channel.posted / elapsed),
+        "coalesced": channel.coalesced,
+        "ticks": ticks,
+        "ui_updates": applied,
+        "ui_ms_per_tick": round(drain_time / max(ticks, 1) * 1000, 4),
+    }
+
+
+def main():
+    result = run()
+    print(f"工作线程: {result['producers']}，投递事件: {result['posted']} "
+          f"({result['posts_per_second']}/秒)，合并: {result['coalesced']}")
+    print(f"界面节拍: {result['ticks']} 次，实际处理事件: {result['ui_updates']}，"
+          f"每次处理耗时: {result['ui_ms_per_tick']} ms")
+
+
+if __name__ == "__main__":
+    main()
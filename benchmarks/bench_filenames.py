@@ -0,0 +1,78 @@
+"""输出文件名生成基准测试
+
+get_output_filename 为10万个输入文件生成输出文件名（语音轮流使用）；
+reserve_output_file 模拟不同子目录中大量同名文件（如 第001章.txt）输出到同一目录，
+需要逐个尝试 _001、_002 … 序号。
+
+运行: python benchmarks/bench_filenames.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts_core import StubBackend, TextToSpeechConverter, get_output_filename  # noqa: E402
+from tts_core.voices import VOICE_OPTIONS  # noqa: E402
+
+FILE_COUNT = 100000
+# reserve_output_file 的输入：UNIQUE_NAMES 个文件名，每个在 DUPLICATES 个子目录中各出现一次
+UNIQUE_NAMES = 2000
+DUPLICATES = 10
+
+
+def bench_output_filename(count):
+    voice_ids = list(VOICE_OPTIONS.values())
+    input_files = [os.path.join("books", f"series{index % 97}", f"第{index:06d}章.txt")
+                   for index in range(count)]
+    start = time.perf_counter()
+    names = set()
+    for index, input_file in enumerate(input_files):
+        names.add(get_output_filename(input_file, voice_ids[index % len(voice_ids)]))
+    elapsed = time.perf_counter() - start
+    calls = count
+    return {
+        "case": "get_output_filename",
+        "calls": calls,
+        "unique": len(names),
+        "seconds": round(elapsed, 4),
+        "calls_per_second": round(calls / elapsed),
+    }
+
+
+def bench_reserve_output_file(unique_names, duplicates):
+    with tempfile.TemporaryDirectory() as output_dir:
+        converter = TextToSpeechConverter(output_dir, resume=False, backend=StubBackend())
+        input_files = [os.path.join(f"volume{copy}", f"第{index:05d}章.txt")
+                       for copy in range(duplicates) for index in range(unique_names)]
+        start = time.perf_counter()
+        for input_file in input_files:
+            converter.reserve_output_file(input_file)
+        elapsed = time.perf_counter() - start
+    calls = len(input_files)
+    return {
+        "case": "reserve_output_file",
+        "calls": calls,
+        "unique": len(converter.reserved_outputs),
+        "seconds": round(elapsed, 4),
+        "calls_per_second": round(calls / elapsed),
+    }
+
+
+def run(count=FILE_COUNT, unique_names=UNIQUE_NAMES, duplicates=DUPLICATES):
+    return [
+        bench_output_filename(count),
+        bench_reserve_output_file(unique_names, duplicates),
+    ]
+
+
+def main():
+    print(f"{'函数':<22} {'调用次数':>10} {'不同文件名':>10} {'耗时(s)':>10} {'次/秒':>12}")
+    for row in run():
+        print(f"{row['case']:<22} {row['calls']:>10} {row['unique']:>10} "
+              f"{row['seconds']:>10.3f} {row['calls_per_second']:>12}")
+
+
+if __name__ == "__main__":
+    main()
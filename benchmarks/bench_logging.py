@@ -0,0 +1,78 @@
+"""日志吞吐量基准测试
+
+比较原先每条日志打开一次文件的写法与LogSink队列批量写入的每秒调用次数。
+
+运行: python benchmarks/bench_logging.py
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts_core.logsink import LogSink  # noqa: E402
+
+MESSAGE_COUNT = 20000
+
+
+def legacy_log(path, message, level="INFO"):
+    """原实现：每条日志都打开、写入、关闭文件"""
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(f"{timestamp} [信息] {message}\n")
+
+
+def bench_legacy(path, count):
+    start = time.perf_counter()
+    for i in range(count):
+        legacy_log(path, f"正在处理文件 {i}/{count}: chapter_{i:05d}.txt")
+    return time.perf_counter() - start, 0.0
+
+
+def bench_sink(path, count, json_lines=False):
+    """返回 (调用耗时, 直到全部落盘的耗时)"""
+    sink = LogSink(path, json_lines=json_lines)
+    start = time.perf_counter()
+    for i in range(count):
+        sink.write(f"正在处理文件 {i}/{count}: chapter_{i:05d}.txt")
+    call_time = time.perf_counter() - start
+    sink.close()
+    return call_time, time.perf_counter() - start
+
+
+def run(count=MESSAGE_COUNT):
+    """返回每种写法的每秒调用次数"""
+    results = []
+    cases = [
+        ("legacy_open_per_line", lambda path: bench_legacy(path, count)),
+        ("log_sink_text", lambda path: bench_sink(path, count)),
+        ("log_sink_json", lambda path: bench_sink(path, count, json_lines=True)),
+    ]
+    for name, func in cases:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "log.txt")
+            call_time, drain_time = func(path)
+            with open(path, encoding="utf-8") as f:
+                written = sum(1 for _ in f)
+        results.append({
+            "case": name,
+            "messages": count,
+            "written": written,
+            "calls_per_second": round(count / call_time),
+            "drain_seconds": round(drain_time or call_time, 4),
+        })
+    return results
+
+
+def main():
+    print(f"日志条数: {MESSAGE_COUNT}")
+    print(f"{'写法':<22} {'调用/秒':>12} {'全部落盘(s)':>12} {'写入行数':>8}")
+    for row in run():
+        print(f"{row['case']:<22} {row['calls_per_second']:>12} "
+              f"{row['drain_seconds']:>12.3f} {row['written']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""事件循环复用基准测试
+
+比较三种执行方式下每次调用的固定开销（StubBackend，不含网络延迟）：
+- thread_new_loop: 原语音测试的写法，每次新建线程和事件循环，用完关闭；
+- asyncio_run: 每次调用 asyncio.run（每次新建事件循环和默认线程池）；
+- loop_thread: 提交到常驻的 LoopThread。
+工作负载分别为单段合成，以及只含一个小文件的 run_batch（包含读文件用的线程池）。
+
+运行: python benchmarks/bench_loop.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts_core import BatchEngine, LoopThread, StubBackend, TextToSpeechConverter  # noqa: E402
+from tts_core.ratelimit import AdaptiveLimiter  # noqa: E402
+
+CALLS = 300
+TEXT = "这是一段测试语音，用于检查当前选择的语音效果。"
+VOICE = "zh-CN-XiaoxiaoNeural"
+UNLIMITED_RATE = 10000.0
+
+
+def thread_new_loop(make_coro):
+    """原写法：新线程中新建事件循环，运行后关闭"""
+    def target():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(make_coro())
+        loop.close()
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+
+
+def make_workloads(work_dir):
+    backend = StubBackend(latency=0, realtime_factor=None)
+    # 只测固定开销，令牌桶速率设得足够高
+    engine = BatchEngine(concurrency=1, backend=backend,
+                         limiter=AdaptiveLimiter(1, rate=UNLIMITED_RATE))
+    output_file = os.path.join(work_dir, "test.mp3")
+    input_file = os.path.join(work_dir, "chapter.txt")
+    with open(input_file, "w", encoding="utf-8") as f:
+        f.write(TEXT * 5)
+    output_dir = os.path.join(work_dir, "out")
+
+    def synthesize():
+        return engine.synthesize(TEXT, output_file, VOICE)
+
+    def single_file_batch():
+        converter = TextToSpeechConverter(output_dir, resume=False, backend=backend)
+        # 输出文件名每次相同，先删除上次的结果，避免文件名加序号
+        for name in os.listdir(output_dir) if os.path.isdir(output_dir) else []:
+            os.remove(os.path.join(output_dir, name))
+        return converter.convert_batch([input_file])
+
+    return [("synthesize", synthesize), ("single_file_batch", single_file_batch)]
+
+
+def run(calls=CALLS):
+    results = []
+    loop_thread = LoopThread()
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            runners = [
+                ("thread_new_loop", thread_new_loop),
+                ("asyncio_run", lambda make_coro: asyncio.run(make_coro())),
+                ("loop_thread", lambda make_coro: loop_thread.run(make_coro())),
+            ]
+            for workload, make_coro in make_workloads(work_dir):
+                for mode, runner in runners:
+                    runner(make_coro)  # 预热
+                    start = time.perf_counter()
+                    for _ in range(calls):
+                        runner(make_coro)
+                    elapsed = time.perf_counter() - start
+                    results.append({
+                        "workload": workload,
+                        "mode": mode,
+                        "calls": calls,
+                        "seconds": round(elapsed, 4),
+                        "ms_per_call": round(elapsed / calls * 1000, 3),
+                    })
+    finally:
+        loop_thread.stop()
+    return results
+
+
+def main():
+    print(f"每种方式调用 {CALLS} 次")
+    print(f"{'工作负载':<18} {'执行方式':<16} {'耗时(s)':>10} {'毫秒/次':>10}")
+    for row in run():
+        print(f"{row['workload']:<18} {row['mode']:<16} {row['seconds']:>10.3f} "
+              f"{row['ms_per_call']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
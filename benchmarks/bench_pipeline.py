@@ -0,0 +1,102 @@
+"""端到端批量转换基准测试（离线）
+
+用StubBackend代替Edge-TTS，完整走一遍 读取 → 分段 → 并发合成 → 拼接 的流程，
+并校验每个输出文件都是合法的MP3帧序列。加 --profile 输出cProfile耗时最多的函数。
+
+运行: python benchmarks/bench_pipeline.py [--profile]
+"""
+import argparse
+import cProfile
+import os
+import pstats
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts_core import StubBackend, TextToSpeechConverter  # noqa: E402
+from tts_core.mp3 import count_frames, frames_duration  # noqa: E402
+
+FILE_COUNT = 24
+# 每个文件的段落数，约每段60字符
+PARAGRAPHS_PER_FILE = 400
+CONCURRENCY = 8
+LATENCY = 0.02
+# 不限制生成速度，只测本地流程本身的开销
+REALTIME_FACTOR = None
+
+
+def write_corpus(input_dir, file_count=FILE_COUNT, paragraphs=PARAGRAPHS_PER_FILE):
+    """生成中英文混合的测试文本文件"""
+    files = []
+    for index in range(file_count):
+        path = os.path.join(input_dir, f"book{index:03d}.txt")
+        lines = []
+        for paragraph in range(paragraphs):
+            if paragraph % 3 == 2:
+                lines.append(f"Chapter {index}, paragraph {paragraph}. The quick brown fox jumps over the lazy dog.")
+            else:
+                lines.append(f"第{index}卷第{paragraph}段，这是一段用于离线压测的中文文本。它会被分段后并行合成！")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+        files.append(path)
+    return files
+
+
+def run(file_count=FILE_COUNT, concurrency=CONCURRENCY, profile=False):
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_files = write_corpus(work_dir, file_count)
+        output_dir = os.path.join(work_dir, "out")
+        backend = StubBackend(latency=LATENCY, realtime_factor=REALTIME_FACTOR)
+        converter = TextToSpeechConverter(output_dir, concurrency=concurrency, resume=False,
+                                          backend=backend)
+        converter.engine.limiter.bucket.set_rate(10000.0)
+
+        profiler = cProfile.Profile() if profile else None
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        results = converter.run_batch(input_files)
+        if profiler is not None:
+            profiler.disable()
+        elapsed = time.perf_counter() - start
+
+        total_bytes = 0
+        total_frames = 0
+        for name in os.listdir(output_dir):
+            if not name.endswith(".mp3"):
+                continue
+            with open(os.path.join(output_dir, name), "rb") as f:
+                data = f.read()
+            total_bytes += len(data)
+            total_frames += count_frames(data)
+
+    if profiler is not None:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+
+    return {
+        "files": file_count,
+        "succeeded": results.count(True),
+        "requests": converter.engine.synthesis_count,
+        "seconds": round(elapsed, 3),
+        "files_per_second": round(file_count / elapsed, 2),
+        "output_mb": round(total_bytes / (1024 * 1024), 2),
+        "audio_hours": round(frames_duration(total_frames) / 3600, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profile", action="store_true", help="输出cProfile统计")
+    args = parser.parse_args()
+
+    row = run(profile=args.profile)
+    print(f"文件数: {row['files']}，并发: {CONCURRENCY}，成功: {row['succeeded']}，"
+          f"合成请求: {row['requests']}")
+    print(f"耗时: {row['seconds']:.3f}s，{row['files_per_second']:.2f} 文件/秒，"
+          f"输出 {row['output_mb']} MB / {row['audio_hours']} 小时音频（帧校验通过）")
+
+
+if __name__ == "__main__":
+    main()
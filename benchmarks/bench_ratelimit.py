@@ -0,0 +1,97 @@
+"""自适应限流基准测试
+
+用带故障注入的FakeServer模拟服务端：同时处理的请求超过上限时返回429，
+另有少量随机连接错误和一段503故障期。比较固定并发与自适应限流下的
+成功数、被限流次数、重试次数和总耗时。
+
+运行: python benchmarks/bench_ratelimit.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts_core import BatchEngine  # noqa: E402
+from tts_core.ratelimit import AdaptiveLimiter  # noqa: E402
+from fake_tts import FakeServer  # noqa: E402
+
+REQUEST_COUNT = 96
+CONCURRENCY = 16
+SERVER_CAPACITY = 4
+LATENCY = 0.05
+ERROR_RATE = 0.03
+# 缩短退避时间，使基准测试在几秒内完成
+BASE_DELAY = 0.05
+MAX_RETRIES = 6
+
+
+async def run_requests(engine, output_dir, server, outage_after=None, outage_seconds=0.3):
+    """并发发出REQUEST_COUNT个合成请求，可在第outage_after个请求后触发一次故障"""
+    started = 0
+
+    async def worker(index, text):
+        nonlocal started
+        started += 1
+        if outage_after is not None and started == outage_after:
+            server.outage(outage_seconds)
+        output_file = os.path.join(output_dir, f"{index:04d}.mp3")
+        await engine.synthesize_with_retry(text, output_file, "zh-CN-XiaoxiaoNeural")
+        return True
+
+    items = [f"第{i}段测试文本。" for i in range(REQUEST_COUNT)]
+    return await engine.run(items, worker)
+
+
+def run_scenario(adaptive, outage_after=None):
+    server = FakeServer(latency=LATENCY, max_in_flight=SERVER_CAPACITY,
+                        error_rate=ERROR_RATE, seed=1)
+    limiter = AdaptiveLimiter(CONCURRENCY, rate=1000.0, base_delay=BASE_DELAY,
+                              adaptive=adaptive)
+    engine = BatchEngine(concurrency=CONCURRENCY, communicate_factory=server.communicate_factory(),
+                         max_retries=MAX_RETRIES, limiter=limiter)
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+        results = asyncio.run(run_requests(engine, output_dir, server, outage_after))
+        elapsed = time.perf_counter() - start
+    return {
+        "adaptive": adaptive,
+        "outage": outage_after is not None,
+        "succeeded": results.count(True),
+        "failed": results.count(False),
+        "server_requests": server.requests,
+        "server_throttled": server.throttled,
+        "retries": limiter.retries,
+        "backoff_seconds": round(limiter.backoff_time, 3),
+        "min_concurrency": limiter.min_seen_concurrency,
+        "final_concurrency": limiter.concurrency,
+        "seconds": round(elapsed, 3),
+    }
+
+
+def run():
+    return [
+        run_scenario(adaptive=False),
+        run_scenario(adaptive=True),
+        run_scenario(adaptive=False, outage_after=REQUEST_COUNT // 3),
+        run_scenario(adaptive=True, outage_after=REQUEST_COUNT // 3),
+    ]
+
+
+def main():
+    print(f"请求数: {REQUEST_COUNT}，客户端并发: {CONCURRENCY}，服务端容量: {SERVER_CAPACITY}，"
+          f"随机错误率: {ERROR_RATE:.0%}")
+    print(f"{'模式':<6} {'故障期':>4} {'成功':>5} {'失败':>5} {'服务端请求':>8} {'被限流':>6} "
+          f"{'重试':>5} {'并发(最低/最终)':>12} {'耗时(s)':>8}")
+    for row in run():
+        mode = "自适应" if row["adaptive"] else "固定"
+        print(f"{mode:<6} {'有' if row['outage'] else '无':>4} {row['succeeded']:>5} "
+              f"{row['failed']:>5} {row['server_requests']:>8} {row['server_throttled']:>6} "
+              f"{row['retries']:>5} {row['min_concurrency']:>6}/{row['final_concurrency']:<6} "
+              f"{row['seconds']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
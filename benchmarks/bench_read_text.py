@@ -0,0 +1,109 @@
+"""文本读取基准测试
+
+在数MB的UTF-8、GBK、UTF-16等语料上比较原先逐个编码重读整个文件的实现
+与先检测编码再一次解码的 read_text_file。
+gbk-ascii-head 为开头有大段英文的GBK文件，原实现要把大半个文件按UTF-8解码后才失败。
+
+运行: python benchmarks/bench_read_text.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts_core.text import read_text_file  # noqa: E402
+
+SIZES_MB = [1, 8]
+CORPORA = ["utf-8", "gbk", "utf-16", "gbk-ascii-head", "latin-1"]
+REPEAT = 3
+
+SAMPLE_TEXT = (
+    "第一章 山雨欲来\n"
+    "夜色渐深，城里的灯火一盏接一盏地熄灭了。他站在窗前，望着远处的山影，久久没有说话。\n"
+    "“明天还要赶路吗？”她轻声问道。\n"
+)
+LATIN_TEXT = "Le café était fermé, et la rue déserte sous la pluie d'été.\n"
+ASCII_TEXT = "Copyright notice. All rights reserved. Reproduced with permission.\n"
+
+
+def legacy_read_text_file(file_path):
+    """原实现：每种编码都重新打开并解码整个文件"""
+    encodings = ['utf-8', 'gbk', 'gb2312', 'utf-16', 'latin-1']
+    for encoding in encodings:
+        try:
+            with open(file_path, 'r', encoding=encoding) as f:
+                return f.read()
+        except (UnicodeDecodeError, LookupError):
+            continue
+    with open(file_path, 'rb') as f:
+        return f.read().decode('utf-8', errors='ignore')
+
+
+def legacy_read_or_none(file_path):
+    """原实现在GUI中出错时返回None（例如latin-1文件会在utf-16解码时抛出UnicodeError）"""
+    try:
+        return legacy_read_text_file(file_path)
+    except Exception:
+        return None
+
+
+def make_corpus(path, corpus, size_mb):
+    """生成约size_mb大小的语料文件"""
+    target = size_mb * 1024 * 1024
+    if corpus == "latin-1":
+        text, encoding = LATIN_TEXT * (target // len(LATIN_TEXT)), "latin-1"
+    elif corpus == "gbk-ascii-head":
+        head = ASCII_TEXT * (target // 2 // len(ASCII_TEXT))
+        body = SAMPLE_TEXT * (target // 2 // len(SAMPLE_TEXT.encode("gbk")))
+        text, encoding = head + body, "gbk"
+    else:
+        text = SAMPLE_TEXT * max(1, target // len(SAMPLE_TEXT.encode(corpus)))
+        encoding = corpus
+    with open(path, "w", encoding=encoding) as f:
+        f.write(text)
+
+
+def best_time(func, *args):
+    """多次运行取最短耗时"""
+    best = None
+    result = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run(sizes_mb=SIZES_MB, corpora=CORPORA):
+    """返回每种语料和大小下新旧实现的耗时"""
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for size_mb in sizes_mb:
+            for corpus in corpora:
+                path = os.path.join(temp_dir, f"{corpus}_{size_mb}mb.txt")
+                make_corpus(path, corpus, size_mb)
+                legacy_time, legacy_text = best_time(legacy_read_or_none, path)
+                new_time, new_text = best_time(read_text_file, path)
+                results.append({
+                    "corpus": corpus,
+                    "size_mb": size_mb,
+                    "legacy_seconds": round(legacy_time, 4),
+                    "new_seconds": round(new_time, 4),
+                    "speedup": round(legacy_time / new_time, 2),
+                    "same_text": legacy_text is not None and legacy_text.lstrip("\ufeff") == new_text,
+                })
+    return results
+
+
+def main():
+    print(f"{'语料':<16} {'大小':>6} {'原实现(s)':>10} {'新实现(s)':>10} {'加速比':>8} {'结果一致':>8}")
+    for row in run():
+        print(f"{row['corpus']:<16} {row['size_mb']:>4}MB {row['legacy_seconds']:>10.4f} "
+              f"{row['new_seconds']:>10.4f} {row['speedup']:>8.2f} {str(row['same_text']):>8}")
+
+
+if __name__ == "__main__":
+    main()
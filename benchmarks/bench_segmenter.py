@@ -0,0 +1,147 @@
+"""文本分段基准测试
+
+在约10MB的中英文混合文本上比较原先逐字符拼接的 split_long_text 与
+基于正则扫描的 iter_text_chunks：耗时用普通计时，内存峰值用tracemalloc单独测量。
+iter_text_chunks 以生成器方式逐段消费，不保存分段列表。
+另外在开头插入一句话后重新分段，统计有多少分段与修改前完全相同（即可以命中合成缓存）。
+
+运行: python benchmarks/bench_segmenter.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts_core.engine import DEFAULT_CHUNK_LENGTH  # noqa: E402
+from tts_core.text import iter_text_chunks  # noqa: E402
+
+TEXT_SIZE_MB = 10
+
+SAMPLE_TEXT = (
+    "第一章 山雨欲来\n"
+    "夜色渐深，城里的灯火一盏接一盏地熄灭了。他站在窗前，望着远处的山影，久久没有说话。\n"
+    "“明天还要赶路吗？”她轻声问道。Mr. Smith said the train leaves at 6 p.m. sharp! "
+    "Are you sure? Yes.\n"
+)
+
+
+def legacy_split_long_text(text, max_length=10000):
+    """原实现：逐字符拼接句子，再拼接成块"""
+    if len(text) <= max_length:
+        return [text]
+    chunks = []
+    current_chunk = ""
+    sentences = []
+    current_sentence = ""
+    for char in text:
+        current_sentence += char
+        if char in ['。', '！', '？', '.', '!', '?', '\n']:
+            sentences.append(current_sentence)
+            current_sentence = ""
+    if current_sentence:
+        sentences.append(current_sentence)
+    for sentence in sentences:
+        if len(current_chunk) + len(sentence) <= max_length:
+            current_chunk += sentence
+        else:
+            if current_chunk:
+                chunks.append(current_chunk)
+            current_chunk = sentence
+    if current_chunk:
+        chunks.append(current_chunk)
+    return chunks
+
+
+def consume_legacy(text, max_length):
+    chunks = legacy_split_long_text(text, max_length)
+    return len(chunks), sum(len(chunk) for chunk in chunks)
+
+
+def consume_generator(text, max_length):
+    count = 0
+    total = 0
+    for chunk in iter_text_chunks(text, max_length):
+        count += 1
+        total += len(chunk)
+    return count, total
+
+
+def make_text(size_mb=TEXT_SIZE_MB):
+    """生成约size_mb（UTF-8字节）的文本"""
+    unit_size = len(SAMPLE_TEXT.encode("utf-8"))
+    return SAMPLE_TEXT * (size_mb * 1024 * 1024 // unit_size)
+
+
+EDIT = "这是在开头新插入的一句话。"
+
+
+def make_numbered_text(size_mb=1):
+    """每个单元带编号、互不相同的文本，避免周期性文本让任何分段方式都显得稳定"""
+    unit_size = len(SAMPLE_TEXT.encode("utf-8"))
+    return "".join(SAMPLE_TEXT.replace("第一章", f"第{index}章")
+                   for index in range(size_mb * 1024 * 1024 // unit_size))
+
+
+def edit_reuse(func, max_length):
+    """在文本开头附近插入一句话后，与修改前完全相同的分段所占的比例"""
+    text = make_numbered_text()
+    before = Counter(func(text, max_length))
+    position = text.index("\n") + 1
+    after = func(text[:position] + EDIT + text[position:], max_length)
+    reused = 0
+    for chunk in after:
+        if before[chunk]:
+            before[chunk] -= 1
+            reused += 1
+    return reused / len(after)
+
+
+def measure(func, text, max_length):
+    """返回 (耗时, 内存峰值字节数, 结果)"""
+    start = time.perf_counter()
+    result = func(text, max_length)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    func(text, max_length)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def run(size_mb=TEXT_SIZE_MB, max_length=DEFAULT_CHUNK_LENGTH):
+    """返回新旧实现的耗时与内存峰值"""
+    text = make_text(size_mb)
+    results = []
+    for name, func, split in [
+            ("legacy_split_long_text", consume_legacy, legacy_split_long_text),
+            ("iter_text_chunks", consume_generator,
+             lambda text, max_length: list(iter_text_chunks(text, max_length)))]:
+        elapsed, peak, (count, total) = measure(func, text, max_length)
+        results.append({
+            "case": name,
+            "chars": len(text),
+            "max_length": max_length,
+            "chunks": count,
+            "chars_out": total,
+            "seconds": round(elapsed, 4),
+            "peak_mb": round(peak / (1024 * 1024), 2),
+            "edit_reuse": round(edit_reuse(split, max_length), 4),
+        })
+    return results
+
+
+def main():
+    results = run()
+    print(f"文本长度: {results[0]['chars']} 字符，分段上限: {results[0]['max_length']}")
+    print(f"{'实现':<24} {'耗时(s)':>10} {'内存峰值(MB)':>14} {'分段数':>8} {'修改后复用':>10}")
+    for row in results:
+        print(f"{row['case']:<24} {row['seconds']:>10.3f} {row['peak_mb']:>14.2f} {row['chunks']:>8} "
+              f"{row['edit_reuse']:>10.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""HTTP合成服务基准测试
+
+在本机随机端口启动 SynthesisService（StubBackend，不需要网络），测量：
+- identical: 大量并发的相同请求，应只合成一次（请求合并）；
+- distinct: 同样数量的不同请求，作为对照；
+- hot_repeat: 重复的短提示音，第一次之后应直接从内存缓存返回；
+- job: 通过 /jobs 提交批量任务，轮询到完成并下载输出文件。
+每个返回的MP3都会校验帧格式。
+
+运行: python benchmarks/bench_server.py [--requests 50]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts_core import BatchEngine, StubBackend  # noqa: E402
+from tts_core.mp3 import count_frames  # noqa: E402
+from tts_core.ratelimit import AdaptiveLimiter  # noqa: E402
+from tts_core.server import SynthesisService  # noqa: E402
+
+HOST = "127.0.0.1"
+REQUESTS = 50
+REPEAT = 200
+TEXT = "这是一段用于测试HTTP合成服务的文本，相同的并发请求只应合成一次。"
+PROMPT = "叮咚，您有新的消息。"
+# 模拟合成延迟：首字节前的等待和生成速度
+LATENCY = 0.2
+REALTIME_FACTOR = 20.0
+
+
+def decode_chunked(data):
+    body = bytearray()
+    while True:
+        size_line, _, data = data.partition(b"\r\n")
+        size = int(size_line, 16)
+        if size == 0:
+            return bytes(body)
+        body += data[:size]
+        data = data[size + 2:]
+
+
+async def http_request(port, method, path, payload=None):
+    """发送一个请求，返回 (状态码, 头部, 正文)"""
+    reader, writer = await asyncio.open_connection(HOST, port)
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: {HOST}\r\n"
+                 f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                 f"Connection: close\r\n\r\n".encode("latin-1") + body)
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    head, _, content = data.partition(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split()[1])
+    headers = {name.lower(): value.strip()
+               for name, _, value in (line.partition(":") for line in lines[1:])}
+    if headers.get("transfer-encoding") == "chunked":
+        content = decode_chunked(content)
+    return status, headers, content
+
+
+def check_audio(status, content):
+    if status != 200:
+        raise RuntimeError(f"请求失败 {status}: {content[:200]!r}")
+    count_frames(content)
+    return content
+
+
+async def concurrent_case(service, case, texts):
+    before = service.engine.synthesis_count
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        http_request(service.port, "POST", "/synthesize", {"text": text, "voice": "Xiaoxiao"})
+        for text in texts
+    ))
+    elapsed = time.perf_counter() - start
+    bodies = [check_audio(status, content) for status, _, content in results]
+    if case == "identical" and len(set(bodies)) != 1:
+        raise RuntimeError("相同请求返回的音频不一致")
+    return {"case": case, "requests": len(texts),
+            "syntheses": service.engine.synthesis_count - before,
+            "seconds": round(elapsed, 4),
+            "ms_per_request": round(elapsed / len(texts) * 1000, 3)}
+
+
+async def hot_repeat_case(service, repeat):
+    before = service.engine.synthesis_count
+    start = time.perf_counter()
+    status, _, content = await http_request(service.port, "POST", "/synthesize", {"text": PROMPT})
+    check_audio(status, content)
+    first_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for _ in range(repeat):
+        status, _, content = await http_request(service.port, "POST", "/synthesize",
+                                                {"text": PROMPT})
+        check_audio(status, content)
+    elapsed = time.perf_counter() - start
+    return {"case": "hot_repeat", "requests": repeat + 1,
+            "syntheses": service.engine.synthesis_count - before,
+            "first_ms": round(first_ms, 3),
+            "seconds": round(elapsed, 4),
+            "ms_per_request": round(elapsed / repeat * 1000, 3)}
+
+
+async def job_case(service):
+    texts = [{"name": f"第{index}章", "text": TEXT * (index + 1)} for index in range(4)]
+    start = time.perf_counter()
+    status, _, content = await http_request(service.port, "POST", "/jobs",
+                                            {"texts": texts, "subtitles": ["srt"]})
+    if status != 202:
+        raise RuntimeError(f"提交任务失败 {status}: {content!r}")
+    job = json.loads(content)
+    while job["status"] in ("queued", "running"):
+        await asyncio.sleep(0.02)
+        _, _, content = await http_request(service.port, "GET", f"/jobs/{job['id']}")
+        job = json.loads(content)
+    elapsed = time.perf_counter() - start
+    if job["status"] != "done":
+        raise RuntimeError(f"任务失败: {job}")
+    for url in job["files"]:
+        status, _, content = await http_request(service.port, "GET", url)
+        if url.endswith(".mp3"):
+            check_audio(status, content)
+        elif status != 200 or not content:
+            raise RuntimeError(f"下载失败 {status}: {url}")
+    return {"case": "job", "requests": len(texts), "files": len(job["files"]),
+            "seconds": round(elapsed, 4),
+            "ms_per_request": round(elapsed / len(texts) * 1000, 3)}
+
+
+async def run_async(requests, repeat, work_dir):
+    backend = StubBackend(latency=LATENCY, realtime_factor=REALTIME_FACTOR)
+    # 不测限流，令牌桶速率设得足够高
+    engine = BatchEngine(concurrency=16, backend=backend, limiter=AdaptiveLimiter(16, rate=10000))
+    service = SynthesisService(engine, work_dir=work_dir)
+    await service.start(HOST, 0)
+    try:
+        return [
+            await concurrent_case(service, "identical", [TEXT] * requests),
+            await concurrent_case(service, "distinct",
+                                  [f"{TEXT}（第{index}个）" for index in range(requests)]),
+            await hot_repeat_case(service, repeat),
+            await job_case(service),
+        ]
+    finally:
+        await service.close()
+
+
+def run(requests=REQUESTS, repeat=REPEAT):
+    with tempfile.TemporaryDirectory() as work_dir:
+        return asyncio.run(run_async(requests, repeat, work_dir))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=REQUESTS, help="并发请求数")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="重复短提示音的次数")
+    args = parser.parse_args()
+
+    print(f"{'场景':<12} {'请求数':>8} {'合成次数':>8} {'耗时(s)':>10} {'毫秒/请求':>10}")
+    for row in run(args.requests, args.repeat):
+        print(f"{row['case']:<12} {row['requests']:>8} {row.get('syntheses', '-'):>8} "
+              f"{row['seconds']:>10.3f} {row['ms_per_request']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
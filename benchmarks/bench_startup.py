@@ -0,0 +1,160 @@
+"""界面冷启动基准测试
+
+在新的Python进程中测量：
+- 用 -X importtime 导入 ConvertTextToSpeech 的总耗时和自身耗时最多的模块；
+- 导入后是否已经加载了 asyncio、edge_tts、aiohttp（应在第一次合成时才导入）；
+- 从启动进程到主窗口第一次绘制完成的时间（需要图形界面环境，没有时跳过）。
+多次运行取中位数，与目标时间比较，超出时返回非零退出码。
+
+运行: python benchmarks/bench_startup.py [--repeat 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GUI_MODULE = "ConvertTextToSpeech"
+
+# 目标时间（毫秒）
+IMPORT_TARGET_MS = 150
+FIRST_WINDOW_TARGET_MS = 600
+
+# 启动时不应导入的模块
+DEFERRED_MODULES = ("asyncio", "edge_tts", "aiohttp")
+
+REPEAT = 5
+
+FIRST_WINDOW_SCRIPT = f"""
+import json, sys
+import {GUI_MODULE} as gui
+try:
+    app = gui.TextToAudioConverterGUI()
+except Exception as e:
+    print(json.dumps({{"error": str(e)}}))
+    sys.exit(0)
+app.root.update()
+print(json.dumps({{"loaded": [m for m in {DEFERRED_MODULES!r} if m in sys.modules]}}), flush=True)
+app.root.destroy()
+app.log_sink.close()
+"""
+
+
+def child_env():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT_DIR, env.get("PYTHONPATH")]))
+    return env
+
+
+def parse_importtime(stderr):
+    """解析 -X importtime 的输出，返回 [(模块, 自身微秒, 累计微秒)]"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue
+        rows.append((parts[2].strip(), self_us, cumulative_us))
+    return rows
+
+
+def measure_import(work_dir):
+    code = (f"import json, sys; import {GUI_MODULE}; "
+            f"print(json.dumps([m for m in {DEFERRED_MODULES!r} if m in sys.modules]))")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=work_dir,
+                            env=child_env(), capture_output=True, text=True, check=True)
+    rows = parse_importtime(result.stderr)
+    total_us = next(cumulative for name, _, cumulative in rows if name == GUI_MODULE)
+    return total_us / 1000, rows, json.loads(result.stdout.strip())
+
+
+def measure_first_window(work_dir):
+    """返回从启动进程到主窗口绘制完成的毫秒数，没有图形界面时返回None"""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", FIRST_WINDOW_SCRIPT], cwd=work_dir,
+                            env=child_env(), capture_output=True, text=True)
+    elapsed = (time.perf_counter() - start) * 1000
+    lines = result.stdout.strip().splitlines()
+    if result.returncode != 0 or not lines:
+        return None, result.stderr.strip().splitlines()[-1:] or ["未知错误"]
+    data = json.loads(lines[-1])
+    if "error" in data:
+        return None, [data["error"]]
+    return elapsed, data["loaded"]
+
+
+def run(repeat=REPEAT):
+    with tempfile.TemporaryDirectory() as work_dir:
+        import_times = []
+        for _ in range(repeat):
+            import_ms, rows, loaded = measure_import(work_dir)
+            import_times.append(import_ms)
+        top = sorted(rows, key=lambda row: row[1], reverse=True)[:10]
+
+        window_times = []
+        window_note = None
+        for _ in range(repeat):
+            window_ms, detail = measure_first_window(work_dir)
+            if window_ms is None:
+                window_note = detail[0]
+                break
+            window_times.append(window_ms)
+            loaded = sorted(set(loaded) | set(detail))
+
+    import_ms = statistics.median(import_times)
+    window_ms = statistics.median(window_times) if window_times else None
+    return {
+        "import_ms": round(import_ms, 1),
+        "import_target_ms": IMPORT_TARGET_MS,
+        "first_window_ms": round(window_ms, 1) if window_ms is not None else None,
+        "first_window_target_ms": FIRST_WINDOW_TARGET_MS,
+        "first_window_note": window_note,
+        "deferred_loaded": loaded,
+        "top_self_ms": [{"module": name, "self_ms": round(self_us / 1000, 2)}
+                        for name, self_us, _ in top],
+    }
+
+
+def check(row):
+    """返回未达标的项目列表"""
+    failures = []
+    if row["import_ms"] > row["import_target_ms"]:
+        failures.append(f"导入 {row['import_ms']}ms > {row['import_target_ms']}ms")
+    if row["first_window_ms"] is not None and row["first_window_ms"] > row["first_window_target_ms"]:
+        failures.append(f"首个窗口 {row['first_window_ms']}ms > {row['first_window_target_ms']}ms")
+    if row["deferred_loaded"]:
+        failures.append(f"启动时已导入: {', '.join(row['deferred_loaded'])}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="运行次数，取中位数")
+    args = parser.parse_args()
+
+    row = run(args.repeat)
+    print(f"导入 {GUI_MODULE}: {row['import_ms']:.1f}ms（目标 {IMPORT_TARGET_MS}ms）")
+    if row["first_window_ms"] is not None:
+        print(f"进程启动到首个窗口: {row['first_window_ms']:.1f}ms（目标 {FIRST_WINDOW_TARGET_MS}ms）")
+    else:
+        print(f"进程启动到首个窗口: 跳过（{row['first_window_note']}）")
+    print(f"启动时已导入的延迟模块: {', '.join(row['deferred_loaded']) or '无'}")
+    print("自身耗时最多的模块:")
+    for item in row["top_self_ms"]:
+        print(f"  {item['module']:<40} {item['self_ms']:>8.2f}ms")
+
+    failures = check(row)
+    for failure in failures:
+        print(f"未达标: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""基准测试用的本地模拟TTS服务
+
+FakeCommunicate 与 edge_tts.Communicate 接口一致，固定延迟后分块返回音频数据，
+不需要网络连接。FakeServer 在此基础上模拟服务端的限流和故障。
+"""
+import asyncio
+import collections
+import random
+import time
+
+
+class FakeCommunicate:
+    """模拟edge_tts.Communicate"""
+
+    # 单次请求的模拟往返延迟（秒）
+    latency = 0.1
+    # 每次返回的模拟音频大小（字节）
+    audio_size = 16 * 1024
+    # 每个音频块的大小（字节）
+    block_size = 4096
+
+    def __init__(self, text, voice=None, rate="+0%", volume="+0%"):
+        self.text = text
+        self.voice = voice
+        self.rate = rate
+        self.volume = volume
+
+    async def stream(self):
+        await asyncio.sleep(self.latency)
+        remaining = self.audio_size
+        while remaining > 0:
+            size = min(self.block_size, remaining)
+            remaining -= size
+            yield {"type": "audio", "data": b"\x00" * size}
+            await asyncio.sleep(0)
+
+    async def save(self, audio_fname):
+        with open(audio_fname, "wb") as f:
+            async for message in self.stream():
+                if message["type"] == "audio":
+                    f.write(message["data"])
+
+
+def make_fake_communicate(latency=0.1, audio_size=16 * 1024):
+    """生成指定延迟的FakeCommunicate子类"""
+    return type("FakeCommunicate", (FakeCommunicate,),
+                {"latency": latency, "audio_size": audio_size})
+
+
+class FakeServiceError(Exception):
+    """模拟服务端返回的错误，与aiohttp.ClientResponseError一样带status和headers"""
+
+    def __init__(self, status, message="", retry_after=None):
+        super().__init__(f"{status} {message}".strip())
+        self.status = status
+        self.headers = {"Retry-After": str(retry_after)} if retry_after is not None else {}
+
+
+class FakeServer:
+    """带故障注入的模拟TTS服务端
+
+    max_in_flight: 同时处理的请求超过该数量时返回429
+    max_rate: 最近一秒内的请求数超过该值时返回429
+    error_rate: 请求随机失败（连接中断）的概率
+    outage(seconds): 之后的一段时间内所有请求返回503
+    """
+
+    def __init__(self, latency=0.1, audio_size=16 * 1024, max_in_flight=None, max_rate=None,
+                 error_rate=0.0, retry_after=None, seed=0):
+        self.latency = latency
+        self.audio_size = audio_size
+        self.max_in_flight = max_in_flight
+        self.max_rate = max_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.throttled = 0
+        self.failures = 0
+        self._recent = collections.deque()
+        self._outage_until = 0.0
+
+    def outage(self, seconds):
+        """从现在起seconds秒内拒绝所有请求"""
+        self._outage_until = time.monotonic() + seconds
+
+    def admit(self):
+        """接收一个请求，需要拒绝时抛出FakeServiceError"""
+        now = time.monotonic()
+        self.requests += 1
+        while self._recent and now - self._recent[0] > 1.0:
+            self._recent.popleft()
+        self._recent.append(now)
+
+        if now < self._outage_until:
+            self.throttled += 1
+            raise FakeServiceError(503, "Service Unavailable", self.retry_after)
+        if self.max_in_flight is not None and self.in_flight >= self.max_in_flight:
+            self.throttled += 1
+            raise FakeServiceError(429, "Too Many Requests", self.retry_after)
+        if self.max_rate is not None and len(self._recent) > self.max_rate:
+            self.throttled += 1
+            raise FakeServiceError(429, "Too Many Requests", self.retry_after)
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.failures += 1
+            raise ConnectionResetError("模拟连接中断")
+
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def done(self):
+        self.in_flight -= 1
+
+    def communicate_factory(self):
+        """生成连接到本服务端的FakeCommunicate子类"""
+        server = self
+
+        class ServerCommunicate(FakeCommunicate):
+            latency = server.latency
+            audio_size = server.audio_size
+
+            async def stream(self):
+                server.admit()
+                try:
+                    async for message in FakeCommunicate.stream(self):
+                        yield message
+                finally:
+                    server.done()
+
+        return ServerCommunicate
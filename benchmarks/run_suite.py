@@ -0,0 +1,225 @@
+"""基准测试套件
+
+依次运行各个基准测试的 run()，把结果连同运行环境（Python版本、平台、git提交）
+写入一个JSON文件；--compare 对比两次结果，指标变差超过阈值时返回非零退出码，
+可在CI中用于发现性能回退。
+
+运行:
+    python benchmarks/run_suite.py                      # 全部，结果写入 benchmarks/results/
+    python benchmarks/run_suite.py --quick --only read_text,pipeline
+    python benchmarks/run_suite.py --compare base.json new.json --threshold 0.15
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+RESULT_VERSION = 1
+DEFAULT_THRESHOLD = 0.10
+PIPELINE_CONCURRENCY_LEVELS = [1, 4, 8, 16]
+
+
+def run_pipeline(file_count=24, levels=PIPELINE_CONCURRENCY_LEVELS):
+    """完整批量转换流程在不同并发数下的吞吐量"""
+    bench_pipeline = importlib.import_module("bench_pipeline")
+    return [dict(bench_pipeline.run(file_count=file_count, concurrency=level), concurrency=level)
+            for level in levels]
+
+
+# 名称 -> (模块, 函数, 完整参数, --quick参数, 标识字段, [(指标, 越小越好)])
+# 函数为None时调用模块的run()；--quick参数为None表示快速模式下跳过
+BENCHMARKS = {
+    "read_text": ("bench_read_text", None, {}, {"sizes_mb": [1]},
+                  ("corpus", "size_mb"), [("new_seconds", True)]),
+    "segmenter": ("bench_segmenter", None, {}, {"size_mb": 2},
+                  ("case",), [("seconds", True), ("peak_mb", True)]),
+    "filenames": ("bench_filenames", None, {}, {"count": 20000, "unique_names": 500},
+                  ("case",), [("seconds", True)]),
+    "concurrency": ("bench_concurrency", None, {}, {"levels": [1, 4, 16]},
+                    ("concurrency",), [("seconds", True)]),
+    "pipeline": (None, run_pipeline, {}, {"file_count": 8, "levels": [1, 8]},
+                 ("concurrency",), [("seconds", True)]),
+    "loop": ("bench_loop", None, {}, {"calls": 100},
+             ("workload", "mode"), [("ms_per_call", True)]),
+    "startup": ("bench_startup", None, {}, {"repeat": 3},
+                (), [("import_ms", True), ("first_window_ms", True)]),
+    "events": ("bench_events", None, {}, {"duration": 0.5},
+               ("producers",), [("ui_ms_per_tick", True)]),
+    "logging": ("bench_logging", None, {}, {"count": 5000},
+                ("case",), [("calls_per_second", False)]),
+    "ratelimit": ("bench_ratelimit", None, {}, None,
+                  ("adaptive", "outage"), [("seconds", True), ("server_throttled", True)]),
+    "distributed": ("bench_distributed", None, {}, None,
+                    ("mode", "processes"), [("seconds", True)]),
+    "server": ("bench_server", None, {}, {"requests": 20, "repeat": 50},
+               ("case",), [("ms_per_request", True), ("syntheses", True)]),
+}
+
+
+def git_commit():
+    try:
+        output = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                                capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return output.stdout.strip() or None
+
+
+def environment():
+    return {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "commit": git_commit(),
+    }
+
+
+def run_benchmark(name, quick=False):
+    """运行一个基准测试，返回结果行列表；快速模式下不适用时返回None"""
+    module_name, func, options, quick_options, _, _ = BENCHMARKS[name]
+    if quick:
+        if quick_options is None:
+            return None
+        options = quick_options
+    if func is None:
+        func = importlib.import_module(module_name).run
+    rows = func(**options)
+    return rows if isinstance(rows, list) else [rows]
+
+
+def run_suite(names, quick=False):
+    result = {"version": RESULT_VERSION, "quick": quick, "environment": environment(),
+              "benchmarks": {}}
+    for name in names:
+        print(f"== {name}", flush=True)
+        start = time.perf_counter()
+        rows = run_benchmark(name, quick)
+        elapsed = time.perf_counter() - start
+        if rows is None:
+            print("   快速模式下跳过")
+            continue
+        result["benchmarks"][name] = {"seconds": round(elapsed, 3), "rows": rows}
+        print(f"   {len(rows)} 项，{elapsed:.1f}s")
+    return result
+
+
+def write_result(result, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_file = path + ".tmp"
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    os.replace(temp_file, path)
+
+
+def row_id(row, fields):
+    return ", ".join(f"{field}={row.get(field)}" for field in fields)
+
+
+def compare(base, new, threshold=DEFAULT_THRESHOLD):
+    """逐项对比两次结果，返回 (对比行列表, 回退项数)
+
+    只对比两次都有的基准测试和结果行；变化量按"变差为正"计算。
+    """
+    rows = []
+    regressions = 0
+    for name, entry in new["benchmarks"].items():
+        if name not in base["benchmarks"] or name not in BENCHMARKS:
+            continue
+        _, _, _, _, id_fields, metrics = BENCHMARKS[name]
+        base_rows = {row_id(row, id_fields): row for row in base["benchmarks"][name]["rows"]}
+        for row in entry["rows"]:
+            key = row_id(row, id_fields)
+            base_row = base_rows.get(key)
+            if base_row is None:
+                continue
+            for metric, lower_is_better in metrics:
+                old_value = base_row.get(metric)
+                new_value = row.get(metric)
+                if not isinstance(old_value, (int, float)) or not isinstance(new_value, (int, float)):
+                    continue
+                if old_value == 0:
+                    change = 0.0 if new_value == 0 else float("inf")
+                else:
+                    change = (new_value - old_value) / abs(old_value)
+                worse = change if lower_is_better else -change
+                regressed = worse > threshold
+                regressions += regressed
+                rows.append({"benchmark": name, "id": key, "metric": metric,
+                             "base": old_value, "new": new_value,
+                             "change": change, "regressed": regressed})
+    return rows, regressions
+
+
+def print_comparison(rows, threshold):
+    print(f"{'基准测试':<12} {'项目':<36} {'指标':<18} {'原值':>12} {'新值':>12} {'变化':>8}")
+    for row in rows:
+        mark = "  <-- 回退" if row["regressed"] else ""
+        print(f"{row['benchmark']:<12} {row['id'][:36]:<36} {row['metric']:<18} "
+              f"{row['base']:>12} {row['new']:>12} {row['change']:>+8.1%}{mark}")
+    regressions = sum(row["regressed"] for row in rows)
+    print(f"共对比 {len(rows)} 项，变差超过 {threshold:.0%} 的 {regressions} 项")
+
+
+def load_result(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def parse_names(value):
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"未知的基准测试: {', '.join(unknown)}（可用: {', '.join(BENCHMARKS)}）")
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", type=parse_names, default=list(BENCHMARKS),
+                        help="只运行这些基准测试，逗号分隔")
+    parser.add_argument("--quick", action="store_true", help="使用较小的数据量，跳过耗时较长的项目")
+    parser.add_argument("-o", "--output", default=None,
+                        help="结果文件，默认 benchmarks/results/<时间>.json")
+    parser.add_argument("--compare", nargs="+", metavar="RESULT",
+                        help="对比结果：BASE [NEW]；只给BASE时先运行套件再与之对比")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="指标变差超过该比例视为回退，默认0.10")
+    args = parser.parse_args()
+
+    if args.compare and len(args.compare) > 2:
+        parser.error("--compare 最多两个结果文件")
+    if args.compare and len(args.compare) == 2:
+        new = load_result(args.compare[1])
+    else:
+        new = run_suite(args.only, quick=args.quick)
+        output = args.output or os.path.join(
+            RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+        write_result(new, output)
+        print(f"结果已写入: {output}")
+
+    if args.compare:
+        base = load_result(args.compare[0])
+        if base.get("quick") != new.get("quick"):
+            print("警告: 两次结果的数据量不同（--quick），对比没有意义", file=sys.stderr)
+        rows, regressions = compare(base, new, args.threshold)
+        print_comparison(rows, args.threshold)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
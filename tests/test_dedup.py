@@ -0,0 +1,111 @@
+import asyncio
+import os
+import random
+import tempfile
+import unittest
+
+from tts_core.backends import create_backend
+from tts_core.converter import TextToSpeechConverter
+from tts_core.dedup import (choose_shared_runs, normalize_text, repeated_paragraphs,
+                            split_with_shared_runs)
+from tts_core.text import split_long_text
+
+MAX_LENGTH = 3000
+
+
+def make_paragraph(rng, tag):
+    sentences = rng.randint(3, 12)
+    return "".join(f"{tag}句子{rng.randint(0, 10 ** 9)}，说明一些情况。"
+                   for _ in range(sentences)) + "\n"
+
+
+def make_batches():
+    """几种典型的批次：大量共享的短段落、首尾相同的免责声明、章节中间相同的长段落"""
+    rng = random.Random(7)
+    common = [make_paragraph(rng, "共") for _ in range(120)]
+    shared_paragraphs = ["".join(paragraph if rng.random() < 0.6 else make_paragraph(rng, f"f{i}")
+                                 for paragraph in common) for i in range(4)]
+
+    header = "本书内容仅供学习交流使用，版权归原作者所有，请勿用于任何商业用途，如有侵权请联系删除。\n"
+    header_footer = [header + "".join(make_paragraph(rng, f"h{i}") for _ in range(40)) + header
+                     for i in range(10)]
+
+    disclaimer = "".join(make_paragraph(rng, "免责") for _ in range(12))
+    middle = ["".join(make_paragraph(rng, f"m{i}") for _ in range(30)) + disclaimer +
+              "".join(make_paragraph(rng, f"m{i}") for _ in range(30)) for i in range(10)]
+
+    repeated_headers = ["".join((header if index % 5 == 0 else "") + make_paragraph(rng, f"r{i}")
+                                for index in range(100)) for i in range(3)]
+    return [shared_paragraphs, header_footer, middle, repeated_headers]
+
+
+def distinct_requests(chunk_lists):
+    return len({normalize_text(chunk) for chunks in chunk_lists for chunk in chunks})
+
+
+class SharedRunsTest(unittest.TestCase):
+    def test_chunks_join_back_to_original(self):
+        for texts in make_batches() + [["", "\n\n", "短\n"]]:
+            repeated, chosen = choose_shared_runs(texts, MAX_LENGTH)
+            for text in texts:
+                self.assertEqual("".join(split_with_shared_runs(text, repeated, chosen, MAX_LENGTH)),
+                                 text)
+
+    def test_requests_never_increase(self):
+        for texts in make_batches():
+            repeated, chosen = choose_shared_runs(texts, MAX_LENGTH)
+            baseline = [split_long_text(text, MAX_LENGTH) for text in texts]
+            shared = [split_with_shared_runs(text, repeated, chosen, MAX_LENGTH) for text in texts]
+            self.assertLessEqual(distinct_requests(shared), distinct_requests(baseline))
+
+    def test_repeated_paragraph_in_middle_is_shared(self):
+        texts = make_batches()[2]
+        repeated, chosen = choose_shared_runs(texts, MAX_LENGTH)
+        self.assertTrue(repeated_paragraphs(texts))
+        self.assertTrue(chosen)
+        baseline = [split_long_text(text, MAX_LENGTH) for text in texts]
+        shared = [split_with_shared_runs(text, repeated, chosen, MAX_LENGTH) for text in texts]
+        self.assertLess(distinct_requests(shared), distinct_requests(baseline))
+
+    def test_no_repeats_keeps_normal_chunks(self):
+        text = make_batches()[1][0]
+        repeated, chosen = choose_shared_runs([text.replace("本书", "此书", 1)], MAX_LENGTH)
+        self.assertEqual(chosen, set())
+        self.assertEqual(split_with_shared_runs(text, repeated, chosen, MAX_LENGTH),
+                         split_long_text(text, MAX_LENGTH))
+
+
+class PlanBatchTest(unittest.TestCase):
+    def plan(self, input_files, output_dir, dedup):
+        converter = TextToSpeechConverter(output_dir, voice_ids=["Xiaoxiao", "Yunxi"],
+                                          backend=create_backend("stub"), resume=False,
+                                          dedup=dedup)
+
+        async def run():
+            if dedup:
+                plans = await converter.plan_batch(input_files)
+            else:
+                plans = [await converter.prepare_file(input_file) for input_file in input_files]
+            shared = converter.engine.shared
+            if shared is not None:
+                return shared.requests
+            return sum(len(plan["chunks"]) * len(plan["voice_ids"]) for plan in plans)
+
+        return asyncio.run(run())
+
+    def test_dedup_never_sends_more_requests(self):
+        for texts in make_batches():
+            with tempfile.TemporaryDirectory() as work_dir:
+                input_files = []
+                for index, text in enumerate(texts):
+                    path = os.path.join(work_dir, f"{index}.txt")
+                    with open(path, "w", encoding="utf-8") as f:
+                        f.write(text)
+                    input_files.append(path)
+                output_dir = os.path.join(work_dir, "out")
+                self.assertLessEqual(self.plan(input_files, output_dir, True),
+                                     self.plan(input_files, output_dir, False))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import random
+import unittest
+
+from tts_core.text import iter_text_chunks, split_long_text
+
+MAX_LENGTH = 3000
+
+
+def make_text(seed, paragraphs=400):
+    rng = random.Random(seed)
+    lines = []
+    for index in range(paragraphs):
+        sentences = rng.randint(2, 8)
+        lines.append("".join(f"第{index}段第{number}句，内容编号{rng.randint(0, 10 ** 6)}。"
+                             for number in range(sentences)))
+    return "\n".join(lines) + "\n"
+
+
+class ChunkingTest(unittest.TestCase):
+    def test_chunks_join_back_to_original(self):
+        for text in (make_text(1), "Mr. Smith went home. Dr. Who? Yes!" * 500, "无标点" * 5000, ""):
+            chunks = split_long_text(text, MAX_LENGTH)
+            self.assertEqual("".join(chunks), text)
+            self.assertTrue(all(len(chunk) <= MAX_LENGTH for chunk in chunks))
+
+    def test_edit_near_start_keeps_later_chunks(self):
+        text = make_text(2)
+        cut = text.index("\n", 200) + 1
+        edited = text[:cut] + "这是新插入的一行文字，用来模拟对开头的修改。\n" + text[cut:]
+
+        before = list(iter_text_chunks(text, MAX_LENGTH))
+        after = list(iter_text_chunks(edited, MAX_LENGTH))
+        self.assertGreater(len(before), 10)
+        reused = len(set(before) & set(after))
+        # 只有包含改动的开头一两段需要重新合成
+        self.assertGreaterEqual(reused, len(before) - 2)
+        self.assertEqual(before[-5:], after[-5:])
+
+    def test_edit_in_middle_keeps_chunks_on_both_sides(self):
+        text = make_text(3)
+        middle = text.index("\n", len(text) // 2) + 1
+        edited = text[:middle] + text[middle + 40:]
+
+        before = list(iter_text_chunks(text, MAX_LENGTH))
+        after = list(iter_text_chunks(edited, MAX_LENGTH))
+        self.assertGreaterEqual(len(set(before) & set(after)), len(before) - 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
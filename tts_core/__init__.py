@@ -0,0 +1,56 @@
+"""文本转语音转换核心
+
+包中的名称在第一次使用时才导入对应的子模块（PEP 562），
+界面启动时不会因为导入本包而加载asyncio、edge_tts等较重的模块。
+"""
+import importlib
+
+# 名称 -> 定义它的子模块
+_EXPORTS = {
+    "BatchEngine": "engine",
+    "BatchMetrics": "metrics",
+    "DEFAULT_CACHE_MAX_BYTES": "cache",
+    "DEFAULT_CHUNK_LENGTH": "defaults",
+    "DEFAULT_CONCURRENCY": "defaults",
+    "DEFAULT_VOICE": "voices",
+    "DEFAULT_VOICE_NAME": "voices",
+    "EdgeTTSBackend": "backends",
+    "EventChannel": "events",
+    "LogSink": "logsink",
+    "LoopThread": "loop",
+    "MAX_CONCURRENCY": "defaults",
+    "StubBackend": "backends",
+    "SynthesisCache": "cache",
+    "SynthesisService": "server",
+    "TTSBackend": "backends",
+    "TextToSpeechConverter": "converter",
+    "VOICE_OPTIONS": "voices",
+    "VOICE_SUFFIX_MAP": "voices",
+    "VOICE_TO_LANGUAGE": "voices",
+    "VoiceCatalog": "voices",
+    "create_backend": "backends",
+    "get_output_filename": "voices",
+    "get_voice_suffix": "voices",
+    "iter_text_chunks": "text",
+    "join_mp3_files": "mp3",
+    "load_catalog": "voices",
+    "read_text_file": "text",
+    "resolve_voice": "voices",
+    "split_long_text": "text",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    # 缓存到包的命名空间，之后的访问不再经过__getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,6 @@
+"""python -m tts_core 命令行入口"""
+import sys
+
+from .cli import main
+
+sys.exit(main())
@@ -0,0 +1,184 @@
+"""TTS后端
+
+引擎只通过后端的 stream() 和 save() 两个异步接口合成音频：
+- EdgeTTSBackend 调用在线的Edge-TTS服务；
+- StubBackend 在本地生成确定的、合法的MP3帧，可配置延迟和吞吐量，
+  用于在没有网络的机器上对整个批量流程做压测和性能分析。
+"""
+import asyncio
+import functools
+import hashlib
+import inspect
+import re
+
+from .mp3 import (AUDIO_BYTES_PER_SECOND, FRAME_SAMPLES, FRAME_SIZE, SAMPLE_RATE,
+                  estimate_audio_bytes, silent_frames)
+from .subtitles import TICKS_PER_SECOND
+
+
+def load_communicate():
+    """延迟导入edge_tts.Communicate"""
+    import edge_tts
+    return edge_tts.Communicate
+
+
+@functools.lru_cache(maxsize=None)
+def accepts_argument(func, name):
+    """func是否接受名为name的参数"""
+    try:
+        parameters = inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return False
+    return name in parameters
+
+
+class TTSBackend:
+    """TTS后端接口
+
+    stream() 为异步生成器，产生与edge_tts.Communicate.stream()相同格式的消息，
+    音频消息为 {"type": "audio", "data": bytes}。
+    """
+
+    # 后端名称；非None时会加入缓存键，避免不同后端的音频互相混用
+    name = None
+
+    # 后端直接产生的音频格式和码率（kbps）；分段拼接、缓存和字幕时间都基于这种MP3帧格式，
+    # 需要其他格式时在拼接后转码
+    output_format = ("mp3", 48)
+
+    def stream(self, text, voice, rate="+0%", volume="+0%", word_boundary=False):
+        """word_boundary为True时同时产生逐词的WordBoundary消息，用于生成字幕"""
+        raise NotImplementedError
+
+    async def save(self, text, output_file, voice, rate="+0%", volume="+0%"):
+        """把合成的音频写入output_file"""
+        with open(output_file, "wb") as f:
+            async for message in self.stream(text, voice, rate, volume):
+                if message["type"] == "audio":
+                    f.write(message["data"])
+
+
+class CommunicateBackend(TTSBackend):
+    """包装与edge_tts.Communicate接口一致的类（如测试用的模拟实现）"""
+
+    def __init__(self, communicate_factory):
+        self.communicate_factory = communicate_factory
+
+    def communicate(self, text, voice, rate, volume, word_boundary=False):
+        options = {}
+        # edge-tts 7.0起默认只返回SentenceBoundary，需要显式要求逐词边界；
+        # 更早的版本没有该参数，默认就返回WordBoundary
+        if word_boundary and accepts_argument(self.communicate_factory, "boundary"):
+            options["boundary"] = "WordBoundary"
+        return self.communicate_factory(text, voice=voice, rate=rate, volume=volume, **options)
+
+    def stream(self, text, voice, rate="+0%", volume="+0%", word_boundary=False):
+        return self.communicate(text, voice, rate, volume, word_boundary).stream()
+
+    async def save(self, text, output_file, voice, rate="+0%", volume="+0%"):
+        await self.communicate(text, voice, rate, volume).save(output_file)
+
+
+class EdgeTTSBackend(CommunicateBackend):
+    """在线Edge-TTS服务"""
+
+    def __init__(self):
+        super().__init__(None)
+
+    def communicate(self, text, voice, rate, volume, word_boundary=False):
+        # 第一次合成时才导入edge_tts
+        if self.communicate_factory is None:
+            self.communicate_factory = load_communicate()
+        return super().communicate(text, voice, rate, volume, word_boundary)
+
+
+# 模拟后端中的"词"：单个中日韩字符，或连续的字母数字
+WORD_PATTERN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]|[^\W_]+")
+
+
+class StubBackend(TTSBackend):
+    """离线模拟后端，生成格式与Edge-TTS输出一致的静音MP3
+
+    音频时长按文本长度和语速估算；帧的附加数据区由输入内容的哈希填充，
+    相同输入总是得到相同的字节，不同分段的音频可以区分。
+
+    latency: 首个音频块之前的等待时间（秒）
+    realtime_factor: 每秒生成多少秒的音频，None表示不限速
+    """
+
+    name = "stub"
+
+    # 每个音频消息包含的帧数
+    frames_per_message = 32
+
+    def __init__(self, latency=0.05, realtime_factor=50.0):
+        self.latency = latency
+        self.realtime_factor = realtime_factor
+
+    @staticmethod
+    def frame_count(text, rate="+0%"):
+        """按文本和语速估算的帧数，至少一帧"""
+        seconds = estimate_audio_bytes(text) / AUDIO_BYTES_PER_SECOND
+        match = re.fullmatch(r"([+-]\d+)%", rate or "")
+        if match:
+            seconds /= max(0.1, 1 + int(match.group(1)) / 100)
+        return max(1, round(seconds * SAMPLE_RATE / FRAME_SAMPLES))
+
+    @staticmethod
+    def word_boundaries(text, duration):
+        """把duration（100纳秒）按词的长度分配给各个词，生成WordBoundary消息"""
+        words = WORD_PATTERN.findall(text)
+        total = sum(len(word) for word in words)
+        messages = []
+        offset = 0
+        for word in words:
+            word_duration = duration * len(word) // total
+            messages.append({"type": "WordBoundary", "offset": offset,
+                             "duration": word_duration, "text": word})
+            offset += word_duration
+        return messages
+
+    async def stream(self, text, voice, rate="+0%", volume="+0%", word_boundary=False):
+        digest = hashlib.sha256(f"{voice}\0{rate}\0{volume}\0{text}".encode("utf-8")).digest()
+        # 去掉最高位，附加数据里不会出现帧同步字节0xFF
+        ancillary = bytes(byte & 0x7F for byte in digest)
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        remaining = self.frame_count(text, rate)
+        boundaries = []
+        if word_boundary:
+            duration = remaining * FRAME_SAMPLES * TICKS_PER_SECOND // SAMPLE_RATE
+            boundaries = self.word_boundaries(text, duration)
+        message_frames = self.frames_per_message
+        message = silent_frames(message_frames, ancillary)
+        message_seconds = message_frames * FRAME_SAMPLES / SAMPLE_RATE
+        while remaining > 0:
+            if remaining < message_frames:
+                message = message[:remaining * FRAME_SIZE]
+            remaining -= message_frames
+            yield {"type": "audio", "data": message}
+            if self.realtime_factor:
+                await asyncio.sleep(message_seconds / self.realtime_factor)
+            else:
+                await asyncio.sleep(0)
+        # 与Edge-TTS一样在音频之后发送边界消息
+        for message in boundaries:
+            yield message
+
+
+# 可通过名称选择的后端
+BACKENDS = {
+    "edge": EdgeTTSBackend,
+    "stub": StubBackend,
+}
+
+
+def create_backend(name="edge", **options):
+    """按名称创建后端，未知名称时抛出ValueError"""
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"未知的TTS后端: {name}，可用: {', '.join(BACKENDS)}") from None
+    return backend_class(**options)
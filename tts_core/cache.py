@@ -0,0 +1,203 @@
+"""合成结果缓存
+
+以 (文本, 语音, 语速, 音量) 的哈希作为键，把合成好的音频保存在本地磁盘上。
+缓存总大小超过上限时按最近最少使用（LRU）的顺序淘汰。
+合成时收集了逐词边界的条目，边界数据保存在音频旁边的JSON文件中，命中时可直接生成字幕。
+转码后的其他格式输出按格式各用一个子目录（formats/<格式>）缓存，切换格式时不需要重新合成。
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+from .subtitles import boundaries_path, load_boundaries, save_boundaries
+
+# 默认缓存大小上限：1GB
+DEFAULT_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+CACHE_SUFFIX = ".mp3"
+
+# 转码结果缓存所在的子目录
+FORMATS_DIR_NAME = "formats"
+
+
+def default_cache_dir():
+    """默认缓存目录"""
+    return os.path.join(os.getcwd(), "tts_cache")
+
+
+class SynthesisCache:
+    """按内容寻址的本地合成缓存"""
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_CACHE_MAX_BYTES, suffix=CACHE_SUFFIX):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        # 条目文件的扩展名
+        self.suffix = suffix
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # key -> 文件大小，按最近使用时间从旧到新排列
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._load_index()
+
+    @staticmethod
+    def make_key(text, voice, rate, volume, backend=None):
+        """计算缓存键；backend为非默认后端的名称，默认的Edge-TTS不参与计算"""
+        fields = [text, voice, rate, volume]
+        if backend is not None:
+            fields.append(backend)
+        payload = json.dumps(fields, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path_for(self, key):
+        """缓存条目的文件路径"""
+        return os.path.join(self.cache_dir, key[:2], key + self.suffix)
+
+    def _load_index(self):
+        """扫描缓存目录，按文件修改时间重建LRU顺序"""
+        found = []
+        for sub in os.scandir(self.cache_dir):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.is_file() and entry.name.endswith(self.suffix):
+                    stat = entry.stat()
+                    found.append((stat.st_mtime, entry.name[:-len(self.suffix)], stat.st_size))
+        found.sort()
+        for _, key, size in found:
+            self._entries[key] = size
+            self._total_bytes += size
+        self._evict()
+
+    def get(self, key, output_file, boundaries=None):
+        """命中时把缓存的音频复制到output_file并返回True
+
+        boundaries为列表时同时读取条目的逐词边界并追加到其中，没有边界数据时视为未命中。
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return False
+            self._entries.move_to_end(key)
+        path = self.path_for(key)
+        if boundaries is not None:
+            cached_boundaries = load_boundaries(boundaries_path(path))
+            if cached_boundaries is None:
+                with self._lock:
+                    self.misses += 1
+                return False
+        temp_path = f"{output_file}.{threading.get_ident()}.tmp"
+        try:
+            shutil.copyfile(path, temp_path)
+            os.replace(temp_path, output_file)
+            # 更新修改时间，重启后仍能恢复LRU顺序
+            os.utime(path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            with self._lock:
+                self._forget(key)
+                self.misses += 1
+            return False
+        if boundaries is not None:
+            boundaries.extend(cached_boundaries)
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def read(self, key):
+        """命中时返回缓存的音频内容，否则返回None"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+        path = self.path_for(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._forget(key)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, source_file, boundaries=None):
+        """把合成好的音频文件（及其逐词边界）存入缓存"""
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            shutil.copyfile(source_file, temp_path)
+            os.replace(temp_path, path)
+            if boundaries is not None:
+                save_boundaries(boundaries_path(path), boundaries)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        size = os.path.getsize(path)
+        with self._lock:
+            self._forget(key)
+            self._entries[key] = size
+            self._total_bytes += size
+            self._evict()
+
+    def _forget(self, key):
+        """从索引中移除条目（调用方需持有锁）"""
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self):
+        """淘汰最久未使用的条目，直到总大小不超过上限"""
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            path = self.path_for(key)
+            for stale in (path, boundaries_path(path)):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+
+    def for_format(self, output_format, extension):
+        """保存output_format转码结果的缓存，大小上限与本缓存相同"""
+        return SynthesisCache(os.path.join(self.cache_dir, FORMATS_DIR_NAME, output_format),
+                              max_bytes=self.max_bytes, suffix="." + extension)
+
+    def reset_stats(self):
+        """清零命中统计"""
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def summary(self):
+        """命中统计的文字描述"""
+        lookups = self.hits + self.misses
+        hit_rate = (self.hits / lookups * 100) if lookups else 0.0
+        return (f"命中 {self.hits} 次，未命中 {self.misses} 次 (命中率 {hit_rate:.1f}%)，"
+                f"淘汰 {self.evictions} 条，缓存 {len(self)} 条 / "
+                f"{self._total_bytes / (1024 * 1024):.1f} MB")
@@ -0,0 +1,532 @@
+"""命令行入口
+
+不依赖图形界面，适合服务器上的定时任务:
+
+    python -m tts_core convert "books/*.txt" -v Xiaoxiao -j 8 -o audio_output
+    python -m tts_core convert book.txt -v Xiaoxiao,Yunxi,Jenny
+    python -m tts_core convert book.txt --subtitles srt,vtt
+    python -m tts_core convert book.txt --format opus --bitrate 16k
+    python -m tts_core voices
+
+分布式模式：协调进程把任务写入共享目录，任意数量的工作进程（可在其他主机上）领取执行:
+
+    python -m tts_core coordinate "books/*.txt" --spool /mnt/share/spool --workers 4
+    python -m tts_core worker /mnt/share/spool -j 8
+
+监视文件夹，自动转换新增或修改的文本文件:
+
+    python -m tts_core watch /mnt/share/inbox -o /mnt/share/audio
+
+本地HTTP合成服务，供其他工具调用:
+
+    python -m tts_core serve --port 8765
+"""
+import argparse
+import asyncio
+import glob
+import os
+import re
+import sys
+import time
+
+from .backends import BACKENDS, create_backend
+from .cache import SynthesisCache
+from .converter import TextToSpeechConverter
+from .engine import BatchEngine
+from .distributed import (DEFAULT_LEASE_TIMEOUT, SpoolCoordinator, SpoolWorker, parse_shard,
+                          spawn_local_workers, stop_workers)
+from .defaults import DEFAULT_CONCURRENCY, MAX_CONCURRENCY
+from .logsink import LogSink, format_line
+from .postprocess import (DEFAULT_FORMAT, MAX_PARAGRAPH_GAP, OUTPUT_FORMATS, find_ffmpeg,
+                          needs_transcoding, parse_bitrate)
+from .server import DEFAULT_HOST, DEFAULT_HOT_CACHE_BYTES, DEFAULT_PORT, HotCache, SynthesisService
+from .subtitles import parse_formats
+from .watch import DEFAULT_POLL_INTERVAL, DEFAULT_SETTLE_TIME, WatchService
+from .voices import DEFAULT_VOICE, GENDER_NAMES, load_catalog, resolve_voice
+
+
+def percent(value):
+    """校验语速/音量参数，例如 +10%、-20%"""
+    if not re.fullmatch(r"[+-]\d+%", value):
+        raise argparse.ArgumentTypeError(f"格式应为 +10% 或 -20%: {value}")
+    return value
+
+
+def concurrency(value):
+    """校验并发数参数"""
+    number = int(value)
+    if not 1 <= number <= MAX_CONCURRENCY:
+        raise argparse.ArgumentTypeError(f"并发数应在 1-{MAX_CONCURRENCY} 之间: {value}")
+    return number
+
+
+def subtitle_formats(value):
+    """校验字幕格式参数，例如 srt,vtt"""
+    try:
+        return parse_formats(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def loudness(value):
+    """校验目标响度参数（LUFS），例如 -16"""
+    number = float(value)
+    if not -70 <= number <= -5:
+        raise argparse.ArgumentTypeError(f"目标响度应在 -70 到 -5 LUFS 之间: {value}")
+    return number
+
+
+def paragraph_gap(value):
+    """校验段落停顿参数（秒）"""
+    number = float(value)
+    if not 0 <= number <= MAX_PARAGRAPH_GAP:
+        raise argparse.ArgumentTypeError(f"段落停顿应在 0-{MAX_PARAGRAPH_GAP:g} 秒之间: {value}")
+    return number
+
+
+def expand_inputs(patterns):
+    """展开输入的通配符，去重并保持顺序"""
+    files = []
+    seen = set()
+    for pattern in patterns:
+        if any(char in pattern for char in "*?["):
+            matches = sorted(glob.glob(pattern, recursive=True))
+        else:
+            matches = [pattern]
+        for path in matches:
+            key = os.path.abspath(path)
+            if os.path.isfile(path) and key not in seen:
+                seen.add(key)
+                files.append(path)
+    return files
+
+
+def make_logger(quiet=False, sink=None):
+    """生成输出到终端（以及可选日志文件）的日志回调"""
+    def log(message, level="INFO"):
+        if sink is not None:
+            sink.write(message, level)
+        if quiet and level in ("INFO", "SUCCESS"):
+            return
+        stream = sys.stderr if level in ("ERROR", "WARNING") else sys.stdout
+        print(format_line(time.time(), level, message), file=stream, flush=True)
+    return log
+
+
+def add_convert_arguments(parser):
+    """convert与coordinate共用的参数"""
+    parser.add_argument("inputs", nargs="+", help="输入文件或通配符，如 'books/**/*.txt'")
+    add_synthesis_arguments(parser)
+
+
+def add_synthesis_arguments(parser):
+    """语音、输出、缓存和日志相关的参数"""
+    parser.add_argument("-v", "--voice", action="append", default=None,
+                        help="语音ID、显示名称或英文短名（如 Xiaoxiao、Jenny）；"
+                             "可重复或用逗号分隔，每个文件为每个语音各生成一个MP3")
+    parser.add_argument("-r", "--rate", type=percent, default="+0%", help="语速，如 +10%%")
+    parser.add_argument("--volume", type=percent, default="+0%", help="音量，如 -10%%")
+    parser.add_argument("-j", "--concurrency", type=concurrency, default=DEFAULT_CONCURRENCY,
+                        help=f"并发数 (1-{MAX_CONCURRENCY})")
+    parser.add_argument("-o", "--output-dir", default=os.path.join(os.getcwd(), "audio_output"),
+                        help="输出目录")
+    parser.add_argument("--cache-dir", default=None, help="缓存目录，默认 ./tts_cache")
+    parser.add_argument("--no-cache", action="store_true", help="不使用合成缓存")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="忽略输出目录中的任务清单，全部重新转换")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="edge",
+                        help="合成后端；stub在本地生成静音MP3，用于离线压测")
+    parser.add_argument("-q", "--quiet", action="store_true", help="只输出警告和错误")
+    parser.add_argument("--log-file", default=None, help="同时把日志追加写入该文件")
+    parser.add_argument("--log-json", action="store_true", help="日志文件使用JSON Lines格式")
+
+
+def add_metrics_argument(parser):
+    parser.add_argument("--metrics", default=None, metavar="FILE",
+                        help="每批结束后写出分阶段耗时统计；.json为JSON，"
+                             "其他扩展名（如 .prom）为Prometheus文本格式")
+
+
+def add_subtitles_argument(parser):
+    parser.add_argument("--subtitles", type=subtitle_formats, default=None, metavar="FORMATS",
+                        help="合成时收集逐词边界，在每个MP3旁边写出同名字幕，如 srt、vtt 或 srt,vtt")
+
+
+def add_dedup_argument(parser):
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="不做批次内去重；默认先把所有文件分段，重复的分段只合成一次")
+
+
+def bitrate(value):
+    """校验码率参数，例如 24k"""
+    try:
+        return parse_bitrate(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def add_postprocess_arguments(parser):
+    parser.add_argument("--loudness", type=loudness, default=None, metavar="LUFS",
+                        help="把每个输出文件的响度归一化到该值，如 -16（需要ffmpeg）")
+    parser.add_argument("--paragraph-gap", type=paragraph_gap, default=0.0, metavar="SECONDS",
+                        help="在原文的段落之间额外插入这么多秒的停顿（需要ffmpeg）")
+    parser.add_argument("--format", dest="output_format", choices=sorted(OUTPUT_FORMATS),
+                        default=DEFAULT_FORMAT,
+                        help="输出格式，默认mp3；其他格式由合成的MP3转码得到（需要ffmpeg）")
+    parser.add_argument("--bitrate", type=bitrate, default=None, metavar="KBPS",
+                        help="输出码率，如 24k；默认mp3为48k、opus为24k、ogg为48k，wav不使用")
+
+
+def check_postprocess_args(args, log):
+    """使用后处理或转码时检查ffmpeg是否可用"""
+    if args.loudness is not None or args.paragraph_gap:
+        needed = "--loudness 和 --paragraph-gap"
+    elif needs_transcoding(args.output_format, args.bitrate,
+                           BACKENDS[args.backend].output_format):
+        needed = f"输出格式 {args.output_format}"
+        if args.bitrate is not None:
+            needed += f" {args.bitrate}k"
+    else:
+        return True
+    if find_ffmpeg() is None:
+        log(f"{needed} 需要ffmpeg，请先安装并加入PATH", "ERROR")
+        return False
+    return True
+
+
+def resolve_voice_args(values, log, cache_dir=None):
+    """解析 -v 参数（可重复、可逗号分隔），有未知语音时返回None
+
+    除内置语音外，也可使用本地语音目录快照中的语音（不联网）。
+    """
+    load_catalog(cache_dir, offline=True)
+    voice_names = [name.strip() for value in (values or [DEFAULT_VOICE])
+                   for name in value.split(",") if name.strip()]
+    voice_ids = []
+    for name in voice_names:
+        voice_id = resolve_voice(name)
+        if voice_id is None:
+            log(f"未知的语音: {name}，可用 'python -m tts_core voices' 查看", "ERROR")
+            return None
+        voice_ids.append(voice_id)
+    return voice_ids
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m tts_core",
+        description="文本转音频批量工具 (Edge-TTS版) - 命令行模式",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert = subparsers.add_parser("convert", help="批量转换文本文件为MP3")
+    add_convert_arguments(convert)
+    add_metrics_argument(convert)
+    add_subtitles_argument(convert)
+    add_dedup_argument(convert)
+    add_postprocess_arguments(convert)
+    convert.set_defaults(func=cmd_convert)
+
+    coordinate = subparsers.add_parser("coordinate", help="分布式转换：提交任务并汇总结果")
+    add_convert_arguments(coordinate)
+    coordinate.add_argument("--spool", required=True, help="任务目录，所有工作进程都要能访问")
+    coordinate.add_argument("--workers", type=int, default=0,
+                            help="在本机额外启动的工作进程数，0表示只使用外部工作进程")
+    coordinate.add_argument("--lease-timeout", type=float, default=DEFAULT_LEASE_TIMEOUT,
+                            help="任务心跳超时（秒），超时后重新放回队列")
+    coordinate.set_defaults(func=cmd_coordinate)
+
+    worker = subparsers.add_parser("worker", help="分布式转换：从任务目录领取并执行任务")
+    worker.add_argument("spool", help="任务目录")
+    worker.add_argument("-j", "--concurrency", type=concurrency, default=DEFAULT_CONCURRENCY,
+                        help=f"同时执行的任务数 (1-{MAX_CONCURRENCY})")
+    worker.add_argument("--id", default=None, help="工作进程名称，默认为 主机名-进程号")
+    worker.add_argument("--shard", type=parse_shard, default=None,
+                        help="只领取属于该分片的任务，如 0/4")
+    worker.add_argument("--idle-exit", type=float, default=None,
+                        help="连续空闲这么多秒后退出，默认一直运行")
+    worker.add_argument("--cache-dir", default=None, help="缓存目录，默认 ./tts_cache")
+    worker.add_argument("--no-cache", action="store_true", help="不使用合成缓存")
+    worker.add_argument("-q", "--quiet", action="store_true", help="只输出警告和错误")
+    worker.set_defaults(func=cmd_worker)
+
+    watch = subparsers.add_parser("watch", help="监视文件夹，自动转换新增或修改的文本文件")
+    watch.add_argument("folder", help="要监视的文件夹")
+    add_synthesis_arguments(watch)
+    add_metrics_argument(watch)
+    add_subtitles_argument(watch)
+    add_dedup_argument(watch)
+    add_postprocess_arguments(watch)
+    watch.add_argument("--pattern", action="append", default=None,
+                       help="文件名通配符，可重复，默认 *.txt")
+    watch.add_argument("--recursive", action="store_true", help="同时监视子文件夹")
+    watch.add_argument("--interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                       help="扫描间隔（秒）")
+    watch.add_argument("--settle", type=float, default=DEFAULT_SETTLE_TIME,
+                       help="文件多久不再变化才开始转换（秒）")
+    watch.add_argument("--skip-existing", action="store_true",
+                       help="忽略启动时已存在的文件，只处理之后新增或修改的文件")
+    watch.set_defaults(func=cmd_watch)
+
+    serve = subparsers.add_parser("serve", help="启动本地HTTP合成服务")
+    serve.add_argument("--host", default=DEFAULT_HOST, help=f"监听地址，默认 {DEFAULT_HOST}")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"监听端口，默认 {DEFAULT_PORT}")
+    serve.add_argument("-j", "--concurrency", type=concurrency, default=DEFAULT_CONCURRENCY,
+                       help=f"同时进行的合成数 (1-{MAX_CONCURRENCY})")
+    serve.add_argument("--work-dir", default=None,
+                       help="批量任务的输入输出目录，默认 ./tts_server")
+    serve.add_argument("--input-root", default=None, metavar="DIR",
+                       help="允许批量任务通过 files 读取的服务器目录；默认不允许，只接受 texts")
+    serve.add_argument("--hot-cache-mb", type=float, default=DEFAULT_HOT_CACHE_BYTES / (1024 * 1024),
+                       help="短文本内存缓存的大小上限（MB），0表示不使用")
+    serve.add_argument("--cache-dir", default=None, help="缓存目录，默认 ./tts_cache")
+    serve.add_argument("--no-cache", action="store_true", help="不使用磁盘合成缓存")
+    serve.add_argument("--backend", choices=sorted(BACKENDS), default="edge",
+                       help="合成后端；stub在本地生成静音MP3，用于离线测试")
+    serve.add_argument("-q", "--quiet", action="store_true", help="只输出警告和错误")
+    serve.add_argument("--log-file", default=None, help="同时把日志追加写入该文件")
+    serve.add_argument("--log-json", action="store_true", help="日志文件使用JSON Lines格式")
+    serve.set_defaults(func=cmd_serve)
+
+    voices = subparsers.add_parser("voices", help="列出可用语音")
+    voices.add_argument("-l", "--locale", default=None, help="只列出该语言的语音，如 zh-CN 或 zh")
+    voices.add_argument("-g", "--gender", choices=sorted(GENDER_NAMES), default=None,
+                        help="只列出该性别的语音")
+    voices.add_argument("--refresh", action="store_true", help="忽略有效期，重新在线获取语音列表")
+    voices.add_argument("--offline", action="store_true", help="不联网，只使用本地快照或内置列表")
+    voices.add_argument("--cache-dir", default=None, help="语音列表快照所在的缓存目录，默认 ./tts_cache")
+    voices.set_defaults(func=cmd_voices)
+    return parser
+
+
+def with_log_sink(run):
+    """按 --log-file/--log-json 参数创建日志文件，执行run(args, log)后关闭"""
+    def command(args):
+        sink = LogSink(args.log_file, json_lines=args.log_json) if args.log_file else None
+        try:
+            return run(args, make_logger(args.quiet, sink))
+        finally:
+            if sink is not None:
+                sink.close()
+    return command
+
+
+def cmd_convert(args):
+    """执行批量转换，全部成功返回0"""
+    return with_log_sink(run_convert)(args)
+
+
+def run_convert(args, log):
+    """按命令行参数执行批量转换"""
+    voice_ids = resolve_voice_args(args.voice, log, args.cache_dir)
+    if voice_ids is None:
+        return 2
+
+    input_files = expand_inputs(args.inputs)
+    if not input_files:
+        log("没有找到匹配的输入文件", "ERROR")
+        return 2
+    if not check_postprocess_args(args, log):
+        return 2
+
+    cache = None if args.no_cache else SynthesisCache(args.cache_dir)
+
+    converter = TextToSpeechConverter(
+        args.output_dir,
+        voice_ids=voice_ids,
+        rate=args.rate,
+        volume=args.volume,
+        concurrency=args.concurrency,
+        cache=cache,
+        resume=not args.no_resume,
+        backend=create_backend(args.backend),
+        metrics_file=args.metrics,
+        subtitles=args.subtitles,
+        dedup=not args.no_dedup,
+        loudness=args.loudness,
+        paragraph_gap=args.paragraph_gap,
+        output_format=args.output_format,
+        bitrate=args.bitrate,
+        log=log,
+    )
+
+    log(f"开始批量转换，共 {len(input_files)} 个文件")
+    log(f"输出目录: {args.output_dir}")
+    if args.backend != "edge":
+        log(f"合成后端: {args.backend}", "WARNING")
+    log(f"语音ID: {', '.join(converter.voice_ids)}，语速: {args.rate}，音量: {args.volume}，并发数: {converter.engine.concurrency}")
+    if args.subtitles:
+        log(f"字幕格式: {', '.join(args.subtitles)}")
+    if args.loudness is not None:
+        log(f"响度归一化: {args.loudness:g} LUFS")
+    if args.paragraph_gap:
+        log(f"段落停顿: {args.paragraph_gap:g} 秒")
+    if converter.transcoding:
+        log(f"输出格式: {args.output_format}"
+            + (f" {args.bitrate}k" if args.bitrate is not None else ""))
+
+    results = converter.run_batch(input_files)
+    success_count = results.count(True)
+    fail_count = len(results) - success_count
+
+    log(f"批量转换完成: 成功 {success_count} 个，失败 {fail_count} 个",
+        "SUCCESS" if not fail_count else "WARNING")
+    log(f"合成请求: {converter.engine.synthesis_count} 次")
+    log(f"限流: {converter.engine.limiter.summary()}")
+    log(f"耗时: {converter.metrics.summary()}")
+    if args.metrics:
+        log(f"统计已写入: {args.metrics}")
+    if cache is not None:
+        log(f"缓存: {cache.summary()}")
+    return 0 if not fail_count else 1
+
+
+def cmd_coordinate(args):
+    """提交分布式任务并等待全部完成，全部成功返回0"""
+    return with_log_sink(run_coordinate)(args)
+
+
+def run_coordinate(args, log):
+    voice_ids = resolve_voice_args(args.voice, log, args.cache_dir)
+    if voice_ids is None:
+        return 2
+    input_files = expand_inputs(args.inputs)
+    if not input_files:
+        log("没有找到匹配的输入文件", "ERROR")
+        return 2
+
+    coordinator = SpoolCoordinator(
+        args.spool, args.output_dir, voice_ids,
+        rate=args.rate, volume=args.volume, backend=args.backend,
+        resume=not args.no_resume, lease_timeout=args.lease_timeout, log=log,
+    )
+    log(f"分布式转换，共 {len(input_files)} 个文件，任务目录: {args.spool}")
+    coordinator.submit(input_files)
+
+    workers = []
+    if args.workers > 0:
+        workers = spawn_local_workers(args.spool, args.workers, args.concurrency,
+                                      cache_dir=args.cache_dir, no_cache=args.no_cache)
+        log(f"已在本机启动 {len(workers)} 个工作进程")
+    try:
+        results = coordinator.wait()
+    except KeyboardInterrupt:
+        coordinator.cancel()
+        log("已取消，未领取的任务已删除", "WARNING")
+        return 1
+    finally:
+        stop_workers(workers)
+
+    success_count = results.count(True)
+    fail_count = len(results) - success_count
+    log(f"批量转换完成: 成功 {success_count} 个，失败 {fail_count} 个",
+        "SUCCESS" if not fail_count else "WARNING")
+    return 0 if not fail_count else 1
+
+
+def cmd_worker(args):
+    """持续从任务目录领取任务，Ctrl+C退出"""
+    log = make_logger(args.quiet)
+    cache = None if args.no_cache else SynthesisCache(args.cache_dir)
+    worker = SpoolWorker(args.spool, worker_id=args.id, concurrency=args.concurrency,
+                         cache=cache, shard=args.shard, log=log)
+    try:
+        worker.run(idle_exit=args.idle_exit)
+    except KeyboardInterrupt:
+        log(f"工作进程 {worker.worker_id} 已停止", "WARNING")
+    return 0
+
+
+def cmd_watch(args):
+    """监视文件夹直到按Ctrl+C"""
+    return with_log_sink(run_watch)(args)
+
+
+def run_watch(args, log):
+    voice_ids = resolve_voice_args(args.voice, log, args.cache_dir)
+    if voice_ids is None:
+        return 2
+    if not os.path.isdir(args.folder):
+        log(f"文件夹不存在: {args.folder}", "ERROR")
+        return 2
+    if not check_postprocess_args(args, log):
+        return 2
+
+    service = WatchService(
+        args.folder, args.output_dir,
+        converter_options={
+            "voice_ids": voice_ids,
+            "rate": args.rate,
+            "volume": args.volume,
+            "concurrency": args.concurrency,
+            "cache": None if args.no_cache else SynthesisCache(args.cache_dir),
+            "resume": not args.no_resume,
+            "backend": create_backend(args.backend),
+            "metrics_file": args.metrics,
+            "subtitles": args.subtitles,
+            "dedup": not args.no_dedup,
+            "loudness": args.loudness,
+            "paragraph_gap": args.paragraph_gap,
+            "output_format": args.output_format,
+            "bitrate": args.bitrate,
+        },
+        patterns=args.pattern or ["*.txt"],
+        recursive=args.recursive,
+        poll_interval=args.interval,
+        settle_time=args.settle,
+        skip_existing=args.skip_existing,
+        log=log,
+    )
+    try:
+        service.run()
+    except KeyboardInterrupt:
+        log(f"停止监视: 共 {service.batches} 批，转换 {service.converted} 个文件，"
+            f"失败 {service.failed} 个", "WARNING")
+    return 0
+
+
+def cmd_serve(args):
+    """运行HTTP合成服务直到按Ctrl+C"""
+    return with_log_sink(run_serve)(args)
+
+
+def run_serve(args, log):
+    # 语音名称也可以使用本地语音目录快照中的语音（不联网）
+    load_catalog(args.cache_dir, offline=True)
+    engine = BatchEngine(
+        concurrency=args.concurrency,
+        cache=None if args.no_cache else SynthesisCache(args.cache_dir),
+        backend=create_backend(args.backend),
+        log=log,
+    )
+    service = SynthesisService(engine, work_dir=args.work_dir,
+                               hot_cache=HotCache(int(args.hot_cache_mb * 1024 * 1024)),
+                               input_root=args.input_root, log=log)
+    if args.backend != "edge":
+        log(f"合成后端: {args.backend}", "WARNING")
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        log(f"无法启动服务: {e}", "ERROR")
+        return 1
+    log(f"服务已停止: 请求 {service.requests} 次，合并 {service.coalesced} 次，"
+        f"合成 {engine.synthesis_count} 次")
+    return 0
+
+
+def cmd_voices(args):
+    """列出语音目录中的语音"""
+    log = make_logger()
+    catalog = load_catalog(args.cache_dir, refresh=args.refresh, offline=args.offline, log=log)
+    voices = catalog.find(locale=args.locale, gender=args.gender)
+    for voice in voices:
+        print(f"{voice['id']:<36} {voice['suffix']:<20} {voice['display']}")
+    log(f"共 {len(voices)} 个语音（目录: {len(catalog)} 个，来源: {catalog.source}）")
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,543 @@
+"""文本转音频转换核心
+
+与界面无关的批量转换逻辑，图形界面和命令行共用。
+"""
+import asyncio
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .cache import SynthesisCache
+from .dedup import (SHARED_DIR_NAME, SharedChunks, choose_shared_runs,
+                    split_with_shared_runs)
+from .engine import BatchEngine, DEFAULT_CHUNK_LENGTH, DEFAULT_CONCURRENCY, remove_file
+from .manifest import JobManifest, file_hash, text_hash
+from .mp3 import estimate_audio_bytes
+from .postprocess import (DEFAULT_FORMAT, format_extension, needs_transcoding,
+                          paragraph_gap_positions, process_file, shift_for_gaps)
+from .subtitles import boundaries_path, subtitle_path, write_subtitles
+from .text import read_text_file, split_long_text
+from .voices import DEFAULT_VOICE, get_output_filename
+
+# 字节级进度至少变化这么多（百分点）才通知界面
+PROGRESS_STEP = 0.5
+
+
+class TextToSpeechConverter:
+    """批量文本转音频转换器"""
+
+    def __init__(self, output_dir, voice_id=DEFAULT_VOICE, rate="+0%", volume="+0%",
+                 concurrency=DEFAULT_CONCURRENCY, cache=None, communicate_factory=None,
+                 streaming=True, resume=True, backend=None, voice_ids=None, metrics_file=None,
+                 subtitles=None, dedup=True, limiter=None, loudness=None, paragraph_gap=0.0,
+                 output_format=DEFAULT_FORMAT, bitrate=None, log=None, progress=None,
+                 progress_info=None):
+        self.output_dir = output_dir
+        # voice_ids不为空时，每个输入文件按列表中的每个语音各生成一个输出文件
+        self.voice_ids = list(dict.fromkeys(voice_ids)) if voice_ids else [voice_id]
+        self.voice_id = self.voice_ids[0]
+        self.rate = rate
+        self.volume = volume
+        self.cache = cache
+
+        # 回调：log(message, level)、progress(value, message)、progress_info(message)
+        self.log = log or (lambda message, level="INFO": None)
+        self.progress = progress or (lambda value, message: None)
+        self.progress_info = progress_info or (lambda message: None)
+
+        self.engine = BatchEngine(concurrency=concurrency, cache=cache,
+                                  communicate_factory=communicate_factory, backend=backend,
+                                  streaming=streaming, limiter=limiter, log=self.log)
+        # 已分配但尚未写出的输出文件，避免并发任务使用相同文件名
+        self.reserved_outputs = set()
+        # 为True时使用输出目录中的任务清单，跳过已完成的文件和分段
+        self.resume = resume
+        self.manifest = None
+        # 每批的分段耗时统计，与引擎共用；metrics_file不为空时每批结束后写出
+        # （.json为JSON，其他扩展名为Prometheus文本格式）
+        self.metrics = self.engine.metrics
+        self.metrics_file = metrics_file
+        # 字幕格式列表（"srt"、"vtt"），不为空时在每个MP3旁边写出同名字幕文件
+        self.subtitles = list(subtitles or [])
+        # 为True时先把整批文件分段，批次中重复的分段只合成一次
+        self.dedup = dedup
+        # 后处理：loudness为目标响度（LUFS），paragraph_gap为段落之间额外插入的停顿（秒）；
+        # 在进程池中解码PCM处理后重新编码，需要ffmpeg
+        self.loudness = loudness
+        self.paragraph_gap = paragraph_gap
+        self._postprocess_pool = None
+        # 输出格式和码率（kbps，None为该格式的默认值）；后端不能直接产生时，
+        # 先合成为MP3再在进程池中转码，转码结果按格式缓存
+        self.output_format = output_format
+        self.bitrate = bitrate
+        self.transcoding = needs_transcoding(output_format, bitrate,
+                                             self.engine.backend.output_format)
+        self.format_cache = None
+        if cache is not None and self.encoding:
+            self.format_cache = cache.for_format(output_format, format_extension(output_format))
+
+    def run_batch(self, input_files, should_continue=None, loop_thread=None):
+        """同步执行批量转换，返回每个文件的结果列表
+
+        loop_thread为LoopThread时在其常驻事件循环中执行，否则新建一个事件循环。
+        """
+        coro = self.convert_batch(input_files, should_continue)
+        if loop_thread is not None:
+            return loop_thread.run(coro)
+        return asyncio.run(coro)
+
+    async def convert_batch(self, input_files, should_continue=None):
+        """在引擎工作池中并发转换所有输入文件"""
+        total_files = len(input_files)
+        self.metrics.start()
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self.resume:
+            self.manifest = JobManifest.load(self.output_dir)
+            # 清单中其他文件的输出路径同样视为已占用
+            self.reserved_outputs.update(
+                self.manifest.output_path(job) for job in self.manifest.jobs.values())
+
+        # 每个文件的完成比例，总体进度为其平均值
+        file_progress = [0.0] * total_files
+        completed_count = 0
+        last_reported = -PROGRESS_STEP
+
+        def report_progress(force=False):
+            nonlocal last_reported
+            progress = sum(file_progress) / total_files * 100
+            if force or progress - last_reported >= PROGRESS_STEP:
+                last_reported = progress
+                self.progress(progress, f"已完成 {completed_count}/{total_files}")
+
+        plans = None
+
+        async def worker(index, input_file):
+            self.log(f"正在处理文件 {index+1}/{total_files}: {os.path.basename(input_file)}")
+            self.progress_info(f"正在处理文件 {index+1}/{total_files}: {os.path.basename(input_file)}")
+
+            def on_fraction(fraction):
+                file_progress[index] = fraction
+                report_progress()
+
+            plan = None
+            if plans is not None:
+                # 计划用完即释放，不在内存中保留已转换文件的分段
+                plan, plans[index] = plans[index], None
+                if plan is None:
+                    return False
+            return await self.convert_file(input_file, on_fraction, plan)
+
+        def on_done(index, input_file, success, completed):
+            nonlocal completed_count
+            completed_count = completed
+            self.metrics.add("files" if success else "failed_files")
+            file_progress[index] = 1.0
+            report_progress(force=True)
+
+        try:
+            if self.dedup:
+                self.progress_info(f"正在读取和分段 {total_files} 个文件...")
+                plans = await self.plan_batch(input_files)
+            return await self.engine.run(input_files, worker, on_done,
+                                         should_continue=should_continue)
+        finally:
+            shared = self.engine.shared
+            if shared is not None:
+                self.engine.shared = None
+                await shared.close()
+                if shared.reused:
+                    self.log(f"重复分段: {shared.summary()}")
+            if self._postprocess_pool is not None:
+                pool, self._postprocess_pool = self._postprocess_pool, None
+                await asyncio.get_running_loop().run_in_executor(None, pool.shutdown)
+            if self.manifest is not None:
+                self.manifest.save(force=True)
+            self.metrics.stop()
+            if self.metrics_file:
+                try:
+                    self.metrics.write(self.metrics_file)
+                except OSError as e:
+                    self.log(f"写出统计文件失败: {self.metrics_file}: {e}", "WARNING")
+
+    def reserve_output_file(self, input_file, voice_id=None):
+        """生成不与已有文件冲突的输出路径"""
+        output_filename = get_output_filename(input_file, voice_id or self.voice_id,
+                                              format_extension(self.output_format))
+        output_file = os.path.join(self.output_dir, output_filename)
+
+        # 避免文件名重复（如果重名才添加序号）
+        counter = 1
+        original_output_file = output_file
+        base_name_without_ext, extension = os.path.splitext(output_filename)
+
+        while os.path.exists(output_file) or output_file in self.reserved_outputs:
+            # 如果文件已存在，添加序号
+            new_filename = f"{base_name_without_ext}_{counter:03d}{extension}"
+            output_file = os.path.join(self.output_dir, new_filename)
+            counter += 1
+            if counter > 100:  # 避免无限循环
+                break
+
+        self.reserved_outputs.add(output_file)
+
+        if output_file != original_output_file:
+            self.log(f"文件名重复，添加序号: {os.path.basename(output_file)}", "WARNING")
+        return output_file
+
+    def job_settings(self, voice_id):
+        """影响输出内容的参数，任一变化时需要重新合成"""
+        settings = {
+            "voice": voice_id,
+            "rate": self.rate,
+            "volume": self.volume,
+            "chunk_length": DEFAULT_CHUNK_LENGTH,
+        }
+        if self.engine.backend.name is not None:
+            settings["backend"] = self.engine.backend.name
+        if self.subtitles:
+            settings["subtitles"] = sorted(self.subtitles)
+        if self.loudness is not None:
+            settings["loudness"] = self.loudness
+        if self.paragraph_gap:
+            settings["paragraph_gap"] = self.paragraph_gap
+        if self.output_format != DEFAULT_FORMAT:
+            settings["format"] = self.output_format
+        if self.bitrate is not None:
+            settings["bitrate"] = self.bitrate
+        return settings
+
+    @property
+    def postprocessing(self):
+        return self.loudness is not None or bool(self.paragraph_gap)
+
+    @property
+    def encoding(self):
+        """合成结果是否需要经过ffmpeg解码再编码"""
+        return self.postprocessing or self.transcoding
+
+    def source_path(self, output_file):
+        """合成拼接结果的路径；需要转码时为输出文件旁边的临时MP3"""
+        return f"{output_file}.src.mp3" if self.transcoding else output_file
+
+    def matches_format(self, output_file):
+        """已有的输出路径是否为当前输出格式的扩展名"""
+        return output_file.endswith("." + format_extension(self.output_format))
+
+    def encoding_key(self, source_file, positions):
+        """转码结果的缓存键：合成结果的内容哈希与所有影响编码输出的参数"""
+        payload = json.dumps([file_hash(source_file), self.output_format, self.bitrate,
+                              self.loudness, self.paragraph_gap, positions])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def postprocess(self, source_file, output_file, boundaries):
+        """在进程池中对合成结果做响度归一化、段落停顿和格式转换，返回平移后的逐词边界
+
+        相同的合成结果以相同参数编码过时直接使用缓存的输出。
+        """
+        positions = paragraph_gap_positions(boundaries or []) if self.paragraph_gap else []
+        loop = asyncio.get_running_loop()
+        key = None
+        stats = None
+        try:
+            if self.format_cache is not None:
+                key = await loop.run_in_executor(None, self.encoding_key, source_file, positions)
+                if await loop.run_in_executor(None, self.format_cache.get, key, output_file):
+                    stats = {"loudness": None, "gaps": 0}
+                    self.log(f"使用缓存的{self.output_format}输出: {os.path.basename(output_file)}")
+            if stats is None:
+                if self._postprocess_pool is None:
+                    self._postprocess_pool = ProcessPoolExecutor()
+                with self.metrics.timer("postprocess"):
+                    stats = await loop.run_in_executor(
+                        self._postprocess_pool, process_file, source_file, output_file,
+                        self.loudness, positions, self.paragraph_gap, self.output_format,
+                        self.bitrate)
+                if key is not None:
+                    await loop.run_in_executor(None, self.format_cache.put, key, output_file)
+        finally:
+            if source_file != output_file:
+                remove_file(source_file)
+        if stats["loudness"] is not None:
+            self.log(f"响度 {stats['loudness']:.1f} LUFS，增益 {stats['gain']:+.1f} dB: "
+                     f"{os.path.basename(output_file)}")
+        if stats["gaps"]:
+            self.log(f"插入 {stats['gaps']} 处段落停顿: {os.path.basename(output_file)}")
+        if boundaries is None:
+            return None
+        return shift_for_gaps(boundaries, positions, self.paragraph_gap)
+
+    def subtitles_present(self, output_file):
+        """输出文件旁边的字幕文件是否都在"""
+        return all(os.path.exists(subtitle_path(output_file, subtitle_format))
+                   for subtitle_format in self.subtitles)
+
+    def start_job(self, input_file, voice_id, output_file, previous, source, chunks):
+        """在清单中登记本次转换，并删除上次多出来的分段文件"""
+        previous_count = len(previous.get("chunks") or []) if previous else 0
+        for index in range(len(chunks), previous_count):
+            part_file = f"{self.source_path(output_file)}.part{index:04d}"
+            remove_file(part_file)
+            remove_file(boundaries_path(part_file))
+        chunk_keys = [SynthesisCache.make_key(chunk, voice_id, self.rate, self.volume,
+                                              self.engine.backend.name)
+                      for chunk in chunks]
+        return self.manifest.start(input_file, voice_id, output_file, source,
+                                   self.job_settings(voice_id), chunk_keys)
+
+    async def prepare_file(self, input_file, keep_text=False):
+        """读取并分段单个文件，返回转换计划
+
+        计划为字典：source（文本哈希，不使用清单时为None）、voice_ids（需要生成的语音，
+        全部已完成时为空）、chunks（分段）和expected_bytes（估算的音频总字节数）；
+        keep_text为True且有需要生成的语音时还包含原文text。
+        文件不存在或读取失败时返回None。
+        """
+        # 检查文件是否存在
+        if not os.path.exists(input_file):
+            self.log(f"文件不存在: {input_file}", "ERROR")
+            return None
+
+        # 步骤1：读取文件（放到线程池中，避免阻塞其他转换任务）
+        loop = asyncio.get_running_loop()
+        try:
+            with self.metrics.timer("read"):
+                text_content = await loop.run_in_executor(None, read_text_file, input_file)
+        except Exception as e:
+            self.log(f"读取文件失败: {input_file}: {str(e)}", "ERROR")
+            return None
+
+        text_length = len(text_content)
+        self.log(f"读取成功，文本长度: {text_length} 字符")
+
+        # 上次已完成且输出文件未被改动的语音直接跳过
+        voice_ids = list(self.voice_ids)
+        source = None
+        if self.manifest is not None:
+            source = text_hash(text_content)
+            voice_ids = []
+            for voice_id in self.voice_ids:
+                job = self.manifest.get(input_file, voice_id)
+                if await loop.run_in_executor(None, self.manifest.is_complete, job, source,
+                                              self.job_settings(voice_id)) \
+                        and self.subtitles_present(self.manifest.output_path(job)):
+                    self.log(f"已完成且校验通过，跳过: "
+                             f"{os.path.basename(self.manifest.output_path(job))}", "SUCCESS")
+                else:
+                    voice_ids.append(voice_id)
+            if not voice_ids:
+                return {"source": source, "voice_ids": [], "chunks": [], "expected_bytes": 0}
+
+        # 长文本按句子分段，各段并行合成
+        with self.metrics.timer("split"):
+            chunks = split_long_text(text_content, max_length=DEFAULT_CHUNK_LENGTH)
+        if len(chunks) > 1:
+            self.log(f"文本较长 ({text_length} 字符)，已分割为 {len(chunks)} 段并行合成")
+
+        plan = {
+            "source": source,
+            "voice_ids": voice_ids,
+            "chunks": chunks,
+            "expected_bytes": estimate_audio_bytes(text_content) * len(voice_ids),
+        }
+        if keep_text:
+            plan["text"] = text_content
+        return plan
+
+    async def plan_batch(self, input_files):
+        """先读取并分段所有文件，找出在批次中重复出现的分段
+
+        返回与input_files顺序一致的计划列表；有重复分段时为引擎设置SharedChunks，
+        每个重复的 (分段, 语音) 只合成一次。在批次中多次出现的较长段落（页眉、免责声明等）
+        在能减少请求时先从正文中单独切出来，即使位于各不相同的章节中间也能共用合成结果；
+        切出后整批的合成请求不比普通分段少时，全部沿用普通分段。
+        """
+        plans = await asyncio.gather(*(self.prepare_file(input_file, keep_text=True)
+                                       for input_file in input_files))
+        shared = SharedChunks(os.path.join(self.output_dir, SHARED_DIR_NAME))
+        backend_name = self.engine.backend.name
+
+        def request_keys(plan, chunks):
+            return [shared.make_key(chunk, voice_id, self.rate, self.volume, backend_name)
+                    for voice_id in plan["voice_ids"] for chunk in chunks]
+
+        with self.metrics.timer("split"):
+            repeated, chosen = choose_shared_runs(
+                (plan["text"] for plan in plans if plan and "text" in plan), DEFAULT_CHUNK_LENGTH)
+            alternatives = {}
+            for index, plan in enumerate(plans):
+                text = plan.pop("text", None) if plan else None
+                if text is None or not chosen:
+                    continue
+                chunks = split_with_shared_runs(text, repeated, chosen, DEFAULT_CHUNK_LENGTH)
+                if chunks != plan["chunks"] and not self.prefers_recorded(input_files[index],
+                                                                          plan, chunks):
+                    alternatives[index] = chunks
+
+            baseline_keys = [request_keys(plan, plan["chunks"]) if plan else [] for plan in plans]
+            baseline_requests = sum(len(keys) for keys in baseline_keys)
+            if alternatives:
+                keys = [request_keys(plan, alternatives[index]) if index in alternatives else
+                        baseline_keys[index] for index, plan in enumerate(plans)]
+                if len(set().union(*keys)) < len(set().union(*baseline_keys)):
+                    for index, chunks in alternatives.items():
+                        plans[index]["chunks"] = chunks
+                    baseline_keys = keys
+
+        shared.baseline_requests = baseline_requests
+        for keys in baseline_keys:
+            for key in keys:
+                shared.plan(key)
+        if shared.duplicates:
+            self.log(f"批次中有 {shared.duplicates} 个重复的合成任务，每个不同的分段只合成一次")
+            self.engine.shared = shared
+        return plans
+
+    def prefers_recorded(self, input_file, plan, chunks):
+        """清单中该文件上次的分段与普通分段更接近时返回True
+
+        沿用上次的切分方式，已完成的分段（按序号和键复用）和合成缓存不会因为
+        批次中其他文件的变化而失效。
+        """
+        if self.manifest is None:
+            return False
+        recorded = set()
+        for voice_id in plan["voice_ids"]:
+            job = self.manifest.get(input_file, voice_id)
+            if job is not None:
+                recorded.update(chunk.get("key") for chunk in job.get("chunks") or [])
+        if not recorded:
+            return False
+
+        def overlap(candidate):
+            return sum(1 for voice_id in plan["voice_ids"] for chunk in candidate
+                       if SynthesisCache.make_key(chunk, voice_id, self.rate, self.volume,
+                                                  self.engine.backend.name) in recorded)
+
+        return overlap(plan["chunks"]) > overlap(chunks)
+
+    async def convert_file(self, input_file, on_fraction=None, plan=None):
+        """转换单个文件
+
+        文件只读取和分段一次，再为每个语音各生成一个输出文件，所有 (分段, 语音)
+        合成任务共用引擎的并发名额。全部语音成功时返回True。
+        on_fraction(比例) 根据已接收的音频字节数报告该文件的大致完成比例；
+        plan为plan_batch已经生成的计划，为None时在这里读取和分段。
+        """
+        try:
+            self.log(f"--- 开始转换文件: {os.path.basename(input_file)} ---")
+            if plan is None:
+                plan = await self.prepare_file(input_file)
+                if plan is None:
+                    return False
+            voice_ids = plan["voice_ids"]
+            chunks = plan["chunks"]
+            if not voice_ids:
+                return True
+            if len(voice_ids) > 1:
+                self.log(f"同时生成 {len(voice_ids)} 个语音，共 {len(chunks) * len(voice_ids)} 个合成任务")
+
+            # 步骤2：使用Edge-TTS转换为音频
+            self.log(f"正在使用Edge-TTS生成音频...")
+
+            # 按估算的音频大小把接收到的字节数换算成进度
+            expected_bytes = plan["expected_bytes"]
+            received_bytes = 0
+
+            def on_bytes(size):
+                nonlocal received_bytes
+                received_bytes += size
+                if on_fraction is not None:
+                    on_fraction(min(received_bytes / expected_bytes, 0.99))
+
+            results = await asyncio.gather(*(
+                self.render_voice(input_file, voice_id, chunks, plan["source"], on_bytes)
+                for voice_id in voice_ids
+            ))
+            if all(results):
+                self.log(f"--- 完成转换文件: {os.path.basename(input_file)} ---")
+            return all(results)
+
+        except Exception as e:
+            self.log(f"转换文件时出错: {str(e)}", "ERROR")
+            return False
+
+    async def render_voice(self, input_file, voice_id, chunks, source=None, on_bytes=None):
+        """用一个语音合成已分段的文本并写出输出文件，成功返回True"""
+        manifest = self.manifest
+        job = manifest.get(input_file, voice_id) if manifest is not None else None
+
+        # 生成输出文件名（清单中有记录且格式相同时沿用上次的输出文件）
+        if job is not None and self.matches_format(manifest.output_path(job)):
+            output_file = manifest.output_path(job)
+            self.reserved_outputs.add(output_file)
+        else:
+            output_file = self.reserve_output_file(input_file, voice_id)
+        source_file = self.source_path(output_file)
+
+        synthesis_options = {}
+        if manifest is not None:
+            job = self.start_job(input_file, voice_id, output_file, job, source, chunks)
+            synthesis_options = {
+                "reuse_part": lambda index, part_file: manifest.chunk_reusable(job, index, part_file),
+                "on_part": lambda index, part_file: manifest.chunk_done(job, index, part_file),
+                "keep_parts": True,
+            }
+            reused = sum(1 for chunk in job["chunks"] if "size" in chunk)
+            if reused and len(chunks) > 1:
+                self.log(f"继续上次的转换：{os.path.basename(output_file)} "
+                         f"{reused}/{len(chunks)} 段已完成")
+
+        # 需要字幕或段落停顿时在合成的同时收集逐词边界
+        boundaries = [] if self.subtitles or self.paragraph_gap else None
+        try:
+            await self.engine.synthesize_chunks(
+                chunks, source_file, voice_id,
+                rate=self.rate, volume=self.volume, on_bytes=on_bytes, boundaries=boundaries,
+                **synthesis_options
+            )
+        except Exception as e:
+            self.log(f"Edge-TTS转换失败: {os.path.basename(output_file)}: {str(e)}", "ERROR")
+            if job is not None:
+                manifest.fail(job)
+            return False
+
+        # 检查最终文件
+        if not os.path.exists(source_file):
+            self.log(f"音频文件生成失败: {os.path.basename(output_file)}", "ERROR")
+            return False
+
+        # 按合成的MP3统计音频量（与转码后的格式和码率无关）
+        audio_size = os.path.getsize(source_file)
+        if self.encoding:
+            try:
+                boundaries = await self.postprocess(source_file, output_file, boundaries)
+            except Exception as e:
+                self.log(f"后处理失败: {os.path.basename(output_file)}: {str(e)}", "ERROR")
+                if job is not None:
+                    manifest.fail(job)
+                return False
+
+        output_size = os.path.getsize(output_file)
+        file_size_mb = output_size / (1024 * 1024)
+        self.metrics.add("characters", sum(len(chunk) for chunk in chunks))
+        self.metrics.add("chunks", len(chunks))
+        self.metrics.add("audio_bytes", audio_size)
+        loop = asyncio.get_running_loop()
+        if self.subtitles:
+            try:
+                await loop.run_in_executor(None, write_subtitles, output_file, boundaries,
+                                           self.subtitles)
+            except OSError as e:
+                self.log(f"写出字幕失败: {os.path.basename(output_file)}: {e}", "ERROR")
+                if job is not None:
+                    manifest.fail(job)
+                return False
+            if not boundaries:
+                self.log(f"没有收到逐词边界，字幕为空: {os.path.basename(output_file)}", "WARNING")
+        if job is not None:
+            output_hash = await loop.run_in_executor(None, file_hash, output_file)
+            manifest.finish(job, output_file, output_hash)
+
+        self.log(f"✅ 文件转换成功: {os.path.basename(output_file)} ({file_size_mb:.2f} MB)", "SUCCESS")
+        return True
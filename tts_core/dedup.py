@@ -0,0 +1,260 @@
+"""批次内重复分段的去重
+
+同一批文件中常有大量重复文本（章节标题、免责声明、固定的开场白等）。
+批量转换开始前先把所有文件分段，统计 (规范化文本, 语音, 语速, 音量) 相同的分段；
+出现多次的分段在整个批次中只合成一次，结果保存在输出目录下的临时文件夹中，
+其他出现位置直接复制，批次结束后删除。
+
+分段长达数千字符，整段完全相同的情况只覆盖重复的短文件；章节内部重复的页眉、免责声明
+会和前后的正文合并在不同的分段里。因此分段之前先按段落（换行）统计在批次中出现多次的
+较长段落，相邻的重复段落合并为一个片段；切出片段省下的合成次数多于因此多出的分段时，
+片段单独作为一个分段，其余正文照常按句子分段，这些片段就能和整段重复的分段一样只合成一次。
+"""
+import asyncio
+import hashlib
+import os
+import re
+import shutil
+
+from .cache import SynthesisCache
+from .text import iter_text_chunks, split_long_text
+
+# 输出目录下保存共享分段的临时文件夹
+SHARED_DIR_NAME = ".tts_shared"
+
+# 参与段落级去重的最短段落（规范化后的字符数）。更短的重复行（如章节标题）单独合成
+# 省下的字符很少，却会多出请求并打断前后正文的语调
+MIN_SHARED_PARAGRAPH = 50
+
+NON_SPACE = re.compile(r"\S")
+
+
+def normalize_text(text):
+    """规范化分段文本：合并连续空白并去掉首尾空白，只影响去重时的比较"""
+    return " ".join(text.split())
+
+
+def iter_paragraphs(text):
+    """按换行切分段落（保留换行符），各段拼接后与原文一致"""
+    start = 0
+    length = len(text)
+    while start < length:
+        end = text.find("\n", start)
+        end = length if end == -1 else end + 1
+        yield text[start:end]
+        start = end
+
+
+def paragraph_key(paragraph):
+    """段落的去重键，太短的段落返回None"""
+    normalized = normalize_text(paragraph)
+    if len(normalized) < MIN_SHARED_PARAGRAPH:
+        return None
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()
+
+
+def repeated_paragraphs(texts):
+    """在所有文本中出现多次的较长段落，返回其去重键的集合"""
+    counts = {}
+    for text in texts:
+        for paragraph in iter_paragraphs(text):
+            key = paragraph_key(paragraph)
+            if key is not None:
+                counts[key] = counts.get(key, 0) + 1
+    return {key for key, count in counts.items() if count > 1}
+
+
+def shared_runs(text, repeated):
+    """text中由连续的重复段落组成的片段，返回 [(开始, 结束, 去重键)]
+
+    相邻的重复段落（中间只隔空行时也算相邻）合并为一个片段；片段之前或之后只剩空白时
+    把空白并入片段，不单独产生只有空白的分段。
+    """
+    spans = []
+    run_start = None
+    position = 0
+    for paragraph in iter_paragraphs(text):
+        end = position + len(paragraph)
+        if paragraph_key(paragraph) in repeated:
+            if run_start is None:
+                run_start = position
+            run_end = end
+        elif run_start is not None and not paragraph.isspace():
+            spans.append((run_start, run_end))
+            run_start = None
+        position = end
+    if run_start is not None:
+        spans.append((run_start, run_end))
+
+    runs = []
+    for start, end in spans:
+        if start and NON_SPACE.search(text, 0, start) is None:
+            start = 0
+        if NON_SPACE.search(text, end) is None:
+            end = len(text)
+        normalized = normalize_text(text[start:end])
+        runs.append((start, end, hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()))
+    return runs
+
+
+def count_chunks(text, max_length):
+    """text按普通方式分段得到的分段数"""
+    return sum(1 for _ in iter_text_chunks(text, max_length)) if text else 0
+
+
+def choose_shared_runs(texts, max_length):
+    """选出值得从正文中单独切出的重复片段，返回 (重复段落键集合, 选中的片段键集合)
+
+    切出一个片段会在它前后各多一个切分点，前后的正文可能因此多出分段。对每个出现位置，
+    比较切出前后整个文件的分段数得到多出的分段数；只有省下的合成次数
+    （(出现次数 - 1) × 片段本身的分段数）多于所有出现位置多出的分段数之和时才切出，
+    否则片段留在正常的分段里，不为了去重反而增加请求。
+    """
+    texts = list(texts)
+    repeated = repeated_paragraphs(texts)
+    if not repeated:
+        return repeated, set()
+    runs = [shared_runs(text, repeated) for text in texts]
+    counts = {}
+    for text_runs in runs:
+        for _, _, key in text_runs:
+            counts[key] = counts.get(key, 0) + 1
+
+    # key -> [片段本身的分段数, 切出后多出的分段数]
+    stats = {}
+    for text, text_runs in zip(texts, runs):
+        total = None
+        for start, end, key in text_runs:
+            if counts[key] < 2:
+                continue
+            if total is None:
+                total = count_chunks(text, max_length)
+            pieces = count_chunks(text[start:end], max_length)
+            extra = (count_chunks(text[:start], max_length) + pieces +
+                     count_chunks(text[end:], max_length) - total)
+            entry = stats.setdefault(key, [pieces, 0])
+            entry[1] += extra
+    chosen = {key for key, (pieces, extra) in stats.items()
+              if (counts[key] - 1) * pieces > extra}
+    return repeated, chosen
+
+
+def split_with_shared_runs(text, repeated, chosen, max_length):
+    """分段：选中的重复片段各自单独分段，其余连续的正文照常按句子分段
+
+    各段按顺序拼接后与原文完全一致；没有选中的片段时与 split_long_text 相同。
+    """
+    chunks = []
+    position = 0
+    for start, end, key in shared_runs(text, repeated):
+        if key not in chosen:
+            continue
+        if position < start:
+            chunks.extend(split_long_text(text[position:start], max_length))
+        chunks.extend(split_long_text(text[start:end], max_length))
+        position = end
+    if position < len(text) or not chunks:
+        chunks.extend(split_long_text(text[position:], max_length))
+    return chunks
+
+
+class SharedChunks:
+    """批次内重复分段的合成结果
+
+    plan()登记每个出现位置，fetch()在第一次请求时启动合成，之后的请求等待同一个结果。
+    合成在独立的任务中进行，某个文件失败或被取消不会影响共用该分段的其他文件。
+    """
+
+    def __init__(self, work_dir):
+        self.work_dir = work_dir
+        # key -> 出现次数
+        self.counts = {}
+        # key -> 合成任务，结果为逐词边界列表（未收集时为None）
+        self._tasks = {}
+        # 实际复用的次数和省下的字符数
+        self.reused = 0
+        self.saved_characters = 0
+        # 不去重时按普通分段需要的合成请求数，由plan_batch设置
+        self.baseline_requests = 0
+
+    @staticmethod
+    def make_key(text, voice, rate, volume, backend=None):
+        return SynthesisCache.make_key(normalize_text(text), voice, rate, volume, backend)
+
+    def plan(self, key):
+        """登记分段的一个出现位置"""
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def is_shared(self, key):
+        """分段在批次中是否出现了多次"""
+        return self.counts.get(key, 0) > 1
+
+    @property
+    def duplicates(self):
+        """计划中可以省掉的合成次数"""
+        return sum(count - 1 for count in self.counts.values() if count > 1)
+
+    @property
+    def requests(self):
+        """去重后计划发出的合成请求数"""
+        return len(self.counts)
+
+    def path_for(self, key):
+        return os.path.join(self.work_dir, key + ".mp3")
+
+    async def fetch(self, key, text, output_file, produce, boundaries=None):
+        """把分段的共享结果复制到output_file
+
+        第一次请求时调用 produce(共享文件路径, 边界列表或None) 合成；
+        boundaries为列表时追加该分段的逐词边界。复用了已有的合成结果时返回True。
+        """
+        task = self._tasks.get(key)
+        reused = task is not None
+        if task is None:
+            os.makedirs(self.work_dir, exist_ok=True)
+            path = self.path_for(key)
+            items = None if boundaries is None else []
+
+            async def run():
+                await produce(path, items)
+                return items
+
+            task = self._tasks[key] = asyncio.ensure_future(run())
+        try:
+            items = await asyncio.shield(task)
+        except Exception:
+            # 失败的结果不再共用，下一个出现位置重新合成
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+            raise
+        # 复制放到线程池中执行，不阻塞同时进行的其他合成
+        await asyncio.get_running_loop().run_in_executor(None, self._copy, key, output_file)
+        if boundaries is not None:
+            boundaries.extend(items or [])
+        if reused:
+            self.reused += 1
+            self.saved_characters += len(text)
+        return reused
+
+    def _copy(self, key, output_file):
+        temp_file = output_file + ".tmp"
+        try:
+            shutil.copyfile(self.path_for(key), temp_file)
+            os.replace(temp_file, output_file)
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+
+    async def close(self):
+        """等待仍在进行的合成结束，删除临时文件夹"""
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def summary(self):
+        saved = max(self.baseline_requests - self.requests, 0)
+        return (f"{len([count for count in self.counts.values() if count > 1])} 个分段在批次中重复出现，"
+                f"计划合成请求 {self.requests} 次（不去重时 {self.baseline_requests} 次，"
+                f"节省 {saved} 次），复用 {self.reused} 次、{self.saved_characters} 字符")
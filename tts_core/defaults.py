@@ -0,0 +1,14 @@
+"""默认参数
+
+不依赖asyncio等较重模块的常量，界面启动时即可导入。
+"""
+
+# 默认与最大并发数
+DEFAULT_CONCURRENCY = 4
+MAX_CONCURRENCY = 16
+
+# 长文本分段的最大长度（字符）
+DEFAULT_CHUNK_LENGTH = 3000
+
+# 单个分段失败后的重试次数，等待时间由限流器的退避策略决定
+DEFAULT_MAX_RETRIES = 3
@@ -0,0 +1,526 @@
+"""分布式批量转换
+
+协调进程把每个输入文件读取、分段后，按 (文件, 语音, 分段) 拆成独立的任务文件放进共享的
+任务目录（spool）；任意数量的工作进程（可以在不同主机上，只要能访问同一个目录）通过原子
+重命名领取任务、合成音频并写回结果。协调进程收齐一个文件的全部分段后按顺序拼接输出。
+
+任务目录结构：
+    pending/<任务ID>.json            待领取的任务
+    claimed/<任务ID>@<工作进程>.json  已被领取，工作进程定期更新修改时间作为心跳
+    done/<任务ID>.json               成功结果
+    failed/<任务ID>.json             失败结果
+    parts/<任务ID>.mp3               合成好的分段音频
+    parts/<任务ID>@<工作进程>.mp3     合成中的分段，确认仍持有任务后才改名为上一项
+
+工作进程退出或失联时，心跳超时的任务会被协调进程放回pending。心跳超时随任务一起下发，
+工作进程按它更新心跳。之后才完成的慢进程发现租约已失效时丢弃结果；输出已拼接后才到达的
+重复结果由协调进程删除其分段文件。任务ID以由输出目录和转换参数决定的批次ID开头，
+协调进程中断后重新运行同一命令时继续使用上次留下的任务，并清理已经过时的任务。
+"""
+import asyncio
+import hashlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import zlib
+
+from .backends import create_backend
+from .converter import TextToSpeechConverter
+from .engine import DEFAULT_CHUNK_LENGTH, DEFAULT_CONCURRENCY, BatchEngine, remove_file
+from .manifest import JobManifest, file_hash, text_hash
+from .mp3 import join_mp3_files
+from .text import read_text_file, split_long_text
+
+SPOOL_DIRS = ("pending", "claimed", "done", "failed", "parts")
+
+# 任务心跳超时（秒）：超过这么久没有更新的已领取任务会被重新放回队列
+DEFAULT_LEASE_TIMEOUT = 60.0
+# 扫描任务目录的间隔（秒）
+DEFAULT_POLL_INTERVAL = 0.2
+# 同一个任务最多执行的次数（工作进程内部的重试不计入）
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+def write_json(path, data):
+    """原子地写入JSON文件"""
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def read_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def init_spool(spool_dir):
+    """创建任务目录的各个子目录"""
+    for name in SPOOL_DIRS:
+        os.makedirs(os.path.join(spool_dir, name), exist_ok=True)
+
+
+def parse_shard(value):
+    """解析 "序号/总数" 形式的分片参数，如 0/4"""
+    index, _, count = value.partition("/")
+    index, count = int(index), int(count)
+    if not 0 <= index < count:
+        raise ValueError(f"分片序号应在 0-{count - 1} 之间: {value}")
+    return index, count
+
+
+def in_shard(job_id, shard):
+    """任务是否属于该分片；shard为None时领取所有任务"""
+    if shard is None:
+        return True
+    index, count = shard
+    return zlib.crc32(job_id.encode("utf-8")) % count == index
+
+
+class SpoolWorker:
+    """从任务目录领取并执行合成任务的工作进程"""
+
+    def __init__(self, spool_dir, worker_id=None, concurrency=DEFAULT_CONCURRENCY, cache=None,
+                 shard=None, lease_timeout=DEFAULT_LEASE_TIMEOUT,
+                 poll_interval=DEFAULT_POLL_INTERVAL, log=None):
+        self.spool_dir = spool_dir
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.shard = shard
+        self.lease_timeout = lease_timeout
+        self.poll_interval = poll_interval
+        self.log = log or (lambda message, level="INFO": None)
+        self.cache = cache
+        self.concurrency = concurrency
+
+        # 每种后端一个引擎，所有任务共用其并发名额和限流器
+        self._engines = {}
+        self.completed = 0
+        self.failed = 0
+        init_spool(spool_dir)
+
+    def engine_for(self, backend_name, backend_options=None):
+        key = json.dumps([backend_name, backend_options], sort_keys=True)
+        engine = self._engines.get(key)
+        if engine is None:
+            engine = BatchEngine(concurrency=self.concurrency, cache=self.cache, log=self.log,
+                                 backend=create_backend(backend_name, **(backend_options or {})))
+            self._engines[key] = engine
+        return engine
+
+    def claim(self, limit=1):
+        """原子地领取最多limit个待处理任务，返回 [(任务ID, 已领取的任务文件路径)]"""
+        pending_dir = os.path.join(self.spool_dir, "pending")
+        try:
+            names = sorted(entry.name for entry in os.scandir(pending_dir)
+                           if entry.name.endswith(".json"))
+        except OSError:
+            return []
+        claimed_jobs = []
+        for name in names:
+            if len(claimed_jobs) >= limit:
+                break
+            job_id = name[:-len(".json")]
+            if not in_shard(job_id, self.shard):
+                continue
+            claimed = os.path.join(self.spool_dir, "claimed", f"{job_id}@{self.worker_id}.json")
+            try:
+                # 同一文件系统内的重命名是原子的，只有一个进程能成功
+                os.rename(os.path.join(pending_dir, name), claimed)
+                os.utime(claimed)
+            except OSError:
+                continue
+            claimed_jobs.append((job_id, claimed))
+        return claimed_jobs
+
+    async def heartbeat(self, claimed, lease_timeout=None):
+        """定期更新已领取任务文件的修改时间
+
+        lease_timeout为协调进程随任务下发的心跳超时，没有时使用本进程的设置。
+        """
+        interval = max(0.1, (lease_timeout or self.lease_timeout) / 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                os.utime(claimed)
+            except OSError:
+                return
+
+    def keep_lease(self, job_id, claimed):
+        """写回结果前确认任务仍归本进程所有
+
+        心跳超时后协调进程会把任务放回pending，此时另一个工作进程可能已经领取甚至完成了
+        同一个任务；如果放回的副本还没被领取，重新领取后照常写回，否则放弃本次结果。
+        """
+        try:
+            os.utime(claimed)
+            return True
+        except OSError:
+            pass
+        try:
+            os.rename(os.path.join(self.spool_dir, "pending", f"{job_id}.json"), claimed)
+            return True
+        except OSError:
+            return False
+
+    async def process(self, job_id, claimed):
+        """执行一个任务并写回结果
+
+        音频先写到本进程独有的临时文件，确认仍持有任务后才移动到 parts/，
+        避免失去租约的慢进程在结果已被拼接、清理之后再留下分段文件。
+        """
+        started = time.monotonic()
+        beat = None
+        part_file = os.path.join(self.spool_dir, "parts", f"{job_id}.mp3")
+        temp_file = os.path.join(self.spool_dir, "parts", f"{job_id}@{self.worker_id}.mp3")
+        try:
+            job = read_json(claimed)
+            beat = asyncio.ensure_future(self.heartbeat(claimed, job.get("lease_timeout")))
+            engine = self.engine_for(job.get("backend") or "edge", job.get("backend_options"))
+            await engine.synthesize_cached(job["text"], temp_file, job["voice"],
+                                           job["rate"], job["volume"])
+            result = {"id": job_id, "worker": self.worker_id, "ok": True,
+                      "size": os.path.getsize(temp_file),
+                      "seconds": round(time.monotonic() - started, 3)}
+            status = "done"
+        except Exception as e:
+            result = {"id": job_id, "worker": self.worker_id, "ok": False, "error": str(e),
+                      "seconds": round(time.monotonic() - started, 3)}
+            status = "failed"
+        finally:
+            if beat is not None:
+                beat.cancel()
+        try:
+            if not self.keep_lease(job_id, claimed):
+                self.log(f"任务 {job_id} 已被重新分配，丢弃本次结果", "WARNING")
+                return
+            if status == "done":
+                os.replace(temp_file, part_file)
+                self.completed += 1
+            else:
+                self.failed += 1
+                self.log(f"任务失败 {job_id}: {result['error']}", "WARNING")
+            write_json(os.path.join(self.spool_dir, status, f"{job_id}.json"), result)
+            remove_file(claimed)
+        finally:
+            remove_file(temp_file)
+
+    async def serve(self, should_continue=None, idle_exit=None):
+        """持续领取任务，同时执行的任务数不超过并发数
+
+        should_continue() 返回False时不再领取新任务；
+        idle_exit 不为None时，连续空闲这么多秒后退出。
+        """
+        self.log(f"工作进程 {self.worker_id} 开始领取任务: {self.spool_dir}")
+        running = set()
+        idle_since = time.monotonic()
+        while should_continue is None or should_continue():
+            if len(running) < self.concurrency:
+                for job_id, claimed in self.claim(self.concurrency - len(running)):
+                    running.add(asyncio.ensure_future(self.process(job_id, claimed)))
+            if running:
+                idle_since = time.monotonic()
+                done, running = await asyncio.wait(running, timeout=self.poll_interval,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                running = set(running)
+                continue
+            if idle_exit is not None and time.monotonic() - idle_since >= idle_exit:
+                break
+            await asyncio.sleep(self.poll_interval)
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+        self.log(f"工作进程 {self.worker_id} 退出: 完成 {self.completed} 个任务，失败 {self.failed} 个")
+
+    def run(self, should_continue=None, idle_exit=None):
+        asyncio.run(self.serve(should_continue, idle_exit))
+
+
+class SpoolCoordinator:
+    """把批量转换拆成任务文件并收集结果的协调进程"""
+
+    def __init__(self, spool_dir, output_dir, voice_ids, rate="+0%", volume="+0%",
+                 backend="edge", backend_options=None, resume=True,
+                 lease_timeout=DEFAULT_LEASE_TIMEOUT, poll_interval=DEFAULT_POLL_INTERVAL,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, log=None, progress=None):
+        self.spool_dir = spool_dir
+        self.output_dir = output_dir
+        # 后端名称和构造参数随任务一起下发，工作进程按此创建后端
+        self.backend = backend
+        self.backend_options = backend_options
+        self.lease_timeout = lease_timeout
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.log = log or (lambda message, level="INFO": None)
+        self.progress = progress or (lambda value, message: None)
+        # 借用单机转换器的输出文件命名和任务清单参数
+        self.converter = TextToSpeechConverter(output_dir, voice_ids=voice_ids, rate=rate,
+                                               volume=volume,
+                                               backend=create_backend(backend, **(backend_options or {})),
+                                               resume=resume, log=self.log)
+        # 批次ID由输出目录和转换参数决定：协调进程崩溃后用同样的命令重新运行时，
+        # 能认出上次留在任务目录中的任务，继续使用或清理，而不是留给工作进程白白合成
+        self.batch_id = hashlib.sha256(json.dumps(
+            [os.path.abspath(output_dir), list(voice_ids), rate, volume, backend, backend_options],
+            sort_keys=True).encode("utf-8")).hexdigest()[:8]
+        # 任务ID -> 任务信息；输出 (文件序号, 语音) -> 输出信息
+        self.jobs = {}
+        self.outputs = {}
+        init_spool(spool_dir)
+
+    def submit(self, input_files):
+        """读取并分段所有输入文件，写入任务文件，返回需要等待的输出数"""
+        converter = self.converter
+        os.makedirs(self.output_dir, exist_ok=True)
+        manifest = JobManifest.load(self.output_dir) if converter.resume else None
+        converter.manifest = manifest
+        if manifest is not None:
+            converter.reserved_outputs.update(manifest.output_path(job) for job in manifest.jobs.values())
+        # 上次运行留下的、仍在排队、执行中或已有结果的本批次任务
+        earlier = self.earlier_jobs()
+
+        for file_index, input_file in enumerate(input_files):
+            try:
+                text = read_text_file(input_file)
+            except Exception as e:
+                self.log(f"读取文件失败: {input_file}: {str(e)}", "ERROR")
+                self.outputs[(file_index, None)] = {"input": input_file, "status": "failed"}
+                continue
+            chunks = split_long_text(text, max_length=DEFAULT_CHUNK_LENGTH)
+            source = text_hash(text)
+
+            for voice_index, voice_id in enumerate(converter.voice_ids):
+                job = manifest.get(input_file, voice_id) if manifest is not None else None
+                if manifest is not None and manifest.is_complete(job, source,
+                                                                 converter.job_settings(voice_id)):
+                    self.log(f"已完成且校验通过，跳过: {os.path.basename(manifest.output_path(job))}",
+                             "SUCCESS")
+                    self.outputs[(file_index, voice_id)] = {"input": input_file, "status": "done"}
+                    continue
+
+                if job is not None:
+                    output_file = manifest.output_path(job)
+                else:
+                    output_file = converter.reserve_output_file(input_file, voice_id)
+                record = None
+                if manifest is not None:
+                    record = converter.start_job(input_file, voice_id, output_file, job, source, chunks)
+
+                job_ids = []
+                for chunk_index, chunk in enumerate(chunks):
+                    # 任务ID带上输入文件和分段内容的校验值，文件改动后不会误用上次的任务
+                    digest = zlib.crc32(f"{os.path.abspath(input_file)}\0{chunk}".encode("utf-8"))
+                    job_id = (f"{self.batch_id}-{file_index:05d}-{voice_index:02d}-"
+                              f"{chunk_index:04d}-{digest:08x}")
+                    payload = {"text": chunk, "voice": voice_id, "rate": converter.rate,
+                               "volume": converter.volume, "backend": self.backend,
+                               "backend_options": self.backend_options,
+                               "lease_timeout": self.lease_timeout, "attempt": 1}
+                    self.jobs[job_id] = {"output": (file_index, voice_id), "payload": payload,
+                                         "done": False}
+                    if job_id not in earlier:
+                        write_json(os.path.join(self.spool_dir, "pending", f"{job_id}.json"), payload)
+                    job_ids.append(job_id)
+                self.outputs[(file_index, voice_id)] = {
+                    "input": input_file, "output": output_file, "job_ids": job_ids,
+                    "remaining": len(job_ids), "status": "pending", "record": record,
+                }
+        if manifest is not None:
+            manifest.save(force=True)
+        stale = [job_id for job_id in earlier if job_id not in self.jobs]
+        for job_id in stale:
+            self.remove_job_files(job_id)
+        if earlier:
+            self.log(f"继续使用上次留下的 {len(earlier) - len(stale)} 个任务，清理 {len(stale)} 个过时的任务")
+        self.log(f"已提交 {len(self.jobs)} 个分段任务到 {self.spool_dir}")
+
+    def earlier_jobs(self):
+        """任务目录中属于本批次的任务ID（上次运行崩溃或中断时留下）"""
+        prefix = f"{self.batch_id}-"
+        job_ids = set()
+        for status in ("pending", "claimed", "done", "failed"):
+            for entry in os.scandir(os.path.join(self.spool_dir, status)):
+                if entry.name.startswith(prefix) and entry.name.endswith(".json"):
+                    job_ids.add(entry.name[:-len(".json")].split("@", 1)[0])
+        return job_ids
+
+    def remove_job_files(self, job_id):
+        """删除一个任务的全部文件；执行中的工作进程写回前发现任务已不存在，会丢弃结果"""
+        for status in ("pending", "done", "failed"):
+            remove_file(os.path.join(self.spool_dir, status, f"{job_id}.json"))
+        for entry in os.scandir(os.path.join(self.spool_dir, "claimed")):
+            if entry.name.split("@", 1)[0] == job_id:
+                remove_file(entry.path)
+        remove_file(os.path.join(self.spool_dir, "parts", f"{job_id}.mp3"))
+
+    def collect(self):
+        """处理已写回的结果，返回本次处理的结果数"""
+        handled = 0
+        for status in ("done", "failed"):
+            result_dir = os.path.join(self.spool_dir, status)
+            for entry in os.scandir(result_dir):
+                if not entry.name.endswith(".json"):
+                    continue
+                job_id = entry.name[:-len(".json")]
+                job = self.jobs.get(job_id)
+                if job is None:
+                    # 其他协调进程的任务
+                    continue
+                try:
+                    result = read_json(entry.path)
+                except (OSError, ValueError):
+                    continue
+                remove_file(entry.path)
+                handled += 1
+                if job["done"]:
+                    # 同一任务的重复结果（失去租约的慢进程与重新放回队列的副本都完成了）
+                    if result.get("ok"):
+                        self.discard_late_part(job_id, job)
+                    continue
+                if result.get("ok"):
+                    job["done"] = True
+                    self.chunk_finished(job_id, job)
+                else:
+                    self.chunk_failed(job_id, job, result.get("error", ""))
+        return handled
+
+    def chunk_finished(self, job_id, job):
+        # 心跳超时后被重新放回队列的副本不再需要执行
+        remove_file(os.path.join(self.spool_dir, "pending", f"{job_id}.json"))
+        output = self.outputs[job["output"]]
+        if output["status"] != "pending":
+            self.discard_late_part(job_id, job)
+            return
+        output["remaining"] -= 1
+        if output["remaining"] == 0:
+            self.assemble(output)
+
+    def chunk_failed(self, job_id, job, error):
+        payload = job["payload"]
+        output = self.outputs[job["output"]]
+        if payload["attempt"] < self.max_attempts and output["status"] == "pending":
+            payload["attempt"] += 1
+            self.log(f"任务 {job_id} 失败，重新放回队列 (第 {payload['attempt']} 次): {error}", "WARNING")
+            write_json(os.path.join(self.spool_dir, "pending", f"{job_id}.json"), payload)
+            return
+        job["done"] = True
+        if output["status"] == "pending":
+            output["status"] = "failed"
+            self.log(f"转换失败: {os.path.basename(output['output'])}: {error}", "ERROR")
+            if output["record"] is not None:
+                self.converter.manifest.fail(output["record"])
+            self.discard_parts(output)
+
+    def assemble(self, output):
+        """按顺序拼接一个输出文件的全部分段"""
+        part_files = [os.path.join(self.spool_dir, "parts", f"{job_id}.mp3")
+                      for job_id in output["job_ids"]]
+        output_file = output["output"]
+        temp_file = output_file + ".tmp"
+        try:
+            join_mp3_files(part_files, temp_file)
+            os.replace(temp_file, output_file)
+        except OSError as e:
+            remove_file(temp_file)
+            output["status"] = "failed"
+            self.log(f"拼接失败: {os.path.basename(output_file)}: {e}", "ERROR")
+            return
+        finally:
+            self.discard_parts(output)
+        output["status"] = "done"
+        if output["record"] is not None:
+            self.converter.manifest.finish(output["record"], output_file, file_hash(output_file))
+        size_mb = os.path.getsize(output_file) / (1024 * 1024)
+        self.log(f"✅ 文件转换成功: {os.path.basename(output_file)} ({size_mb:.2f} MB)", "SUCCESS")
+
+    def discard_parts(self, output):
+        for job_id in output["job_ids"]:
+            remove_file(os.path.join(self.spool_dir, "parts", f"{job_id}.mp3"))
+
+    def discard_late_part(self, job_id, job):
+        """输出已拼接或已失败后才到达的结果：拼接和清理都已执行过，删除它留下的分段"""
+        if self.outputs[job["output"]]["status"] != "pending":
+            remove_file(os.path.join(self.spool_dir, "parts", f"{job_id}.mp3"))
+
+    def requeue_stale(self):
+        """把心跳超时的已领取任务放回pending，返回放回的数量"""
+        now = time.time()
+        requeued = 0
+        for entry in os.scandir(os.path.join(self.spool_dir, "claimed")):
+            job_id = entry.name.split("@", 1)[0]
+            if job_id not in self.jobs:
+                continue
+            try:
+                if now - entry.stat().st_mtime < self.lease_timeout:
+                    continue
+                os.rename(entry.path, os.path.join(self.spool_dir, "pending", f"{job_id}.json"))
+            except OSError:
+                continue
+            requeued += 1
+            self.log(f"任务 {job_id} 心跳超时，重新放回队列", "WARNING")
+        return requeued
+
+    def pending_outputs(self):
+        return sum(1 for output in self.outputs.values() if output["status"] == "pending")
+
+    def wait(self, should_continue=None):
+        """等待所有输出完成，返回每个输入文件是否全部成功的列表"""
+        total = len(self.jobs)
+        last_check = time.monotonic()
+        while self.pending_outputs():
+            if should_continue is not None and not should_continue():
+                break
+            if not self.collect():
+                time.sleep(self.poll_interval)
+            if time.monotonic() - last_check >= self.lease_timeout / 3:
+                last_check = time.monotonic()
+                self.requeue_stale()
+            finished = sum(1 for job in self.jobs.values() if job["done"])
+            if total:
+                self.progress(finished / total * 100, f"已完成 {finished}/{total} 个分段")
+
+        if self.converter.manifest is not None:
+            self.converter.manifest.save(force=True)
+        return self.results()
+
+    def results(self):
+        by_file = {}
+        for (file_index, _), output in self.outputs.items():
+            ok = output["status"] == "done"
+            by_file[file_index] = by_file.get(file_index, True) and ok
+        return [by_file[index] for index in sorted(by_file)]
+
+    def cancel(self):
+        """删除本批次尚未领取的任务"""
+        for job_id, job in self.jobs.items():
+            if not job["done"]:
+                remove_file(os.path.join(self.spool_dir, "pending", f"{job_id}.json"))
+
+
+def spawn_local_workers(spool_dir, count, concurrency=DEFAULT_CONCURRENCY, cache_dir=None,
+                        no_cache=False):
+    """在本机启动count个工作进程，返回Popen列表"""
+    command = [sys.executable, "-m", "tts_core", "worker", spool_dir,
+               "-j", str(concurrency), "--quiet"]
+    if no_cache:
+        command.append("--no-cache")
+    elif cache_dir:
+        command += ["--cache-dir", cache_dir]
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [package_root, env.get("PYTHONPATH")]))
+    return [subprocess.Popen(command + ["--id", f"{socket.gethostname()}-local{index}"], env=env)
+            for index in range(count)]
+
+
+def stop_workers(processes, timeout=5.0):
+    """结束本机启动的工作进程"""
+    for process in processes:
+        if process.poll() is None:
+            process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
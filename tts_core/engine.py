@@ -0,0 +1,351 @@
+"""批量转换引擎
+
+在同一个事件循环中用有界的工作池并发执行多个TTS转换任务。
+"""
+import asyncio
+import os
+import time
+
+from .backends import CommunicateBackend, EdgeTTSBackend
+# 默认参数定义在不依赖asyncio的defaults模块中，这里导入后仍可从engine使用
+from .defaults import (DEFAULT_CHUNK_LENGTH, DEFAULT_CONCURRENCY, DEFAULT_MAX_RETRIES,
+                       MAX_CONCURRENCY)
+from .metrics import BatchMetrics
+from .mp3 import audio_duration, join_mp3_files
+from .ratelimit import AdaptiveLimiter, is_retryable
+from .subtitles import (TICKS_PER_SECOND, attach_punctuation, boundaries_path, is_boundary,
+                        load_boundaries, make_boundary, save_boundaries, shift_boundaries)
+
+# 流式写入的缓冲区大小与临时文件后缀
+WRITE_BUFFER_SIZE = 256 * 1024
+TEMP_SUFFIX = ".tmp"
+
+
+def remove_file(path):
+    """删除文件，忽略不存在等错误"""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class BatchEngine:
+    """有界并发的批量转换引擎"""
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, communicate_factory=None,
+                 max_retries=DEFAULT_MAX_RETRIES, cache=None, streaming=True, log=None,
+                 limiter=None, backend=None, metrics=None):
+        self.concurrency = max(1, min(int(concurrency), MAX_CONCURRENCY))
+        # 合成后端，默认为Edge-TTS；
+        # communicate_factory为与edge_tts.Communicate接口一致的类，便于测试和基准测试
+        if backend is None:
+            backend = CommunicateBackend(communicate_factory) if communicate_factory else EdgeTTSBackend()
+        self.backend = backend
+        self.max_retries = max_retries
+        # 可选的SynthesisCache，命中时跳过合成
+        self.cache = cache
+        # 流式模式下边接收边写盘，否则使用Communicate.save
+        self.streaming = streaming
+        # 日志回调 log(message, level)
+        self.log = log or (lambda message, level="INFO": None)
+        # 合成调用次数统计
+        self.synthesis_count = 0
+        # 所有文件和分段共用的限流器：并发上限、令牌桶和退避
+        self.limiter = limiter or AdaptiveLimiter(self.concurrency)
+        # 分阶段耗时统计：合成、首字节、写盘、拼接
+        self.metrics = metrics or BatchMetrics()
+        # 批次内重复分段的共享结果（SharedChunks），由转换器在每批开始时设置
+        self.shared = None
+
+    async def synthesize(self, text, output_file, voice, rate="+0%", volume="+0%", on_bytes=None,
+                         on_boundary=None):
+        """调用TTS服务生成单个音频文件
+
+        音频先写入临时文件，成功后原子地重命名为output_file，失败时不留下半成品。
+        流式模式下每收到一块音频就调用 on_bytes(字节数)。
+        on_boundary不为None时请求逐词边界，每收到一个边界消息就调用 on_boundary(消息)；
+        边界只能从音频流中取得，此时总是使用流式模式。
+        """
+        temp_file = output_file + TEMP_SUFFIX
+        await self.limiter.acquire()
+        # 从拿到名额开始计时，不含限流等待
+        start = time.perf_counter()
+        try:
+            self.synthesis_count += 1
+            self.metrics.add("requests")
+            if on_boundary is not None:
+                await self._stream_to_file(
+                    self.backend.stream(text, voice, rate, volume, word_boundary=True),
+                    temp_file, on_bytes, start, on_boundary)
+            elif self.streaming:
+                await self._stream_to_file(self.backend.stream(text, voice, rate, volume),
+                                           temp_file, on_bytes, start)
+            else:
+                await self.backend.save(text, temp_file, voice, rate, volume)
+                if on_bytes is not None:
+                    on_bytes(os.path.getsize(temp_file))
+            os.replace(temp_file, output_file)
+            self.metrics.observe("synthesize", time.perf_counter() - start)
+        except Exception as e:
+            self.limiter.release(e)
+            raise
+        except BaseException:
+            # 被取消的请求不参与并发和速率的调整
+            self.limiter.abandon()
+            raise
+        else:
+            self.limiter.release()
+        finally:
+            remove_file(temp_file)
+
+    async def _stream_to_file(self, messages, temp_file, on_bytes=None, start=None,
+                              on_boundary=None):
+        """把后端stream()产生的音频块经缓冲写入文件
+
+        start为请求开始的perf_counter时间，用于统计首字节延迟；
+        边界消息交给on_boundary，其他非音频消息忽略。
+        """
+        write_time = 0.0
+        first_byte = True
+        f = open(temp_file, "wb", buffering=WRITE_BUFFER_SIZE)
+        try:
+            async for message in messages:
+                if message["type"] != "audio":
+                    if on_boundary is not None and is_boundary(message):
+                        on_boundary(message)
+                    continue
+                now = time.perf_counter()
+                if first_byte and start is not None:
+                    self.metrics.observe("first_byte", now - start)
+                first_byte = False
+                data = message["data"]
+                f.write(data)
+                write_time += time.perf_counter() - now
+                if on_bytes is not None:
+                    on_bytes(len(data))
+        finally:
+            now = time.perf_counter()
+            f.close()
+            self.metrics.observe("write", write_time + time.perf_counter() - now)
+
+    async def stream_audio(self, text, voice, rate="+0%", volume="+0%"):
+        """异步生成器，边合成边逐块产生音频数据，供HTTP服务直接转发
+
+        与批量转换共用限流器；还没有产生任何音频时失败会按退避策略重试，
+        已经产生过音频后失败则直接抛出（调用方已经转发了部分数据）。
+        """
+        for attempt in range(self.max_retries + 1):
+            sent = False
+            await self.limiter.acquire()
+            start = time.perf_counter()
+            try:
+                self.synthesis_count += 1
+                self.metrics.add("requests")
+                async for message in self.backend.stream(text, voice, rate, volume):
+                    if message["type"] != "audio":
+                        continue
+                    if not sent:
+                        self.metrics.observe("first_byte", time.perf_counter() - start)
+                        sent = True
+                    yield message["data"]
+                self.metrics.observe("synthesize", time.perf_counter() - start)
+            except Exception as e:
+                self.limiter.release(e)
+                if sent or attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = self.limiter.backoff_delay(attempt, e)
+                self.log(f"合成失败，{delay:.1f}秒后重试 ({attempt + 1}/{self.max_retries}): {e}",
+                         "WARNING")
+                await self.limiter.wait_retry(delay)
+            except BaseException:
+                # 被取消或调用方提前关闭了生成器
+                self.limiter.abandon()
+                raise
+            else:
+                self.limiter.release()
+                return
+
+    async def synthesize_with_retry(self, text, output_file, voice, rate="+0%", volume="+0%",
+                                    on_bytes=None, boundaries=None):
+        """合成单段音频，失败时按限流器的退避策略重试
+
+        boundaries为列表时把成功那次请求的逐词边界追加到其中。
+        """
+        for attempt in range(self.max_retries + 1):
+            received = 0
+            # 失败的请求可能已收到部分边界，只保留成功那次的
+            attempt_boundaries = []
+            on_boundary = None
+            if boundaries is not None:
+                on_boundary = lambda message: attempt_boundaries.append(make_boundary(message))
+
+            def count_bytes(size):
+                nonlocal received
+                received += size
+                if on_bytes is not None:
+                    on_bytes(size)
+
+            try:
+                await self.synthesize(text, output_file, voice, rate, volume, on_bytes=count_bytes,
+                                      on_boundary=on_boundary)
+                if boundaries is not None:
+                    boundaries.extend(attempt_boundaries)
+                return
+            except Exception as e:
+                # 撤销失败请求已计入的进度
+                if on_bytes is not None and received:
+                    on_bytes(-received)
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = self.limiter.backoff_delay(attempt, e)
+                self.log(f"合成失败，{delay:.1f}秒后重试 ({attempt + 1}/{self.max_retries}): "
+                         f"{os.path.basename(output_file)}: {e}", "WARNING")
+                await self.limiter.wait_retry(delay)
+
+    async def synthesize_cached(self, text, output_file, voice, rate="+0%", volume="+0%",
+                                on_bytes=None, boundaries=None):
+        """优先从缓存取音频，未命中时合成并写入缓存
+
+        boundaries为列表时同时取得逐词边界；缓存中没有边界数据的条目视为未命中。
+        在批次中重复出现的分段只合成一次，其他位置复制同一个结果。
+        """
+        shared = self.shared
+        if shared is not None:
+            shared_key = shared.make_key(text, voice, rate, volume, self.backend.name)
+            if shared.is_shared(shared_key):
+                async def produce(path, items):
+                    await self._synthesize_cached(text, path, voice, rate, volume, None, items)
+
+                if await shared.fetch(shared_key, text, output_file, produce, boundaries):
+                    self.metrics.add("shared_chunks")
+                if on_bytes is not None:
+                    on_bytes(os.path.getsize(output_file))
+                return
+        await self._synthesize_cached(text, output_file, voice, rate, volume, on_bytes, boundaries)
+
+    async def _synthesize_cached(self, text, output_file, voice, rate, volume, on_bytes,
+                                 boundaries):
+        # 缓存的读写是整个音频文件的复制，放到线程池中执行，不阻塞同时进行的其他合成
+        loop = asyncio.get_running_loop()
+        if self.cache is not None:
+            key = self.cache.make_key(text, voice, rate, volume, self.backend.name)
+            if await loop.run_in_executor(None, self.cache.get, key, output_file, boundaries):
+                self.metrics.add("cache_hits")
+                if on_bytes is not None:
+                    on_bytes(os.path.getsize(output_file))
+                return
+        await self.synthesize_with_retry(text, output_file, voice, rate, volume, on_bytes,
+                                         boundaries)
+        if self.cache is not None:
+            await loop.run_in_executor(None, self.cache.put, key, output_file, boundaries)
+
+    async def synthesize_chunks(self, chunks, output_file, voice, rate="+0%", volume="+0%",
+                                on_bytes=None, reuse_part=None, on_part=None, keep_parts=False,
+                                boundaries=None):
+        """并行合成多个文本分段，并按原顺序拼接为一个MP3文件
+
+        每个分段写入独立的临时文件，已缓存的分段直接复用，失败的分段单独重试；
+        任一分段最终失败时删除所有临时文件并抛出异常。
+
+        reuse_part(index, part_file) 返回True时直接使用上次留下的分段文件；
+        on_part(index, part_file) 在每个分段合成完成后调用；
+        keep_parts为True时，失败后保留已完成的分段文件（及其边界数据），供下次继续。
+        boundaries为列表时追加整个输出文件的逐词边界，各分段的时间按前面分段的音频时长平移。
+        """
+        if len(chunks) == 1:
+            items = None if boundaries is None else []
+            await self.synthesize_cached(chunks[0], output_file, voice, rate, volume, on_bytes,
+                                         items)
+            if boundaries is not None:
+                boundaries.extend(attach_punctuation(items, chunks[0]))
+            if on_part is not None:
+                on_part(0, output_file)
+            return
+
+        part_files = [f"{output_file}.part{i:04d}" for i in range(len(chunks))]
+        temp_file = output_file + TEMP_SUFFIX
+        part_boundaries = [None] * len(chunks)
+
+        async def synthesize_part(index, chunk, part_file):
+            if reuse_part is not None and reuse_part(index, part_file):
+                reused = None if boundaries is None else load_boundaries(boundaries_path(part_file))
+                # 需要字幕但上次没有保存边界数据的分段重新合成
+                if boundaries is None or reused is not None:
+                    part_boundaries[index] = reused
+                    self.metrics.add("reused_chunks")
+                    if on_bytes is not None:
+                        on_bytes(os.path.getsize(part_file))
+                    return
+            if boundaries is not None:
+                part_boundaries[index] = []
+            await self.synthesize_cached(chunk, part_file, voice, rate, volume, on_bytes,
+                                         part_boundaries[index])
+            if boundaries is not None and keep_parts:
+                save_boundaries(boundaries_path(part_file), part_boundaries[index])
+            if on_part is not None:
+                on_part(index, part_file)
+
+        tasks = [
+            asyncio.ensure_future(synthesize_part(index, chunk, part_file))
+            for index, (chunk, part_file) in enumerate(zip(chunks, part_files))
+        ]
+        succeeded = False
+        try:
+            await asyncio.gather(*tasks)
+            loop = asyncio.get_running_loop()
+            with self.metrics.timer("join"):
+                await loop.run_in_executor(None, join_mp3_files, part_files, temp_file)
+            if boundaries is not None:
+                # 分段内的时间从0开始，加上前面所有分段的时长
+                shift = 0.0
+                for chunk, part_file, items in zip(chunks, part_files, part_boundaries):
+                    items = attach_punctuation(items, chunk)
+                    boundaries.extend(shift_boundaries(items, round(shift * TICKS_PER_SECOND)))
+                    shift += audio_duration(part_file)
+            os.replace(temp_file, output_file)
+            succeeded = True
+        finally:
+            # 某段失败时取消其余分段，等它们结束后再清理临时文件
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            remove_file(temp_file)
+            if succeeded or not keep_parts:
+                for part_file in part_files:
+                    remove_file(part_file)
+                    remove_file(boundaries_path(part_file))
+
+    async def run(self, items, worker, on_done=None, should_continue=None):
+        """用固定数量的工作协程并发处理items
+
+        worker(index, item) 为协程函数，返回True表示成功；
+        on_done(index, item, success, completed) 在每个任务结束后调用；
+        should_continue() 返回False时不再领取新任务。
+        返回与items顺序一致的结果列表，未执行的任务为None。
+        """
+        queue = asyncio.Queue()
+        for index, item in enumerate(items):
+            queue.put_nowait((index, item))
+
+        results = [None] * len(items)
+        completed = 0
+
+        async def worker_loop():
+            nonlocal completed
+            while not queue.empty():
+                if should_continue is not None and not should_continue():
+                    return
+                index, item = queue.get_nowait()
+                try:
+                    success = bool(await worker(index, item))
+                except Exception:
+                    success = False
+                results[index] = success
+                completed += 1
+                if on_done is not None:
+                    on_done(index, item, success, completed)
+
+        worker_count = min(self.concurrency, len(items))
+        if worker_count:
+            await asyncio.gather(*(worker_loop() for _ in range(worker_count)))
+        return results
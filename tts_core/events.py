@@ -0,0 +1,49 @@
+"""线程安全的界面事件通道
+
+工作线程只往通道里投递事件，界面线程按固定节拍一次取走全部事件再更新控件。
+状态类事件（如进度）同类只保留最新值，按顺序的事件（如日志行）全部保留。
+"""
+import threading
+
+
+class EventChannel:
+    """工作线程到界面线程的事件通道"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 可合并的状态事件：kind -> 最新的payload
+        self._latest = {}
+        # 需要按顺序逐条处理的事件：(kind, payload)
+        self._ordered = []
+
+        self.posted = 0
+        self.coalesced = 0
+
+    def post(self, kind, payload=None):
+        """投递可合并的状态事件，同类事件在下次取走前只保留最新值"""
+        with self._lock:
+            if kind in self._latest:
+                self.coalesced += 1
+            self._latest[kind] = payload
+            self.posted += 1
+
+    def append(self, kind, payload=None):
+        """投递需要按顺序逐条处理的事件"""
+        with self._lock:
+            self._ordered.append((kind, payload))
+            self.posted += 1
+
+    def call(self, func, *args):
+        """请求在界面线程中调用func(*args)"""
+        self.append("call", (func, args))
+
+    def drain(self):
+        """取走所有待处理事件，返回 (状态事件字典, 顺序事件列表)"""
+        with self._lock:
+            latest, self._latest = self._latest, {}
+            ordered, self._ordered = self._ordered, []
+        return latest, ordered
+
+    def __len__(self):
+        with self._lock:
+            return len(self._latest) + len(self._ordered)
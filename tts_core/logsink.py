@@ -0,0 +1,139 @@
+"""异步日志写入
+
+日志记录先放入队列，由一个后台线程批量写入文件，调用方不做任何磁盘IO。
+可选输出为JSON Lines格式，便于其他工具解析。
+"""
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+
+# 日志级别对应的显示前缀
+LEVEL_PREFIXES = {
+    "ERROR": "[错误]",
+    "WARNING": "[警告]",
+    "SUCCESS": "[成功]",
+    "INFO": "[信息]",
+}
+
+# 默认的批量刷新间隔（秒）与单批最大条数
+DEFAULT_FLUSH_INTERVAL = 0.2
+DEFAULT_MAX_BATCH = 2000
+
+
+def level_prefix(level):
+    """返回日志级别的显示前缀"""
+    return LEVEL_PREFIXES.get(level, LEVEL_PREFIXES["INFO"])
+
+
+def format_line(created, level, message):
+    """格式化为文本日志行（不含换行符）"""
+    timestamp = datetime.fromtimestamp(created).strftime("%H:%M:%S")
+    return f"{timestamp} {level_prefix(level)} {message}"
+
+
+def format_json_line(created, level, message):
+    """格式化为JSON Lines日志行（不含换行符）"""
+    return json.dumps({
+        "time": datetime.fromtimestamp(created).isoformat(timespec="milliseconds"),
+        "level": level,
+        "message": message,
+    }, ensure_ascii=False)
+
+
+class LogSink:
+    """后台线程批量写入的日志文件"""
+
+    def __init__(self, path, json_lines=False, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 max_batch=DEFAULT_MAX_BATCH):
+        self.path = path
+        self.json_lines = json_lines
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.dropped = 0
+
+        self._queue = queue.SimpleQueue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="LogSink", daemon=True)
+        self._thread.start()
+
+    def write(self, message, level="INFO"):
+        """记录一条日志（只入队，立即返回）"""
+        if self._closed:
+            self.dropped += 1
+            return
+        self._queue.put((time.time(), level, message))
+
+    def write_raw(self, text):
+        """原样写入一段文本，如摘要或分隔块"""
+        if not self._closed:
+            self._queue.put(text)
+
+    def flush(self, timeout=5.0):
+        """等待队列中已有的日志全部写入文件"""
+        if self._closed or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        """写完剩余日志并停止后台线程"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _format(self, record):
+        if isinstance(record, str):
+            return record
+        formatter = format_json_line if self.json_lines else format_line
+        return formatter(*record) + "\n"
+
+    def _run(self):
+        """后台线程：取出一批记录，一次写入并刷新"""
+        try:
+            f = open(self.path, "a", encoding="utf-8")
+        except OSError as e:
+            print(f"打开日志文件失败: {e}")
+            f = None
+
+        stopping = False
+        while not stopping:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = []
+            waiters = []
+            for record in batch:
+                if record is None:
+                    stopping = True
+                elif isinstance(record, threading.Event):
+                    waiters.append(record)
+                else:
+                    lines.append(self._format(record))
+
+            if lines:
+                if f is not None:
+                    try:
+                        f.write("".join(lines))
+                        f.flush()
+                    except OSError as e:
+                        print(f"写入日志文件失败: {e}")
+                        self.dropped += len(lines)
+                else:
+                    self.dropped += len(lines)
+            for waiter in waiters:
+                waiter.set()
+
+        if f is not None:
+            f.close()
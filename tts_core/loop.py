@@ -0,0 +1,67 @@
+"""常驻事件循环线程
+
+整个程序只创建一个事件循环，在后台线程中一直运行；界面线程或主线程通过
+run_coroutine_threadsafe 把协程提交给它。这样每个文件、每次语音测试不再
+各自创建和关闭事件循环，读文件等使用的默认线程池也在多次转换之间复用。
+"""
+import asyncio
+import threading
+
+
+class LoopThread:
+    """在后台线程中常驻运行的事件循环"""
+
+    def __init__(self, name="tts-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._started = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        self._started.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._started.set)
+        try:
+            self.loop.run_forever()
+        finally:
+            self._shutdown()
+
+    def _shutdown(self):
+        """取消剩余任务并关闭事件循环"""
+        loop = self.loop
+        try:
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.run_until_complete(loop.shutdown_default_executor())
+        finally:
+            loop.close()
+
+    @property
+    def is_running(self):
+        return self._thread.is_alive() and not self.loop.is_closed()
+
+    def submit(self, coro):
+        """提交协程，返回concurrent.futures.Future，可在任意线程中等待结果"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """提交协程并阻塞等待结果（不能在事件循环线程中调用）"""
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("不能在事件循环线程中同步等待协程")
+        return self.submit(coro).result(timeout)
+
+    def call_soon(self, callback, *args):
+        """在事件循环线程中调用callback"""
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def stop(self, timeout=5.0):
+        """停止事件循环，取消未完成的任务并等待线程退出"""
+        if not self.is_running:
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
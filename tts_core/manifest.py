@@ -0,0 +1,213 @@
+"""批量任务清单
+
+在输出目录中记录每个输入文件及其各分段的转换状态和哈希。
+批量转换中途退出后重新运行时，已完成且校验通过的文件直接跳过，
+只重新合成缺失或内容有变化的分段；输出文件沿用上次的路径，不再生成 _001 副本。
+"""
+import hashlib
+import json
+import os
+import time
+
+MANIFEST_NAME = ".tts_manifest.json"
+MANIFEST_VERSION = 2
+
+# 两次写盘的最小间隔（秒），文件完成或批次结束时强制写入
+SAVE_INTERVAL = 1.0
+
+# 计算文件哈希时每次读取的大小
+HASH_BLOCK_SIZE = 1024 * 1024
+
+STATUS_PENDING = "pending"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+def text_hash(text):
+    """文本内容的SHA-256"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def file_hash(path):
+    """文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_signature(path):
+    """文件大小与修改时间，用于快速判断文件是否被改动过"""
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class JobManifest:
+    """输出目录中的任务清单
+
+    jobs以 "输入文件的绝对路径|语音ID" 为键，每项记录：
+    source（文本哈希）、settings（语音参数）、output（输出文件名）、status、
+    output_hash/size/mtime_ns（完成后的输出文件校验信息）以及chunks（各分段的键与状态）。
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.jobs = {}
+        self._dirty = False
+        self._last_save = 0.0
+
+    @classmethod
+    def load(cls, output_dir):
+        """读取输出目录中的清单，不存在或已损坏时返回空清单"""
+        manifest = cls(output_dir)
+        try:
+            with open(manifest.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return manifest
+        if not isinstance(data, dict):
+            return manifest
+        jobs = data.get("jobs") or {}
+        if data.get("version") == 1:
+            # 第1版只以输入文件为键，补上记录中的语音ID
+            jobs = {cls.job_key(path, job.get("settings", {}).get("voice")): job
+                    for path, job in jobs.items()}
+        elif data.get("version") != MANIFEST_VERSION:
+            return manifest
+        manifest.jobs = jobs
+        return manifest
+
+    def save(self, force=False):
+        """原子地写入清单；未到写盘间隔时跳过，除非force为True"""
+        if not self._dirty:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_save < SAVE_INTERVAL:
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        temp_path = self.path + ".tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": MANIFEST_VERSION, "jobs": self.jobs}, f,
+                          ensure_ascii=False, indent=1)
+            os.replace(temp_path, self.path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self._dirty = False
+        self._last_save = now
+
+    @staticmethod
+    def job_key(input_file, voice_id):
+        return f"{os.path.abspath(input_file)}|{voice_id}"
+
+    def get(self, input_file, voice_id):
+        return self.jobs.get(self.job_key(input_file, voice_id))
+
+    def output_path(self, job):
+        """任务记录的输出文件路径"""
+        return os.path.join(self.output_dir, job["output"])
+
+    def start(self, input_file, voice_id, output_file, source, settings, chunk_keys):
+        """开始（或继续）一个文件的转换
+
+        沿用内容与参数未变的分段记录，其余分段标记为待处理，返回任务记录。
+        """
+        key = self.job_key(input_file, voice_id)
+        previous = self.jobs.get(key) or {}
+        previous_chunks = previous.get("chunks") or []
+        if previous.get("settings") != settings:
+            previous_chunks = []
+
+        chunks = []
+        for index, chunk_key in enumerate(chunk_keys):
+            old = previous_chunks[index] if index < len(previous_chunks) else None
+            if old and old.get("key") == chunk_key and old.get("status") == STATUS_DONE:
+                chunks.append(old)
+            else:
+                chunks.append({"key": chunk_key, "status": STATUS_PENDING})
+
+        job = {
+            "output": os.path.relpath(output_file, self.output_dir),
+            "source": source,
+            "settings": settings,
+            "status": STATUS_PENDING,
+            "chunks": chunks,
+            "updated": time.time(),
+        }
+        self.jobs[key] = job
+        self._dirty = True
+        return job
+
+    def is_complete(self, job, source, settings):
+        """任务是否已完成、参数未变且输出文件校验通过"""
+        if not job or job.get("status") != STATUS_DONE:
+            return False
+        if job.get("source") != source or job.get("settings") != settings:
+            return False
+        return self.verify_output(job)
+
+    def verify_output(self, job):
+        """校验输出文件：大小和修改时间一致即通过，否则比对内容哈希"""
+        path = self.output_path(job)
+        try:
+            signature = file_signature(path)
+        except OSError:
+            return False
+        if signature["size"] != job.get("size"):
+            return False
+        if signature["mtime_ns"] == job.get("mtime_ns"):
+            return True
+        try:
+            return file_hash(path) == job.get("output_hash")
+        except OSError:
+            return False
+
+    def chunk_done(self, job, index, part_file):
+        """记录分段已合成"""
+        chunk = job["chunks"][index]
+        chunk["status"] = STATUS_DONE
+        chunk["size"] = os.path.getsize(part_file)
+        job["updated"] = time.time()
+        self._dirty = True
+        self.save()
+
+    def chunk_reusable(self, job, index, part_file):
+        """上次已合成的分段文件是否仍可直接使用"""
+        chunk = job["chunks"][index]
+        if chunk.get("status") != STATUS_DONE:
+            return False
+        try:
+            return os.path.getsize(part_file) == chunk.get("size")
+        except OSError:
+            return False
+
+    def finish(self, job, output_file, output_hash=None):
+        """记录文件已完成，保存输出文件的校验信息"""
+        job.update(file_signature(output_file))
+        job["output_hash"] = output_hash or file_hash(output_file)
+        job["status"] = STATUS_DONE
+        job["updated"] = time.time()
+        # 分段已拼接进输出文件，不再保留分段文件
+        for chunk in job["chunks"]:
+            chunk.pop("size", None)
+        self._dirty = True
+        self.save(force=True)
+
+    def fail(self, job):
+        """记录文件转换失败，已完成的分段保留供下次继续"""
+        job["status"] = STATUS_FAILED
+        job["updated"] = time.time()
+        self._dirty = True
+        self.save(force=True)
+
+    def counts(self):
+        """各状态的任务数"""
+        result = {}
+        for job in self.jobs.values():
+            status = job.get("status", STATUS_PENDING)
+            result[status] = result.get(status, 0) + 1
+        return result
@@ -0,0 +1,210 @@
+"""分阶段耗时统计
+
+记录转换流程每个阶段的耗时（读取、分段、合成、首字节、写盘、拼接），
+按固定分桶汇总为直方图，每批结束后可导出为JSON或Prometheus文本格式
+（可直接放到node_exporter的textfile目录中采集）。
+"""
+import bisect
+import json
+import os
+import time
+from contextlib import contextmanager
+
+from .mp3 import AUDIO_BYTES_PER_SECOND
+
+# 各阶段名称
+STAGES = ("read", "split", "synthesize", "first_byte", "write", "join", "postprocess")
+
+STAGE_NAMES = {
+    "read": "读取",
+    "split": "分段",
+    "synthesize": "合成",
+    "first_byte": "首字节",
+    "write": "写盘",
+    "join": "拼接",
+    "postprocess": "后处理",
+}
+
+# 计数器名称
+COUNTERS = ("files", "failed_files", "characters", "chunks", "requests", "cache_hits",
+            "reused_chunks", "shared_chunks", "audio_bytes")
+
+# 直方图分桶上限（秒），覆盖从毫秒级的本地IO到分钟级的长文本合成
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+METRIC_PREFIX = "tts"
+
+
+class Histogram:
+    """固定分桶的耗时直方图，内存占用与记录次数无关"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        # 最后一个计数对应 +Inf
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """按分桶线性插值估算分位数"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for index, count in enumerate(self.counts):
+            upper = self.buckets[index] if index < len(self.buckets) else self.max
+            if count and seen + count >= rank:
+                return min(lower + (upper - lower) * (rank - seen) / count, self.max)
+            seen += count
+            lower = upper
+        return self.max
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.mean, 6),
+            "p50": round(self.quantile(0.5), 6),
+            "p90": round(self.quantile(0.9), 6),
+            "p99": round(self.quantile(0.99), 6),
+            "max": round(self.max, 6),
+            "buckets": {str(bound): count for bound, count in zip(self.buckets, self.counts)},
+            "overflow": self.counts[-1],
+        }
+
+
+class BatchMetrics:
+    """一批转换的分阶段耗时与吞吐量统计"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.reset()
+
+    def reset(self):
+        self.stages = {stage: Histogram(self.buckets) for stage in STAGES}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.started = None
+        self.finished = None
+
+    def start(self):
+        """开始新一批统计"""
+        self.reset()
+        self.started = time.perf_counter()
+
+    def stop(self):
+        self.finished = time.perf_counter()
+
+    def observe(self, stage, seconds):
+        self.stages[stage].observe(seconds)
+
+    def add(self, counter, value=1):
+        self.counters[counter] += value
+
+    @contextmanager
+    def timer(self, stage):
+        """with metrics.timer("read"): ... 记录代码块的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[stage].observe(time.perf_counter() - start)
+
+    @property
+    def wall_time(self):
+        if self.started is None:
+            return 0.0
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return end - self.started
+
+    @property
+    def audio_seconds(self):
+        return self.counters["audio_bytes"] / AUDIO_BYTES_PER_SECOND
+
+    def throughput(self):
+        """返回 (每秒字符数, 每秒墙钟时间生成的音频秒数)"""
+        wall_time = self.wall_time
+        if wall_time <= 0:
+            return 0.0, 0.0
+        return self.counters["characters"] / wall_time, self.audio_seconds / wall_time
+
+    def to_dict(self):
+        chars_per_second, audio_per_second = self.throughput()
+        return {
+            "wall_seconds": round(self.wall_time, 3),
+            "characters_per_second": round(chars_per_second, 1),
+            "audio_seconds": round(self.audio_seconds, 1),
+            "audio_seconds_per_second": round(audio_per_second, 2),
+            "counters": dict(self.counters),
+            "stages": {stage: histogram.to_dict() for stage, histogram in self.stages.items()},
+        }
+
+    def to_prometheus(self):
+        """导出为Prometheus文本格式"""
+        name = f"{METRIC_PREFIX}_stage_duration_seconds"
+        lines = [
+            f"# HELP {name} Duration of each conversion stage in the last batch.",
+            f"# TYPE {name} histogram",
+        ]
+        for stage, histogram in self.stages.items():
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+
+        chars_per_second, audio_per_second = self.throughput()
+        gauges = [
+            (f"batch_{counter}", f"Number of {counter.replace('_', ' ')} in the last batch.", value)
+            for counter, value in self.counters.items()
+        ] + [
+            ("batch_wall_seconds", "Wall time of the last batch.", round(self.wall_time, 6)),
+            ("characters_per_second", "Characters synthesized per wall second.",
+             round(chars_per_second, 3)),
+            ("audio_seconds_per_second", "Seconds of audio produced per wall second.",
+             round(audio_per_second, 3)),
+        ]
+        for metric, help_text, value in gauges:
+            lines.append(f"# HELP {METRIC_PREFIX}_{metric} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{metric} gauge")
+            lines.append(f"{METRIC_PREFIX}_{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """原子地写出统计文件：.json为JSON，其他扩展名为Prometheus文本格式"""
+        if path.lower().endswith(".json"):
+            content = json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+        else:
+            content = self.to_prometheus()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temp_file = path + ".tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(temp_file, path)
+
+    def summary(self):
+        chars_per_second, audio_per_second = self.throughput()
+        stages = "，".join(
+            f"{STAGE_NAMES[stage]} p50 {histogram.quantile(0.5) * 1000:.0f}ms"
+            f"/p90 {histogram.quantile(0.9) * 1000:.0f}ms"
+            for stage, histogram in self.stages.items() if histogram.count
+        )
+        text = (f"{chars_per_second:.0f} 字符/秒，每秒生成 {audio_per_second:.1f} 秒音频，"
+                f"合成请求 {self.counters['requests']} 次")
+        return f"{text}；{stages}" if stages else text
@@ -0,0 +1,112 @@
+"""MP3文件工具
+
+Edge-TTS输出的是不带封装的MPEG音频帧，多段音频去掉ID3标签后按顺序
+直接拼接即可得到一个可正常播放的MP3文件。
+"""
+import os
+import re
+
+ID3V2_HEADER_SIZE = 10
+ID3V1_TAG_SIZE = 128
+
+# Edge-TTS默认输出 audio-24khz-48kbitrate-mono-mp3，每秒6000字节
+AUDIO_BYTES_PER_SECOND = 48000 // 8
+
+# 正常语速下每秒朗读的字符数，用于估算音频大小
+CJK_CHARS_PER_SECOND = 4.5
+OTHER_CHARS_PER_SECOND = 14.0
+
+CJK_PATTERN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]")
+
+# audio-24khz-48kbitrate-mono-mp3 的帧头：MPEG-2 Layer III、无CRC、48kbps、24kHz、单声道
+FRAME_HEADER = b"\xff\xf3\x64\xc0"
+# 帧长 = 72 * 比特率 / 采样率，不使用填充位时固定为144字节
+FRAME_SIZE = 144
+# 每帧576个采样点，24kHz下为24毫秒
+FRAME_SAMPLES = 576
+SAMPLE_RATE = 24000
+# MPEG-2单声道的边信息长度，之后为主数据区
+SIDE_INFO_SIZE = 9
+
+
+def id3v2_size(header):
+    """返回ID3v2标签的总长度，不是ID3v2头部时返回0"""
+    if len(header) < ID3V2_HEADER_SIZE or header[:3] != b"ID3":
+        return 0
+    # 标签长度为4个7位的同步安全整数
+    size = 0
+    for byte in header[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = ID3V2_HEADER_SIZE if header[5] & 0x10 else 0
+    return ID3V2_HEADER_SIZE + size + footer
+
+
+def audio_frame_range(path):
+    """返回文件中音频帧数据的 (起始偏移, 结束偏移)"""
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        start = min(id3v2_size(f.read(ID3V2_HEADER_SIZE)), file_size)
+        end = file_size
+        if end - start >= ID3V1_TAG_SIZE:
+            f.seek(end - ID3V1_TAG_SIZE)
+            if f.read(3) == b"TAG":
+                end -= ID3V1_TAG_SIZE
+    return start, end
+
+
+def audio_duration(path):
+    """按固定码率由音频帧数据的长度计算时长（秒）"""
+    start, end = audio_frame_range(path)
+    return (end - start) / AUDIO_BYTES_PER_SECOND
+
+
+def join_mp3_files(part_files, output_file, buffer_size=1024 * 1024):
+    """按顺序拼接多个MP3文件的音频帧，写入output_file"""
+    with open(output_file, "wb") as out:
+        for part_file in part_files:
+            start, end = audio_frame_range(part_file)
+            with open(part_file, "rb") as f:
+                f.seek(start)
+                remaining = end - start
+                while remaining > 0:
+                    data = f.read(min(buffer_size, remaining))
+                    if not data:
+                        break
+                    out.write(data)
+                    remaining -= len(data)
+
+
+def silent_frames(count, ancillary=b""):
+    """生成count个静音帧
+
+    边信息全为0，解码结果为静音；主数据区作为附加数据，可写入任意字节（解码器会忽略）。
+    """
+    payload_size = FRAME_SIZE - len(FRAME_HEADER) - SIDE_INFO_SIZE
+    payload = (ancillary * (payload_size // max(1, len(ancillary)) + 1))[:payload_size] \
+        if ancillary else bytes(payload_size)
+    frame = FRAME_HEADER + bytes(SIDE_INFO_SIZE) + payload
+    return frame * count
+
+
+def count_frames(data):
+    """统计固定格式（FRAME_HEADER/FRAME_SIZE）的MP3帧数，遇到不合法的数据时抛出ValueError"""
+    if len(data) % FRAME_SIZE:
+        raise ValueError(f"数据长度 {len(data)} 不是帧长 {FRAME_SIZE} 的整数倍")
+    view = memoryview(data)
+    for offset in range(0, len(data), FRAME_SIZE):
+        if view[offset:offset + len(FRAME_HEADER)] != FRAME_HEADER:
+            raise ValueError(f"偏移 {offset} 处不是合法的帧头")
+    return len(data) // FRAME_SIZE
+
+
+def frames_duration(frame_count):
+    """帧数对应的音频时长（秒）"""
+    return frame_count * FRAME_SAMPLES / SAMPLE_RATE
+
+
+def estimate_audio_bytes(text):
+    """按字符数粗略估算合成后的MP3大小，用于显示进度"""
+    cjk_count = sum(1 for _ in CJK_PATTERN.finditer(text))
+    other_count = len(text) - cjk_count
+    seconds = cjk_count / CJK_CHARS_PER_SECOND + other_count / OTHER_CHARS_PER_SECOND
+    return max(1, int(seconds * AUDIO_BYTES_PER_SECOND))
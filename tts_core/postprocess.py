@@ -0,0 +1,236 @@
+"""音频后处理：响度归一化、段落停顿与输出格式
+
+拼接好的MP3经ffmpeg解码为PCM，按固定大小的块流式处理后再编码为目标格式，
+内存占用与音频长度无关：
+1. 第一遍用ffmpeg的ebur128滤镜测量整体的积分响度（EBU R128 / ITU-R BS.1770）；
+2. 第二遍把解码出的PCM按块读入，在段落边界处插入静音，
+   再以 (目标响度 - 测量值) 的增益编码（增益为正时加限幅，避免削波）。
+段落边界来自合成时收集的逐词边界：原文中词后有换行的位置（见subtitles.attach_punctuation）。
+输出格式为后端原生格式（Edge-TTS为48kbps MP3）且不需要处理时不经过这里。
+
+process_file 在进程池中运行，不阻塞事件循环中的合成任务。需要ffmpeg，未安装时抛出PostProcessError。
+"""
+import os
+import re
+import shutil
+import subprocess
+
+from .mp3 import SAMPLE_RATE
+from .subtitles import TICKS_PER_SECOND
+
+# 解码与编码使用与Edge-TTS输出一致的格式：24kHz、单声道、16位
+SAMPLE_WIDTH = 2
+CHANNELS = 1
+
+# 输出格式：扩展名、ffmpeg编码器、封装格式和默认码率（kbps，None表示无损PCM）
+OUTPUT_FORMATS = {
+    "mp3": {"extension": "mp3", "codec": "libmp3lame", "muxer": "mp3", "bitrate": 48},
+    "opus": {"extension": "opus", "codec": "libopus", "muxer": "ogg", "bitrate": 24},
+    "ogg": {"extension": "ogg", "codec": "libvorbis", "muxer": "ogg", "bitrate": 48},
+    "wav": {"extension": "wav", "codec": "pcm_s16le", "muxer": "wav", "bitrate": None},
+}
+DEFAULT_FORMAT = "mp3"
+MIN_BITRATE = 6
+MAX_BITRATE = 320
+
+# 每块PCM的采样数（1秒）
+BLOCK_SAMPLES = SAMPLE_RATE
+
+# 默认目标响度（LUFS），低于SILENCE_LOUDNESS的音频视为静音，不调整增益
+DEFAULT_LOUDNESS = -18.0
+SILENCE_LOUDNESS = -70.0
+# 增益为正时的限幅（线性幅度，约 -1 dBFS）
+LIMITER_LEVEL = 0.89
+
+# 单个段落停顿的上限（秒）
+MAX_PARAGRAPH_GAP = 10.0
+
+LOUDNESS_PATTERN = re.compile(r"\bI:\s*(-?inf|-?\d+(?:\.\d+)?)\s*LUFS")
+
+
+class PostProcessError(Exception):
+    """后处理失败"""
+
+
+def parse_bitrate(value):
+    """解析码率参数（kbps），如 "24k"、"24"，返回整数"""
+    text = str(value).strip().lower()
+    number = text[:-1] if text.endswith("k") else text
+    if not number.isdigit() or not MIN_BITRATE <= int(number) <= MAX_BITRATE:
+        raise ValueError(f"码率应为 {MIN_BITRATE}k-{MAX_BITRATE}k，如 24k: {value}")
+    return int(number)
+
+
+def format_extension(output_format):
+    """输出格式的文件扩展名（不含点）"""
+    return OUTPUT_FORMATS[output_format]["extension"]
+
+
+def needs_transcoding(output_format, bitrate, native_format):
+    """后端原生的 (格式, 码率) 无法直接满足要求时返回True"""
+    native_name, native_bitrate = native_format
+    if output_format != native_name:
+        return True
+    return bitrate is not None and bitrate != native_bitrate
+
+
+def find_ffmpeg():
+    """ffmpeg可执行文件的路径，未安装时返回None"""
+    return shutil.which("ffmpeg")
+
+
+def paragraph_gap_positions(boundaries):
+    """段落停顿的插入位置（秒）
+
+    取段落最后一个词的结尾与下一个词开头的中点，即两段之间原有的静音中间；
+    最后一个词之后不插入。
+    """
+    ordered = sorted(boundaries, key=lambda item: item["offset"])
+    positions = []
+    for current, following in zip(ordered, ordered[1:]):
+        if current.get("paragraph"):
+            end = current["offset"] + current["duration"]
+            middle = (end + max(end, following["offset"])) / 2
+            positions.append(middle / TICKS_PER_SECOND)
+    return positions
+
+
+def shift_for_gaps(boundaries, positions, gap):
+    """插入停顿后，把每个边界向后平移它之前插入的停顿总时长"""
+    if not positions or not gap:
+        return list(boundaries)
+    ticks = [round(position * TICKS_PER_SECOND) for position in sorted(positions)]
+    gap_ticks = round(gap * TICKS_PER_SECOND)
+    result = []
+    for boundary in boundaries:
+        count = sum(1 for tick in ticks if tick <= boundary["offset"])
+        result.append(dict(boundary, offset=boundary["offset"] + count * gap_ticks)
+                      if count else boundary)
+    return result
+
+
+def read_blocks(stream, block_size):
+    """从管道中按固定大小读取，保证每块都是完整的采样"""
+    while True:
+        data = stream.read(block_size)
+        if not data:
+            return
+        usable = len(data) - len(data) % SAMPLE_WIDTH
+        if usable:
+            yield data[:usable]
+
+
+def insert_gaps(blocks, positions, gap_samples):
+    """在PCM数据流的给定采样位置插入静音，逐块产生结果
+
+    blocks为按顺序产生的PCM字节块，positions为采样序号；超出音频末尾的位置被忽略。
+    """
+    silence = bytes(gap_samples * SAMPLE_WIDTH * CHANNELS)
+    pending = iter(sorted(positions))
+    position = next(pending, None)
+    offset = 0
+    frame_size = SAMPLE_WIDTH * CHANNELS
+    for block in blocks:
+        count = len(block) // frame_size
+        start = 0
+        while position is not None and position < offset + count:
+            cut = max(position - offset, start)
+            if cut > start:
+                yield block[start * frame_size:cut * frame_size]
+            yield silence
+            start = cut
+            position = next(pending, None)
+        if start < count:
+            yield block[start * frame_size:] if start else block
+        offset += count
+
+
+def measure_loudness(input_file, ffmpeg):
+    """用ebur128滤镜测量整体积分响度（LUFS），静音时返回负无穷"""
+    command = [ffmpeg, "-nostdin", "-hide_banner", "-nostats", "-i", input_file,
+               "-af", "ebur128", "-f", "null", "-"]
+    loudness = None
+    # 逐行读取日志，只保留最后一个积分响度（结尾的汇总），不在内存中保存全部输出
+    with subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE) as process:
+        for line in process.stderr:
+            match = LOUDNESS_PATTERN.search(line.decode("utf-8", "replace"))
+            if match:
+                loudness = float(match.group(1))
+    if process.returncode != 0 or loudness is None:
+        raise PostProcessError(f"测量响度失败: {input_file}")
+    return loudness
+
+
+def loudness_gain(measured, target):
+    """达到目标响度所需的增益（dB），静音时为0"""
+    if target is None or measured <= SILENCE_LOUDNESS:
+        return 0.0
+    return target - measured
+
+
+def encoder_arguments(output_format, bitrate=None):
+    """编码为output_format的ffmpeg输出参数，bitrate为None时使用该格式的默认码率"""
+    spec = OUTPUT_FORMATS[output_format]
+    arguments = ["-c:a", spec["codec"]]
+    if spec["bitrate"] is not None:
+        arguments += ["-b:a", f"{bitrate or spec['bitrate']}k"]
+    return arguments + ["-f", spec["muxer"]]
+
+
+def process_file(input_file, output_file, loudness=None, gap_positions=(), gap=0.0,
+                 output_format=DEFAULT_FORMAT, bitrate=None, ffmpeg=None):
+    """对input_file做响度归一化并在gap_positions（秒）处各插入gap秒静音，
+    以output_format和bitrate（kbps）编码写入output_file
+
+    input_file与output_file可以相同（先写临时文件再替换）。返回处理统计。
+    """
+    ffmpeg = ffmpeg or find_ffmpeg()
+    if ffmpeg is None:
+        raise PostProcessError("未找到ffmpeg，无法进行后处理和格式转换")
+
+    measured = None
+    gain = 0.0
+    if loudness is not None:
+        measured = measure_loudness(input_file, ffmpeg)
+        gain = loudness_gain(measured, loudness)
+
+    gap = min(max(gap, 0.0), MAX_PARAGRAPH_GAP)
+    positions = [round(position * SAMPLE_RATE) for position in gap_positions] if gap else []
+    filters = [f"volume={gain:.2f}dB"]
+    if gain > 0:
+        filters.append(f"alimiter=limit={LIMITER_LEVEL}")
+
+    pcm_format = ["-f", "s16le", "-ac", str(CHANNELS), "-ar", str(SAMPLE_RATE)]
+    decode = [ffmpeg, "-nostdin", "-v", "error", "-i", input_file] + pcm_format + ["-"]
+    temp_file = output_file + ".post.tmp"
+    encode = ([ffmpeg, "-nostdin", "-v", "error", "-y"] + pcm_format + ["-i", "-",
+              "-af", ",".join(filters)] + encoder_arguments(output_format, bitrate) + [temp_file])
+
+    decoder = subprocess.Popen(decode, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    encoder = subprocess.Popen(encode, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        blocks = read_blocks(decoder.stdout, BLOCK_SAMPLES * SAMPLE_WIDTH * CHANNELS)
+        try:
+            for data in insert_gaps(blocks, positions, round(gap * SAMPLE_RATE)):
+                encoder.stdin.write(data)
+        except BrokenPipeError:
+            pass
+        encoder.stdin.close()
+        decode_error = decoder.stderr.read()
+        encode_error = encoder.stderr.read()
+        if decoder.wait() != 0:
+            raise PostProcessError(f"解码失败: {decode_error.decode('utf-8', 'replace').strip()}")
+        if encoder.wait() != 0:
+            raise PostProcessError(f"编码失败: {encode_error.decode('utf-8', 'replace').strip()}")
+        os.replace(temp_file, output_file)
+    finally:
+        for process in (decoder, encoder):
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+        for stream in (decoder.stdout, decoder.stderr, encoder.stderr):
+            stream.close()
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+    return {"loudness": measured, "gain": gain, "gaps": len(positions)}
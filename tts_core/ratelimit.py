@@ -0,0 +1,221 @@
+"""自适应限流
+
+所有合成请求共用一个令牌桶和并发上限。请求失败或被服务端限流时按指数退避（带随机抖动）
+并降低并发数和请求速率；连续成功后再逐步恢复。
+"""
+import asyncio
+import random
+import time
+
+# 默认请求速率（次/秒）与下限
+DEFAULT_RATE = 20.0
+MIN_RATE = 0.5
+
+# 退避的初始等待时间与上限（秒）
+BASE_DELAY = 1.0
+MAX_DELAY = 30.0
+
+# 连续成功多少次后并发数加一、速率回升
+RECOVER_AFTER = 8
+
+# 表示服务端限流的HTTP状态码
+THROTTLE_STATUSES = frozenset([429, 503])
+
+
+def is_throttle_error(error):
+    """异常是否表示被服务端限流（aiohttp的ClientResponseError带有status属性）"""
+    return getattr(error, "status", None) in THROTTLE_STATUSES
+
+
+def is_retryable(error):
+    """参数错误重试也不会成功，其余异常都可以重试"""
+    return not isinstance(error, (ValueError, TypeError))
+
+
+class TokenBucket:
+    """令牌桶，按rate补充令牌，最多积累burst个"""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=1):
+        self.rate = rate
+        self.burst = max(1.0, float(burst))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self):
+        """预订一个令牌，返回需要等待的秒数
+
+        令牌可以透支，后来的请求排在透支部分之后，因此不需要加锁。
+        """
+        self._refill()
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens / self.rate
+
+    def set_rate(self, rate):
+        self._refill()
+        self.rate = rate
+
+
+class AdaptiveLimiter:
+    """合成请求的自适应限流器
+
+    adaptive为False时并发数和速率保持不变，退避也不加抖动，用于对比测试。
+    """
+
+    def __init__(self, max_concurrency, rate=DEFAULT_RATE, min_concurrency=1,
+                 base_delay=BASE_DELAY, max_delay=MAX_DELAY, recover_after=RECOVER_AFTER,
+                 adaptive=True, rng=None):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.min_concurrency = max(1, min(int(min_concurrency), self.max_concurrency))
+        self.concurrency = self.max_concurrency
+        self.max_rate = rate
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.recover_after = recover_after
+        self.adaptive = adaptive
+        self.rng = rng or random.Random()
+
+        self.bucket = TokenBucket(rate, burst=self.max_concurrency)
+        self._active = 0
+        self._successes = 0
+        # 被限流后所有请求暂停到该时间点（time.monotonic）
+        self._paused_until = 0.0
+        # 等待并发名额的future，按先来后到唤醒
+        self._waiters = []
+
+        # 统计
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.retries = 0
+        self.wait_time = 0.0
+        self.backoff_time = 0.0
+        self.min_seen_concurrency = self.concurrency
+
+    @property
+    def rate(self):
+        return self.bucket.rate
+
+    async def acquire(self):
+        """等待并发名额和令牌"""
+        start = time.monotonic()
+        while self._active >= self.concurrency:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except BaseException:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                elif not waiter.cancelled():
+                    # 已被唤醒但随即被取消，把名额让给下一个等待者
+                    self._wake()
+                raise
+        self._active += 1
+        try:
+            pause = self._paused_until - time.monotonic()
+            delay = max(pause, 0.0) + self.bucket.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        except BaseException:
+            self._release()
+            raise
+        self.requests += 1
+        self.wait_time += time.monotonic() - start
+
+    def release(self, error=None):
+        """归还名额，并根据请求结果调整并发数和速率"""
+        if error is None:
+            self._on_success()
+        else:
+            self._on_error(error)
+        self._release()
+
+    def abandon(self):
+        """归还被取消请求的名额，不影响并发数和速率"""
+        self._release()
+
+    def _release(self):
+        self._active -= 1
+        self._wake()
+
+    def _wake(self):
+        """按空出的名额唤醒等待者，被唤醒者会再检查一次名额"""
+        free = self.concurrency - self._active
+        for waiter in list(self._waiters):
+            if free <= 0:
+                break
+            if not waiter.done():
+                waiter.set_result(None)
+                self._waiters.remove(waiter)
+                free -= 1
+
+    def _on_success(self):
+        self._successes += 1
+        if not self.adaptive or self._successes < self.recover_after:
+            return
+        self._successes = 0
+        # 加性恢复：并发数加一，速率回升十分之一
+        if self.concurrency < self.max_concurrency:
+            self.concurrency += 1
+        if self.rate < self.max_rate:
+            self.bucket.set_rate(min(self.max_rate, self.rate + self.max_rate / 10))
+
+    def _on_error(self, error):
+        self.errors += 1
+        self._successes = 0
+        if not is_throttle_error(error):
+            return
+        self.throttled += 1
+        now = time.monotonic()
+        if not self.adaptive or now < self._paused_until:
+            # 同一批被拒绝的请求只减小一次，避免并发数被连续减半到底
+            return
+        # 乘性减小：并发数和速率减半，并让所有请求暂停一段时间
+        self.concurrency = max(self.min_concurrency, self.concurrency // 2)
+        self.min_seen_concurrency = min(self.min_seen_concurrency, self.concurrency)
+        self.bucket.set_rate(max(MIN_RATE, self.rate / 2))
+        self._paused_until = now + self.backoff_delay(0, error)
+
+    def backoff_delay(self, attempt, error=None):
+        """第attempt次重试前的等待时间
+
+        服务端给出Retry-After时以其为准，否则指数退避并在[一半, 全部]之间随机抖动，
+        避免大量请求在同一时刻重试。
+        """
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return min(self.max_delay, retry_after)
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        if not self.adaptive:
+            return delay
+        return delay / 2 + self.rng.uniform(0, delay / 2)
+
+    async def wait_retry(self, delay):
+        """记录一次重试并等待delay秒（通常取自backoff_delay）"""
+        self.retries += 1
+        self.backoff_time += delay
+        await asyncio.sleep(delay)
+
+    def summary(self):
+        """限流统计的文字描述"""
+        return (f"请求 {self.requests} 次，失败 {self.errors} 次（限流 {self.throttled} 次），"
+                f"重试 {self.retries} 次，排队 {self.wait_time:.1f} 秒，退避 {self.backoff_time:.1f} 秒，"
+                f"当前并发 {self.concurrency}/{self.max_concurrency}，速率 {self.rate:.1f} 次/秒")
+
+
+def _retry_after(error):
+    """从异常的响应头中取Retry-After秒数"""
+    headers = getattr(error, "headers", None)
+    if not headers:
+        return None
+    try:
+        return max(0.0, float(headers.get("Retry-After")))
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,727 @@
+"""本地HTTP合成服务
+
+其他工具可以通过HTTP调用与批量转换相同的合成核心（BatchEngine），不需要运行图形界面:
+
+    python -m tts_core serve --port 8765
+    curl -X POST localhost:8765/synthesize -d '{"text": "你好", "voice": "Xiaoxiao"}' -o hello.mp3
+
+接口:
+- POST /synthesize  {"text", "voice", "rate", "volume"}，边合成边以分块传输返回MP3；
+- POST /jobs        {"texts": [{"name", "text"}], "files": [输入根目录下的路径], "voices",
+                    "rate", "volume", "subtitles", "format", "bitrate"}，在后台批量转换，返回任务信息；
+                    只有启动时指定了输入根目录（--input-root）才接受 "files"；
+- GET  /jobs/<id>   任务状态、进度、日志和输出文件；
+- GET  /jobs/<id>/files/<文件名>  下载输出文件；
+- GET  /health      请求、合并与缓存统计。
+
+相同的并发请求只合成一次：后到的请求先读取这次合成已经产生的音频块，再跟随后续输出。
+短文本的结果保存在有大小上限的内存缓存中，重复的提示音直接从内存返回。
+HTTP部分直接基于 asyncio.start_server 实现，只支持本服务需要的 HTTP/1.1 子集
+（请求正文必须带 Content-Length）。
+"""
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from urllib.parse import quote, unquote, urlsplit
+
+from .cache import SynthesisCache
+from .converter import TextToSpeechConverter
+from .postprocess import (DEFAULT_FORMAT, OUTPUT_FORMATS, find_ffmpeg, needs_transcoding,
+                          parse_bitrate)
+from .subtitles import parse_formats
+from .voices import DEFAULT_VOICE, resolve_voice
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# 请求正文和单次合成文本的上限；更长的文本请使用批量任务
+MAX_BODY_SIZE = 16 * 1024 * 1024
+MAX_TEXT_LENGTH = 10000
+
+# 内存缓存：总大小上限，以及只缓存不超过该长度的文本
+DEFAULT_HOT_CACHE_BYTES = 64 * 1024 * 1024
+HOT_CACHE_MAX_TEXT = 200
+
+# 内存中保留的批量任务数与每个任务保留的日志行数
+MAX_JOBS = 200
+JOB_LOG_LINES = 200
+
+# 下载文件时每次读取的大小
+FILE_BLOCK_SIZE = 256 * 1024
+
+PERCENT_PATTERN = re.compile(r"[+-]\d+%")
+
+STATUS_TEXT = {
+    200: "OK",
+    202: "Accepted",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    502: "Bad Gateway",
+}
+
+CONTENT_TYPES = {
+    ".mp3": "audio/mpeg",
+    ".opus": "audio/ogg",
+    ".ogg": "audio/ogg",
+    ".wav": "audio/wav",
+    ".srt": "application/x-subrip; charset=utf-8",
+    ".vtt": "text/vtt; charset=utf-8",
+}
+
+
+def default_work_dir():
+    """默认的服务工作目录，批量任务的输入和输出保存在其中"""
+    return os.path.join(os.getcwd(), "tts_server")
+
+
+class HTTPError(Exception):
+    """以指定状态码和JSON错误信息回复请求"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class StreamAborted(Exception):
+    """响应头已经发出后出错，只能关闭连接"""
+
+
+class Request:
+    def __init__(self, method, path, version, headers, body):
+        self.method = method
+        self.path = path
+        self.version = version
+        self.headers = headers
+        self.body = body
+
+    @property
+    def keep_alive(self):
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    def json(self):
+        """解析JSON正文，必须是对象"""
+        try:
+            data = json.loads(self.body or b"{}")
+        except ValueError as e:
+            raise HTTPError(400, f"请求正文不是合法的JSON: {e}") from None
+        if not isinstance(data, dict):
+            raise HTTPError(400, "请求正文应为JSON对象")
+        return data
+
+
+async def read_request(reader):
+    """读取一个请求，连接已关闭时返回None"""
+    try:
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").rstrip("\r\n").split(" ")
+        except ValueError:
+            raise HTTPError(400, "请求行格式错误") from None
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+    except (ValueError, asyncio.LimitOverrunError):
+        raise HTTPError(400, "请求头过长") from None
+
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise HTTPError(411, "请求正文需要 Content-Length")
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HTTPError(400, "Content-Length 不是整数") from None
+    if length > MAX_BODY_SIZE:
+        raise HTTPError(413, f"请求正文超过 {MAX_BODY_SIZE // (1024 * 1024)} MB")
+    body = await reader.readexactly(length) if length > 0 else b""
+    return Request(method.upper(), unquote(urlsplit(target).path), version, headers, body)
+
+
+def response_head(status, headers):
+    lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}"]
+    lines.extend(f"{name}: {value}" for name, value in headers.items())
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def send_response(writer, status, body=b"", content_type="application/json; charset=utf-8",
+                        keep_alive=True, headers=None):
+    head = {"Content-Type": content_type, "Content-Length": len(body),
+            "Connection": "keep-alive" if keep_alive else "close"}
+    head.update(headers or {})
+    writer.write(response_head(status, head) + body)
+    await writer.drain()
+
+
+async def send_json(writer, status, data, keep_alive=True):
+    body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+    await send_response(writer, status, body, keep_alive=keep_alive)
+
+
+async def send_stream(writer, chunks, content_type, keep_alive=True, headers=None):
+    """以分块传输编码发送chunks产生的数据，中途出错时抛出StreamAborted"""
+    head = {"Content-Type": content_type, "Transfer-Encoding": "chunked",
+            "Connection": "keep-alive" if keep_alive else "close"}
+    head.update(headers or {})
+    writer.write(response_head(200, head))
+    try:
+        async for data in chunks:
+            if data:
+                writer.write(b"%x\r\n%b\r\n" % (len(data), data))
+                await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+    except Exception as e:
+        raise StreamAborted(str(e)) from e
+
+
+async def iter_bytes(data):
+    yield data
+
+
+class SharedStream:
+    """一次合成产生的音频块，供所有相同的请求读取"""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def append(self, data):
+        self.chunks.append(data)
+        self._notify()
+
+    def finish(self, error=None):
+        self.done = True
+        self.error = error
+        self._notify()
+
+    async def read(self):
+        """从头读取已产生的音频块，并跟随后续输出直到合成结束"""
+        index = 0
+        while True:
+            changed = self._changed
+            while index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+
+class HotCache:
+    """内存中的短文本合成结果，按最近最少使用（LRU）的顺序淘汰"""
+
+    def __init__(self, max_bytes=DEFAULT_HOT_CACHE_BYTES, max_text=HOT_CACHE_MAX_TEXT):
+        self.max_bytes = max_bytes
+        self.max_text = max_text
+        self._entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        data = self._entries.get(key)
+        if data is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return data
+
+    def put(self, key, text, data):
+        """缓存短文本的音频；文本过长或音频超过上限时不缓存"""
+        if len(text) > self.max_text or len(data) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.total_bytes -= len(old)
+        self._entries[key] = data
+        self.total_bytes += len(data)
+        while self.total_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.total_bytes -= len(evicted)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def to_dict(self):
+        return {"entries": len(self), "bytes": self.total_bytes, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses}
+
+
+def safe_filename(name, default):
+    """把客户端提供的名称变成不含路径的文件名"""
+    name = re.sub(r'[\\/:*?"<>|\x00-\x1f]+', "_", os.path.basename(str(name or ""))).strip(" .")
+    return name or default
+
+
+class BatchJob:
+    """后台批量转换任务"""
+
+    def __init__(self, job_id, output_dir, input_files):
+        self.id = job_id
+        self.output_dir = output_dir
+        self.input_files = input_files
+        self.status = "queued"
+        self.progress = 0.0
+        self.message = ""
+        self.results = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.task = None
+        self.lines = deque(maxlen=JOB_LOG_LINES)
+
+    def log(self, message, level="INFO"):
+        self.lines.append({"time": time.time(), "level": level, "message": message})
+
+    def on_progress(self, value, message):
+        self.progress = round(value, 1)
+        self.message = message
+
+    def output_files(self):
+        try:
+            names = os.listdir(self.output_dir)
+        except OSError:
+            return []
+        return sorted(name for name in names
+                      if not name.startswith(".") and os.path.splitext(name)[1] in CONTENT_TYPES)
+
+    def to_dict(self, with_log=False):
+        data = {
+            "id": self.id,
+            "status": self.status,
+            "progress": self.progress,
+            "message": self.message,
+            "created": self.created,
+            "finished": self.finished,
+            "inputs": [os.path.basename(path) for path in self.input_files],
+            "results": self.results,
+            "error": self.error,
+            "files": [f"/jobs/{self.id}/files/{quote(name)}" for name in self.output_files()],
+        }
+        if with_log:
+            data["log"] = list(self.lines)
+        return data
+
+
+class SynthesisService:
+    """HTTP合成服务
+
+    engine为BatchEngine，提供后端、限流器和可选的磁盘缓存；批量任务同样使用它们。
+    input_root为批量任务可以直接读取的服务器目录；为None时任务只能提交文本内容，
+    否则任何能访问端口的人都能让服务读取并返回进程可读的任意文件。
+    """
+
+    def __init__(self, engine, work_dir=None, hot_cache=None, input_root=None, log=None):
+        self.engine = engine
+        self.work_dir = work_dir or default_work_dir()
+        self.input_root = os.path.realpath(input_root) if input_root else None
+        self.hot_cache = hot_cache if hot_cache is not None else HotCache()
+        self.log = log or (lambda message, level="INFO": None)
+        # 正在合成的请求：缓存键 -> SharedStream
+        self._inflight = {}
+        self._producers = set()
+        self.jobs = OrderedDict()
+        self._server = None
+        # 统计
+        self.requests = 0
+        self.coalesced = 0
+        self.disk_hits = 0
+        self.failures = 0
+
+    # ---- 合成 ----
+
+    def make_key(self, text, voice, rate, volume):
+        return SynthesisCache.make_key(text, voice, rate, volume, self.engine.backend.name)
+
+    async def open_stream(self, text, voice, rate="+0%", volume="+0%"):
+        """返回产生该文本音频的异步迭代器
+
+        依次尝试内存缓存、正在进行的相同合成和磁盘缓存，都没有时开始新的合成。
+        """
+        self.requests += 1
+        key = self.make_key(text, voice, rate, volume)
+        data = self.hot_cache.get(key)
+        if data is not None:
+            return iter_bytes(data)
+        shared = self._inflight.get(key)
+        if shared is None and self.engine.cache is not None:
+            loop = asyncio.get_running_loop()
+            data = await loop.run_in_executor(None, self.engine.cache.read, key)
+            if data is not None:
+                self.disk_hits += 1
+                self.hot_cache.put(key, text, data)
+                return iter_bytes(data)
+            # 读取磁盘缓存期间可能已有相同的请求开始合成
+            shared = self._inflight.get(key)
+        if shared is not None:
+            self.coalesced += 1
+            return shared.read()
+
+        shared = self._inflight[key] = SharedStream()
+        # 合成在独立的任务中进行，第一个请求断开不影响其他等待同一结果的请求
+        task = asyncio.ensure_future(self._produce(key, text, voice, rate, volume, shared))
+        self._producers.add(task)
+        task.add_done_callback(self._producers.discard)
+        return shared.read()
+
+    async def _produce(self, key, text, voice, rate, volume, shared):
+        try:
+            async for data in self.engine.stream_audio(text, voice, rate, volume):
+                shared.append(data)
+        except Exception as e:
+            self.failures += 1
+            self.log(f"合成失败: {text[:20]}...: {e}", "ERROR")
+            shared.finish(e)
+            return
+        except BaseException:
+            # 服务关闭时被取消
+            shared.finish(ConnectionAbortedError("服务正在关闭"))
+            raise
+        finally:
+            if self._inflight.get(key) is shared:
+                del self._inflight[key]
+        shared.finish()
+        data = b"".join(shared.chunks)
+        self.hot_cache.put(key, text, data)
+        if self.engine.cache is not None and data:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._store, key, data)
+
+    def _store(self, key, data):
+        """把合成结果写入磁盘缓存"""
+        os.makedirs(self.work_dir, exist_ok=True)
+        temp_file = os.path.join(self.work_dir, f"{key}.{threading.get_ident()}.tmp")
+        try:
+            with open(temp_file, "wb") as f:
+                f.write(data)
+            self.engine.cache.put(key, temp_file)
+        except OSError as e:
+            self.log(f"写入缓存失败: {e}", "WARNING")
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+
+    def synthesis_params(self, params):
+        """校验合成参数，返回 (语音ID, 语速, 音量)"""
+        voice_name = params.get("voice") or DEFAULT_VOICE
+        voice = resolve_voice(str(voice_name))
+        if voice is None:
+            raise HTTPError(400, f"未知的语音: {voice_name}")
+        rate = params.get("rate") or "+0%"
+        volume = params.get("volume") or "+0%"
+        for name, value in (("rate", rate), ("volume", volume)):
+            if not isinstance(value, str) or not PERCENT_PATTERN.fullmatch(value):
+                raise HTTPError(400, f"{name} 格式应为 +10% 或 -20%: {value}")
+        return voice, rate, volume
+
+    async def handle_synthesize(self, request, writer, keep_alive):
+        params = request.json()
+        text = params.get("text")
+        if not isinstance(text, str) or not text.strip():
+            raise HTTPError(400, "缺少 text")
+        if len(text) > MAX_TEXT_LENGTH:
+            raise HTTPError(413, f"文本超过 {MAX_TEXT_LENGTH} 字符，请使用 /jobs 批量任务")
+        voice, rate, volume = self.synthesis_params(params)
+
+        chunks = (await self.open_stream(text, voice, rate, volume)).__aiter__()
+        # 收到第一块音频后再发送响应头，还没有音频时失败可以返回错误状态码
+        try:
+            first = await chunks.__anext__()
+        except StopAsyncIteration:
+            first = b""
+        except Exception as e:
+            raise HTTPError(502, f"合成失败: {e}") from None
+
+        async def body():
+            yield first
+            async for data in chunks:
+                yield data
+
+        await send_stream(writer, body(), "audio/mpeg", keep_alive, {"X-TTS-Voice": voice})
+
+    # ---- 批量任务 ----
+
+    async def handle_create_job(self, request, writer, keep_alive):
+        params = request.json()
+        texts = params.get("texts") or []
+        files = params.get("files") or []
+        if not isinstance(texts, list) or not isinstance(files, list) or not (texts or files):
+            raise HTTPError(400, "需要 texts 或 files 列表")
+        files = [self.resolve_input(path) for path in files]
+
+        voice_names = params.get("voices") or [params.get("voice") or DEFAULT_VOICE]
+        if isinstance(voice_names, str):
+            voice_names = voice_names.split(",")
+        if not isinstance(voice_names, list):
+            raise HTTPError(400, "voices 应为语音名称的列表或逗号分隔的字符串")
+        voice_ids = []
+        for name in voice_names:
+            voice_id = resolve_voice(str(name).strip())
+            if voice_id is None:
+                raise HTTPError(400, f"未知的语音: {name}")
+            voice_ids.append(voice_id)
+        _, rate, volume = self.synthesis_params({"rate": params.get("rate"),
+                                                 "volume": params.get("volume")})
+        subtitles = params.get("subtitles") or []
+        if isinstance(subtitles, list) and all(isinstance(item, str) for item in subtitles):
+            subtitles = ",".join(subtitles)
+        if not isinstance(subtitles, str):
+            raise HTTPError(400, "subtitles 应为字幕格式的列表或逗号分隔的字符串，如 [\"srt\", \"vtt\"]")
+        try:
+            subtitles = parse_formats(subtitles)
+        except ValueError as e:
+            raise HTTPError(400, str(e)) from None
+        output_format = params.get("format") or DEFAULT_FORMAT
+        if not isinstance(output_format, str) or output_format not in OUTPUT_FORMATS:
+            raise HTTPError(400, f"未知的输出格式: {output_format}")
+        bitrate = params.get("bitrate")
+        if bitrate is not None:
+            try:
+                bitrate = parse_bitrate(bitrate)
+            except ValueError as e:
+                raise HTTPError(400, str(e)) from None
+        if needs_transcoding(output_format, bitrate, self.engine.backend.output_format) \
+                and find_ffmpeg() is None:
+            raise HTTPError(400, f"服务器未安装ffmpeg，不能输出 {output_format}")
+
+        job_id = uuid.uuid4().hex[:12]
+        job_dir = os.path.join(self.work_dir, "jobs", job_id)
+        loop = asyncio.get_running_loop()
+        try:
+            written = await loop.run_in_executor(None, self._write_texts, job_dir, texts)
+        except (TypeError, KeyError, AttributeError):
+            raise HTTPError(400, "texts 中的每一项应为 {\"name\": ..., \"text\": ...}") from None
+
+        job = BatchJob(job_id, os.path.join(job_dir, "output"), written + list(files))
+        converter = TextToSpeechConverter(
+            job.output_dir, voice_ids=voice_ids, rate=rate, volume=volume,
+            concurrency=self.engine.concurrency, cache=self.engine.cache,
+            backend=self.engine.backend, limiter=self.engine.limiter, subtitles=subtitles,
+            output_format=output_format, bitrate=bitrate, log=job.log, progress=job.on_progress,
+        )
+        self.jobs[job_id] = job
+        self._prune_jobs()
+        job.task = asyncio.ensure_future(self._run_job(job, converter))
+        self.log(f"批量任务 {job_id}: {len(job.input_files)} 个文件，语音 {', '.join(voice_ids)}")
+        await send_json(writer, 202, job.to_dict(), keep_alive)
+
+    def resolve_input(self, path):
+        """把任务中的服务器文件路径解析为输入根目录下的真实路径，不允许时抛出HTTPError"""
+        if self.input_root is None:
+            raise HTTPError(403, "服务未配置输入根目录（--input-root），只能通过 texts 提交文本")
+        if not isinstance(path, str) or not path:
+            raise HTTPError(400, f"files 中的每一项应为文件路径: {path!r}")
+        # 相对路径相对于输入根目录；解析符号链接后仍须位于根目录之内
+        real_path = os.path.realpath(os.path.join(self.input_root, path))
+        if os.path.commonpath([self.input_root, real_path]) != self.input_root:
+            raise HTTPError(403, f"不允许读取输入根目录之外的文件: {path}")
+        if not os.path.isfile(real_path):
+            raise HTTPError(400, f"文件不存在: {path}")
+        return real_path
+
+    @staticmethod
+    def _write_texts(job_dir, texts):
+        input_dir = os.path.join(job_dir, "input")
+        os.makedirs(input_dir, exist_ok=True)
+        paths = []
+        used = set()
+        for index, item in enumerate(texts):
+            text = item["text"]
+            if not isinstance(text, str):
+                raise TypeError("text")
+            name = safe_filename(item.get("name"), f"text{index + 1:03d}")
+            if not name.lower().endswith(".txt"):
+                name += ".txt"
+            if name in used:
+                name = f"{os.path.splitext(name)[0]}_{index + 1:03d}.txt"
+            used.add(name)
+            path = os.path.join(input_dir, name)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            paths.append(path)
+        return paths
+
+    async def _run_job(self, job, converter):
+        job.status = "running"
+        try:
+            results = await converter.convert_batch(job.input_files)
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            self.log(f"批量任务 {job.id} 出错: {e}", "ERROR")
+        else:
+            job.results = [{"input": os.path.basename(path), "success": bool(result)}
+                           for path, result in zip(job.input_files, results)]
+            job.status = "done" if all(results) else "failed"
+            job.progress = 100.0
+            self.log(f"批量任务 {job.id} 结束: {job.status}")
+        finally:
+            job.finished = time.time()
+
+    def _prune_jobs(self):
+        """只在内存中保留最近的任务（输出文件留在磁盘上）"""
+        for job_id in list(self.jobs):
+            if len(self.jobs) <= MAX_JOBS:
+                break
+            if self.jobs[job_id].finished is not None:
+                del self.jobs[job_id]
+
+    def get_job(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPError(404, f"任务不存在: {job_id}")
+        return job
+
+    async def handle_job_file(self, job, name, writer, keep_alive):
+        name = os.path.basename(name)
+        path = os.path.join(job.output_dir, name)
+        content_type = CONTENT_TYPES.get(os.path.splitext(name)[1])
+        if name.startswith(".") or content_type is None or not os.path.isfile(path):
+            raise HTTPError(404, f"文件不存在: {name}")
+
+        async def blocks():
+            loop = asyncio.get_running_loop()
+            with open(path, "rb") as f:
+                while True:
+                    data = await loop.run_in_executor(None, f.read, FILE_BLOCK_SIZE)
+                    if not data:
+                        return
+                    yield data
+
+        disposition = f"attachment; filename*=UTF-8''{quote(name)}"
+        await send_stream(writer, blocks(), content_type, keep_alive,
+                          {"Content-Disposition": disposition})
+
+    # ---- 路由与连接 ----
+
+    def health(self):
+        cache = self.engine.cache
+        return {
+            "status": "ok",
+            "backend": self.engine.backend.name or "edge",
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+            "syntheses": self.engine.synthesis_count,
+            "failures": self.failures,
+            "hot_cache": self.hot_cache.to_dict(),
+            "disk_cache": None if cache is None else {"hits": self.disk_hits, "entries": len(cache)},
+            "limiter": self.engine.limiter.summary(),
+            "jobs": {status: sum(1 for job in self.jobs.values() if job.status == status)
+                     for status in ("queued", "running", "done", "failed")},
+        }
+
+    async def dispatch(self, request, writer, keep_alive):
+        path = request.path.rstrip("/") or "/"
+        parts = path.strip("/").split("/")
+        if path == "/synthesize":
+            self.require_method(request, "POST")
+            await self.handle_synthesize(request, writer, keep_alive)
+        elif path == "/jobs":
+            self.require_method(request, "POST")
+            await self.handle_create_job(request, writer, keep_alive)
+        elif parts[0] == "jobs" and len(parts) == 2:
+            self.require_method(request, "GET")
+            await send_json(writer, 200, self.get_job(parts[1]).to_dict(with_log=True), keep_alive)
+        elif parts[0] == "jobs" and len(parts) == 4 and parts[2] == "files":
+            self.require_method(request, "GET")
+            await self.handle_job_file(self.get_job(parts[1]), parts[3], writer, keep_alive)
+        elif path == "/health":
+            self.require_method(request, "GET")
+            await send_json(writer, 200, self.health(), keep_alive)
+        else:
+            raise HTTPError(404, f"没有这个接口: {request.path}")
+
+    @staticmethod
+    def require_method(request, method):
+        if request.method != method:
+            raise HTTPError(405, f"{request.path} 只支持 {method}")
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HTTPError as e:
+                    await send_json(writer, e.status, {"error": e.message}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                keep_alive = request.keep_alive
+                try:
+                    await self.dispatch(request, writer, keep_alive)
+                except HTTPError as e:
+                    await send_json(writer, e.status, {"error": e.message}, keep_alive)
+                except StreamAborted as e:
+                    self.log(f"响应中断: {request.path}: {e}", "WARNING")
+                    break
+                except Exception as e:
+                    self.log(f"处理请求出错: {request.method} {request.path}: {e}", "ERROR")
+                    await send_json(writer, 500, {"error": str(e)}, keep_alive=False)
+                    break
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    # ---- 生命周期 ----
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """开始监听，port为0时使用随机端口"""
+        self._server = await asyncio.start_server(self.handle_connection, host, port)
+        return self._server
+
+    @property
+    def port(self):
+        return self._server.sockets[0].getsockname()[1] if self._server else None
+
+    async def close(self):
+        """停止监听，取消正在进行的合成和批量任务"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        tasks = list(self._producers) + [job.task for job in self.jobs.values()
+                                         if job.task is not None and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """启动服务并一直运行，直到被取消"""
+        await self.start(host, port)
+        self.log(f"HTTP合成服务已启动: http://{host}:{self.port}")
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
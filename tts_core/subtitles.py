@@ -0,0 +1,217 @@
+"""字幕生成
+
+Edge-TTS在音频流中附带 WordBoundary 消息：
+{"type": "WordBoundary", "offset": 开始时间, "duration": 时长, "text": 词}，
+时间单位为100纳秒。合成时收集这些消息，按停顿、标点和长度把词合并成字幕条，
+写出与MP3同名的 .srt / .vtt 文件，不需要额外的合成或对齐。
+"""
+import json
+import os
+
+from .mp3 import CJK_PATTERN
+
+# 边界消息的时间单位：每秒的100纳秒数
+TICKS_PER_SECOND = 10_000_000
+
+BOUNDARY_TYPES = ("WordBoundary", "SentenceBoundary")
+
+# 分段与缓存条目旁保存边界数据的文件后缀
+BOUNDARY_SUFFIX = ".words.json"
+
+SUBTITLE_FORMATS = ("srt", "vtt")
+
+# 一条字幕的最大显示宽度（中日韩字符计2）和最长时长（秒）
+MAX_CUE_WIDTH = 42
+MAX_CUE_SECONDS = 6.0
+# 相邻两个词之间的停顿超过该值（秒）时另起一条
+CUE_BREAK_GAP = 0.6
+
+SENTENCE_END = "。！？.!?；;…"
+# 在原文中查找边界词时，从上一个词之后最多向前搜索的字符数
+ALIGN_WINDOW = 200
+
+
+def is_boundary(message):
+    """是否为词或句子的边界消息"""
+    return message.get("type") in BOUNDARY_TYPES
+
+
+def make_boundary(message):
+    """从边界消息中取出需要保存的字段"""
+    return {"offset": message["offset"], "duration": message["duration"], "text": message["text"]}
+
+
+def shift_boundaries(boundaries, shift):
+    """返回整体平移shift（100纳秒）后的边界列表"""
+    if not shift:
+        return list(boundaries)
+    return [dict(boundary, offset=boundary["offset"] + shift) for boundary in boundaries]
+
+
+def attach_punctuation(boundaries, text):
+    """按顺序在原文中找到每个词，把紧跟其后的标点补回词上
+
+    Edge-TTS的逐词边界不包含标点，补回后字幕能按句子断开，也更易读。
+    词之后的空白中有换行时标记 "paragraph": True，供后处理在段落之间插入停顿。
+    在原文附近找不到的词（如被服务改写过）保持原样。
+    """
+    result = []
+    cursor = 0
+    for boundary in boundaries:
+        word = boundary["text"]
+        position = text.find(word, cursor, cursor + ALIGN_WINDOW + len(word)) if word else -1
+        if position < 0:
+            result.append(boundary)
+            continue
+        end = position + len(word)
+        tail = end
+        while tail < len(text) and not text[tail].isspace() and not text[tail].isalnum():
+            tail += 1
+        cursor = tail
+        if tail > end:
+            boundary = dict(boundary, text=word + text[end:tail])
+        while tail < len(text) and text[tail].isspace():
+            if text[tail] == "\n":
+                boundary = dict(boundary, paragraph=True)
+                break
+            tail += 1
+        result.append(boundary)
+    return result
+
+
+def boundaries_path(audio_file):
+    """音频文件旁边保存边界数据的路径"""
+    return audio_file + BOUNDARY_SUFFIX
+
+
+def save_boundaries(path, boundaries):
+    """原子地把边界列表写入JSON文件"""
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(boundaries, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temp_path, path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def load_boundaries(path):
+    """读取边界列表，文件不存在或已损坏时返回None"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, list):
+        return None
+    return data
+
+
+def text_width(text):
+    """显示宽度，中日韩字符计2"""
+    return len(text) + sum(1 for _ in CJK_PATTERN.finditer(text))
+
+
+def join_words(left, right):
+    """拼接两个词：西文单词之间（包括西文标点之后）加空格，中文等直接相连"""
+    if not left:
+        return right
+    if left[-1].isascii() and right[:1].isascii() and right[:1].isalnum():
+        return f"{left} {right}"
+    return left + right
+
+
+def group_cues(boundaries, max_width=MAX_CUE_WIDTH, max_seconds=MAX_CUE_SECONDS,
+               break_gap=CUE_BREAK_GAP):
+    """把边界合并为字幕条，返回 [(开始秒, 结束秒, 文本)]
+
+    遇到句末标点、较长的停顿，或加入下一个词后超过宽度/时长上限时另起一条。
+    """
+    cues = []
+    text = ""
+    start = end = 0
+    for boundary in sorted(boundaries, key=lambda item: item["offset"]):
+        word = (boundary.get("text") or "").strip()
+        if not word:
+            continue
+        offset = boundary["offset"]
+        word_end = offset + boundary["duration"]
+        if text and (offset - end > break_gap * TICKS_PER_SECOND
+                     or text_width(join_words(text, word)) > max_width
+                     or word_end - start > max_seconds * TICKS_PER_SECOND):
+            cues.append((start / TICKS_PER_SECOND, end / TICKS_PER_SECOND, text))
+            text = ""
+        if not text:
+            start = offset
+        text = join_words(text, word)
+        end = max(end, word_end)
+        if word[-1] in SENTENCE_END:
+            cues.append((start / TICKS_PER_SECOND, end / TICKS_PER_SECOND, text))
+            text = ""
+    if text:
+        cues.append((start / TICKS_PER_SECOND, end / TICKS_PER_SECOND, text))
+    return cues
+
+
+def format_timestamp(seconds, separator):
+    milliseconds = max(0, round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{milliseconds:03d}"
+
+
+def format_srt(cues):
+    blocks = []
+    for index, (start, end, text) in enumerate(cues, 1):
+        blocks.append(f"{index}\n{format_timestamp(start, ',')} --> "
+                      f"{format_timestamp(end, ',')}\n{text}\n")
+    return "\n".join(blocks)
+
+
+def format_vtt(cues):
+    blocks = ["WEBVTT\n"]
+    for start, end, text in cues:
+        blocks.append(f"{format_timestamp(start, '.')} --> {format_timestamp(end, '.')}\n{text}\n")
+    return "\n".join(blocks)
+
+
+FORMATTERS = {
+    "srt": format_srt,
+    "vtt": format_vtt,
+}
+
+
+def subtitle_path(audio_file, subtitle_format):
+    """与音频文件同名的字幕文件路径"""
+    return f"{os.path.splitext(audio_file)[0]}.{subtitle_format}"
+
+
+def write_subtitles(audio_file, boundaries, formats=SUBTITLE_FORMATS):
+    """在音频文件旁边写出各格式的字幕文件，返回写出的路径列表"""
+    cues = group_cues(boundaries)
+    paths = []
+    for subtitle_format in formats:
+        path = subtitle_path(audio_file, subtitle_format)
+        temp_path = path + ".tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(FORMATTERS[subtitle_format](cues))
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        paths.append(path)
+    return paths
+
+
+def parse_formats(value):
+    """解析逗号分隔的字幕格式，如 "srt,vtt"；未知格式时抛出ValueError"""
+    formats = [item.strip().lower() for item in value.split(",") if item.strip()]
+    unknown = [item for item in formats if item not in FORMATTERS]
+    if unknown:
+        raise ValueError(f"未知的字幕格式: {', '.join(unknown)}，可用: {', '.join(FORMATTERS)}")
+    return list(dict.fromkeys(formats))
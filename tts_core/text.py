@@ -0,0 +1,268 @@
+"""文本读取与分段"""
+import codecs
+import mmap
+import os
+import re
+import zlib
+
+# 编码检测时读取的样本大小
+SAMPLE_SIZE = 64 * 1024
+
+# 超过该大小的文件使用内存映射读取，避免额外复制一份字节数据
+MMAP_THRESHOLD = 8 * 1024 * 1024
+
+# 按优先级尝试的编码（gb2312是gbk的子集，保留是为了兼容原有顺序）。
+# UTF-16/32只通过BOM或NUL字节分布识别：任意偶数长度的字节串几乎都能按UTF-16解码，
+# 放在候选列表里会把latin-1文件误判成乱码。
+ENCODINGS = ['utf-8', 'gbk', 'gb2312', 'latin-1']
+
+# 字节顺序标记，UTF-32必须排在UTF-16之前
+BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+
+def _sample_decodes(samples, encoding):
+    """所有样本能否用该编码解码
+
+    samples为 (样本, 是否位于文件末尾) 列表；样本末尾被截断的多字节字符不算错误。
+    """
+    try:
+        for sample, final in samples:
+            codecs.getincrementaldecoder(encoding)().decode(sample, final)
+        return True
+    except (UnicodeError, LookupError):
+        return False
+
+
+def _aligned_sample(data, start, size):
+    """从start处取样本，并跳到第一个确定的字符边界
+
+    UTF-8和GBK中小于0x40的字节一定是单字节字符，其后必然是字符边界。
+    """
+    sample = data[start:start + size]
+    for index in range(min(len(sample), 256)):
+        if sample[index] < 0x40:
+            return sample[index + 1:]
+    return sample
+
+
+def _collect_samples(data):
+    """取文件开头、中间和结尾的有界样本"""
+    size = len(data)
+    if size <= SAMPLE_SIZE * 3:
+        return [(data[:], True)]
+    return [
+        (data[:SAMPLE_SIZE], False),
+        (_aligned_sample(data, size // 2, SAMPLE_SIZE), False),
+        (_aligned_sample(data, size - SAMPLE_SIZE, SAMPLE_SIZE), True),
+    ]
+
+
+def _guess_utf16_without_bom(sample):
+    """根据NUL字节的位置判断无BOM的UTF-16文本"""
+    if len(sample) < 4:
+        return None
+    even_nuls = sample[0::2].count(0)
+    odd_nuls = sample[1::2].count(0)
+    half = len(sample) // 2
+    # 以ASCII为主的UTF-16文本，约一半字节为NUL且集中在同一侧
+    if odd_nuls > half * 0.3 and even_nuls < half * 0.05:
+        return 'utf-16-le'
+    if even_nuls > half * 0.3 and odd_nuls < half * 0.05:
+        return 'utf-16-be'
+    return None
+
+
+def detect_encoding(data):
+    """根据BOM和有界样本推测编码，返回候选编码列表（按优先级）
+
+    data可以是bytes或mmap，只读取开头、中间、结尾各SAMPLE_SIZE字节。
+    """
+    head = data[:SAMPLE_SIZE]
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return [encoding]
+
+    utf16 = _guess_utf16_without_bom(head)
+    if utf16:
+        return [utf16] + ENCODINGS
+
+    samples = _collect_samples(data)
+    for index, encoding in enumerate(ENCODINGS):
+        if _sample_decodes(samples, encoding):
+            return ENCODINGS[index:]
+    return ENCODINGS[-1:]
+
+
+def _decode(data, candidates):
+    """按候选编码依次解码，只有样本之外出现非法字节时才会尝试下一个"""
+    for encoding in candidates:
+        try:
+            return str(data, encoding)
+        except (UnicodeError, LookupError):
+            continue
+    return str(data, 'utf-8', errors='ignore')
+
+
+def _decode_text(data):
+    """检测编码后一次解码，并与文本模式读取一样统一换行符"""
+    text = _decode(data, detect_encoding(data))
+    if data.find(b'\r') == -1:
+        return text
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+def read_text_file(file_path, use_mmap=True):
+    """读取文本文件，自动识别编码
+
+    先检查BOM并对有界样本做编码检测，再对整个文件只解码一次；
+    大文件通过内存映射直接解码。
+    """
+    file_size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        if file_size == 0:
+            return ""
+
+        if use_mmap and file_size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return _decode_text(data)
+
+        return _decode_text(f.read())
+
+
+# 句末标点之后可能紧跟的右引号、右括号
+CLOSING_MARKS = "”’\"'」』）)】》"
+
+# 以英文句号结尾但不表示句子结束的常见缩写（小写，不含句号）
+ABBREVIATIONS = frozenset([
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "vs", "etc", "no",
+    "fig", "vol", "inc", "ltd", "co", "corp", "jan", "feb", "mar", "apr",
+    "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec", "e.g", "i.e",
+    "a.m", "p.m", "u.s",
+])
+
+# 英文句号前不能是缩写或单个大写字母（姓名首字母，如 "J. K. Rowling"）。
+# 每个缩写是一个定长的后顾断言；同样长度的缩写合并为一个断言，由正则引擎在匹配时直接排除，
+# 不需要在Python中逐个检查候选边界；断言只在句号处求值（见下面的 (?=\.)）
+NOT_ABBREVIATION = r"(?<!\b[A-Z])" + "".join(
+    r"(?i:(?<!\b(?:%s)))" % "|".join(re.escape(word) for word in sorted(ABBREVIATIONS)
+                                      if len(word) == length)
+    for length in sorted({len(word) for word in ABBREVIATIONS}))
+
+# 句子边界：中英文句末标点（英文句号后须为空白、右引号或文本结尾，且不跟在缩写之后）
+# 及其后的右引号，或换行
+SENTENCE_END_PATTERN = r"(?:[。！？!?…]+|(?=\.)%s\.+(?=[\s%s]|$))[%s]*|\n" % (
+    NOT_ABBREVIATION, re.escape(CLOSING_MARKS), re.escape(CLOSING_MARKS))
+SENTENCE_END = re.compile(SENTENCE_END_PATTERN)
+
+# 贪婪匹配到窗口内最后一个句子边界，整个回溯过程在正则引擎中完成
+LAST_SENTENCE_END = re.compile(r".*(%s)" % SENTENCE_END_PATTERN, re.S)
+
+# 超长句子的次级断点：逗号、分号、顿号、冒号和空白
+LAST_SOFT_BREAK = re.compile(r".*(?:[，,；;、：:]|\s)", re.S)
+
+
+def _last_sentence_end(text, start, limit):
+    """返回text[start:limit]内最后一个句子边界的位置，没有时返回None
+
+    缩写已由正则排除，只有紧贴窗口末尾、被截断的边界需要结合完整文本确认，
+    确认失败时在它之前再找一次，每个窗口最多重试一两次。
+    """
+    end = limit
+    while end > start:
+        match = LAST_SENTENCE_END.match(text, start, end)
+        if match is None:
+            return None
+        if match.end() < end or end == len(text):
+            return match.end()
+        # 窗口末尾会被当作文本结尾，需要结合完整文本重新确认
+        mark = match.start(1)
+        full = SENTENCE_END.match(text, mark)
+        if full is not None and full.end() == match.end():
+            return match.end()
+        end = mark
+    return None
+
+
+def _soft_cut(text, start, max_length):
+    """超长句子在窗口后半段的最后一个逗号或空白处切开，找不到时硬切"""
+    match = LAST_SOFT_BREAK.match(text, start + max_length // 2, start + max_length)
+    return match.end() if match else start + max_length
+
+
+# 内容锚点：分段长度达到上限的MIN_CHUNK_RATIO之后，优先在"锚点"句子的结尾处切开。
+# 一个句子是否为锚点只取决于它和紧邻前文的内容（CRC32），与它在文件中的位置无关，
+# 因此在前面插入或删除文字后，后面的切分点仍落在相同的句子上，未改动的分段保持不变，
+# 可以直接命中合成缓存。句子被选为锚点的概率与其长度成正比，锚点平均间隔约为
+# 上限的ANCHOR_SPACING_RATIO；段落结尾（换行）的权重更高，切分点尽量落在段落之间。
+# 分段平均长度约为上限的80%，约一成的分段因窗口内没有锚点而退回到最后一个句子边界。
+MIN_CHUNK_RATIO = 0.65
+ANCHOR_SPACING_RATIO = 0.15
+PARAGRAPH_WEIGHT = 4
+# 查找锚点时向前多扫描的字符数，用于确定第一个候选句子的开头
+ANCHOR_LOOKBACK = 200
+# 计算锚点哈希时取边界之前的字符数。只用句子本身时，反复出现的相同句子（对白、套话）
+# 处处都是锚点，切分点会随插入的文字整体错位；带上前文后重复句子的哈希各不相同
+ANCHOR_CONTEXT = 256
+
+
+def _next_anchor(text, start, limit, max_length):
+    """返回 [start + 下限, limit] 内第一个锚点句子的结尾，没有时返回None"""
+    min_end = start + int(max_length * MIN_CHUNK_RATIO)
+    spacing = max(1, int(max_length * ANCHOR_SPACING_RATIO))
+    scan_from = max(start, min_end - ANCHOR_LOOKBACK)
+    # 第一个候选句子的开头需要完整文本中的上一个边界；从分段开头扫描时就是分段开头
+    sentence_start = start if scan_from == start else None
+    length = len(text)
+    for match in SENTENCE_END.finditer(text, scan_from, limit):
+        end = match.end()
+        if end == limit and end < length:
+            # 窗口末尾的边界可能被截断，留给 _last_sentence_end 确认
+            break
+        if end < length and text[end] == "\n":
+            # 句末标点后紧跟换行：换行与这一句一起作为段落结尾
+            continue
+        if sentence_start is not None and end >= min_end:
+            weight = end - sentence_start
+            if text[end - 1] == "\n":
+                weight *= PARAGRAPH_WEIGHT
+            context = text[max(0, end - ANCHOR_CONTEXT):end]
+            if zlib.crc32(context.encode("utf-8")) % spacing < weight:
+                return end
+        sentence_start = end
+    return None
+
+
+def iter_text_chunks(text, max_length=10000):
+    """按句子边界把文本合并成不超过max_length的分段，逐段产生
+
+    每段在长度达到上限的MIN_CHUNK_RATIO后，于第一个内容锚点处切开（见 _next_anchor）；
+    窗口内没有锚点时取最后一个句子边界。每个窗口只扫描一遍，整体为线性时间；
+    各段按顺序拼接后与原文完全一致。
+    """
+    start = 0
+    length = len(text)
+    while length - start > max_length:
+        limit = start + max_length
+        boundary = _next_anchor(text, start, limit, max_length)
+        if boundary is None:
+            boundary = _last_sentence_end(text, start, limit)
+        if boundary is None:
+            # 窗口内没有句子边界：单个句子超长
+            boundary = _soft_cut(text, start, max_length)
+        yield text[start:boundary]
+        start = boundary
+    if start < length:
+        yield text[start:]
+
+
+def split_long_text(text, max_length=10000):
+    """按句子边界分割长文本"""
+    if len(text) <= max_length:
+        return [text]
+    return list(iter_text_chunks(text, max_length))
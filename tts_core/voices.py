@@ -0,0 +1,363 @@
+"""语音配置
+
+Edge-TTS支持的神经语音列表，以及语音ID到语言、文件名后缀的映射。
+
+内置的常用语音之外，完整的语音目录从 edge_tts.list_voices() 获取，保存为缓存目录中的
+voices.json 快照，过期（默认7天）后才重新获取；离线时直接使用快照或内置列表。
+目录按语音ID、短名、语言和性别建立索引，查询都是一次字典查找。
+"""
+import json
+import os
+import threading
+import time
+
+from .cache import default_cache_dir
+
+# 可用的语音列表 - 显示名称到语音ID
+VOICE_OPTIONS = {
+    # 中文语音
+    "晓晓 (年轻女声-推荐)": "zh-CN-XiaoxiaoNeural",
+    "云希 (年轻男声)": "zh-CN-YunxiNeural",
+    "云扬 (新闻男声)": "zh-CN-YunyangNeural",
+    "晓萱 (成熟女声)": "zh-CN-XiaoxuanNeural",
+    "晓梦 (情感女声)": "zh-CN-XiaomengNeural",
+    "晓颜 (聊天女声)": "zh-CN-XiaoruiNeural",
+
+    # 英文语音
+    "Jenny (美式英文-女)": "en-US-JennyNeural",
+    "Guy (美式英文-男)": "en-US-GuyNeural",
+    "Aria (美式英文-女)": "en-US-AriaNeural",
+    "Davis (美式英文-男)": "en-US-DavisNeural",
+    "Amber (美式英文-女)": "en-US-AmberNeural",
+    "Ana (美式英文-女童)": "en-US-AnaNeural",
+
+    # 日文语音
+    "Nanami (日文-女)": "ja-JP-NanamiNeural",
+    "Keita (日文-男)": "ja-JP-KeitaNeural",
+    "Aoi (日文-女)": "ja-JP-AoiNeural",
+
+    # 其他语言
+    "法语-女声": "fr-FR-DeniseNeural",
+    "德语-女声": "de-DE-KatjaNeural",
+    "西班牙语-女声": "es-ES-ElviraNeural",
+    "韩语-女声": "ko-KR-SunHiNeural",
+    "俄语-女声": "ru-RU-SvetlanaNeural",
+}
+
+DEFAULT_VOICE_NAME = "晓晓 (年轻女声-推荐)"
+DEFAULT_VOICE = VOICE_OPTIONS[DEFAULT_VOICE_NAME]
+
+# 语音到语言的映射
+VOICE_TO_LANGUAGE = {
+    "zh-CN-XiaoxiaoNeural": "zh-CN",
+    "zh-CN-YunxiNeural": "zh-CN",
+    "zh-CN-YunyangNeural": "zh-CN",
+    "zh-CN-XiaoxuanNeural": "zh-CN",
+    "zh-CN-XiaomengNeural": "zh-CN",
+    "zh-CN-XiaoruiNeural": "zh-CN",
+    "en-US-JennyNeural": "en-US",
+    "en-US-GuyNeural": "en-US",
+    "en-US-AriaNeural": "en-US",
+    "en-US-DavisNeural": "en-US",
+    "en-US-AmberNeural": "en-US",
+    "en-US-AnaNeural": "en-US",
+    "ja-JP-NanamiNeural": "ja-JP",
+    "ja-JP-KeitaNeural": "ja-JP",
+    "ja-JP-AoiNeural": "ja-JP",
+    "fr-FR-DeniseNeural": "fr-FR",
+    "de-DE-KatjaNeural": "de-DE",
+    "es-ES-ElviraNeural": "es-ES",
+    "ko-KR-SunHiNeural": "ko-KR",
+    "ru-RU-SvetlanaNeural": "ru-RU",
+}
+
+# 语音后缀映射表（用于输出文件名）
+VOICE_SUFFIX_MAP = {
+    "zh-CN-XiaoxiaoNeural": "Xiaoxiao",
+    "zh-CN-YunxiNeural": "Yunxi",
+    "zh-CN-YunyangNeural": "Yunyang",
+    "zh-CN-XiaoxuanNeural": "Xiaoxuan",
+    "zh-CN-XiaomengNeural": "Xiaomeng",
+    "zh-CN-XiaoruiNeural": "Xiaorui",
+    "en-US-JennyNeural": "Jenny",
+    "en-US-GuyNeural": "Guy",
+    "en-US-AriaNeural": "Aria",
+    "en-US-DavisNeural": "Davis",
+    "en-US-AmberNeural": "Amber",
+    "en-US-AnaNeural": "Ana",
+    "ja-JP-NanamiNeural": "Nanami",
+    "ja-JP-KeitaNeural": "Keita",
+    "ja-JP-AoiNeural": "Aoi",
+    "fr-FR-DeniseNeural": "Denise",
+    "de-DE-KatjaNeural": "Katja",
+    "es-ES-ElviraNeural": "Elvira",
+    "ko-KR-SunHiNeural": "SunHi",
+    "ru-RU-SvetlanaNeural": "Svetlana",
+}
+
+
+# 语音目录快照的文件名、有效期（秒）与在线获取的超时时间（秒）
+CATALOG_FILE = "voices.json"
+CATALOG_TTL = 7 * 24 * 3600
+FETCH_TIMEOUT = 10.0
+
+GENDER_NAMES = {"Female": "女", "Male": "男"}
+
+
+def voice_suffix_from_id(voice_id):
+    """从语音ID提取英文短名，如 zh-CN-XiaoxiaoNeural -> Xiaoxiao"""
+    if voice_id and "-" in voice_id:
+        parts = voice_id.split("-")
+        if len(parts) >= 3:
+            name = parts[-1]
+            # 去掉"Neural"后缀
+            if name.endswith("Neural"):
+                return name[:-6]
+            return name
+        return voice_id
+    return "Unknown"
+
+
+def builtin_gender(display_name):
+    """内置语音的显示名称中都注明了性别"""
+    if "男" in display_name:
+        return "Male"
+    if "女" in display_name:
+        return "Female"
+    return None
+
+
+class VoiceCatalog:
+    """语音目录
+
+    每个语音为一个字典：id、locale、gender、suffix（输出文件名中的英文短名）、display（显示名称）。
+    内置语音排在最前面并保留原来的中文显示名称。
+    """
+
+    def __init__(self, voices, fetched=None, source="builtin"):
+        # 在线获取的时间（time.time()），内置目录为None
+        self.fetched = fetched
+        self.source = source
+        self.voices = []
+        self.by_id = {}
+        # 小写的语音ID、短名和显示名称 -> 语音ID
+        self.by_name = {}
+        self.by_locale = {}
+        self.by_gender = {}
+        # 显示名称 -> 语音ID，按目录顺序，供界面下拉框使用
+        self.options = {}
+        for voice in voices:
+            self._add(voice)
+
+    def _add(self, voice):
+        voice_id = voice["id"]
+        if voice_id in self.by_id:
+            return
+        self.voices.append(voice)
+        self.by_id[voice_id] = voice
+        for name in (voice_id, voice["suffix"], voice["display"]):
+            self.by_name.setdefault(name.lower(), voice_id)
+        self.by_locale.setdefault(voice["locale"], []).append(voice)
+        self.by_gender.setdefault(voice["gender"], []).append(voice)
+        self.options.setdefault(voice["display"], voice_id)
+
+    @staticmethod
+    def make_voice(voice_id, locale=None, gender=None, display=None):
+        suffix = VOICE_SUFFIX_MAP.get(voice_id) or voice_suffix_from_id(voice_id)
+        locale = locale or "-".join(voice_id.split("-")[:2])
+        if display is None:
+            display = f"{suffix} ({locale}-{GENDER_NAMES.get(gender, gender or '?')})"
+        return {"id": voice_id, "locale": locale, "gender": gender, "suffix": suffix,
+                "display": display}
+
+    @classmethod
+    def builtin_voices(cls):
+        return [cls.make_voice(voice_id, VOICE_TO_LANGUAGE.get(voice_id),
+                               builtin_gender(display_name), display_name)
+                for display_name, voice_id in VOICE_OPTIONS.items()]
+
+    @classmethod
+    def builtin(cls):
+        """只含内置语音的目录"""
+        return cls(cls.builtin_voices())
+
+    @classmethod
+    def from_entries(cls, entries, fetched=None, source="service"):
+        """由 edge_tts.list_voices() 返回的条目建立目录，内置语音排在最前"""
+        service_voices = sorted(
+            (cls.make_voice(entry["ShortName"], entry.get("Locale"), entry.get("Gender"))
+             for entry in entries if entry.get("ShortName")),
+            key=lambda voice: (voice["locale"], voice["id"]))
+        return cls(cls.builtin_voices() + service_voices, fetched, source)
+
+    def get(self, voice_id):
+        return self.by_id.get(voice_id)
+
+    def suffix(self, voice_id):
+        """输出文件名中使用的英文短名"""
+        voice = self.by_id.get(voice_id)
+        return voice["suffix"] if voice is not None else voice_suffix_from_id(voice_id)
+
+    def language(self, voice_id):
+        voice = self.by_id.get(voice_id)
+        return voice["locale"] if voice is not None else None
+
+    def resolve(self, name):
+        """把显示名称、语音ID或英文短名解析为语音ID，未知时返回None"""
+        voice_id = self.options.get(name) or self.by_name.get(name.lower())
+        if voice_id is not None:
+            return voice_id
+        # 未知的完整语音ID原样交给Edge-TTS校验
+        if name.count("-") >= 2:
+            return name
+        return None
+
+    def find(self, locale=None, gender=None):
+        """按语言（如 zh-CN，或语言前缀 zh）和性别（Female/Male）筛选"""
+        if locale is not None:
+            if locale in self.by_locale:
+                voices = self.by_locale[locale]
+            else:
+                prefix = locale.lower() + "-"
+                voices = [voice for voice in self.voices
+                          if voice["locale"].lower().startswith(prefix)]
+        elif gender is not None:
+            return list(self.by_gender.get(gender, []))
+        else:
+            voices = self.voices
+        if gender is not None:
+            voices = [voice for voice in voices if voice["gender"] == gender]
+        return list(voices)
+
+    def locales(self):
+        return sorted(self.by_locale)
+
+    def is_stale(self, ttl=CATALOG_TTL):
+        return self.fetched is None or time.time() - self.fetched > ttl
+
+    def __len__(self):
+        return len(self.voices)
+
+    def __contains__(self, voice_id):
+        return voice_id in self.by_id
+
+    def save(self, path):
+        """原子地写出快照（只保存在线获取的条目）"""
+        builtin_ids = set(VOICE_OPTIONS.values())
+        entries = [{"ShortName": voice["id"], "Locale": voice["locale"], "Gender": voice["gender"]}
+                   for voice in self.voices if voice["id"] not in builtin_ids]
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_file = path + ".tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump({"fetched": self.fetched, "voices": entries}, f, ensure_ascii=False)
+        os.replace(temp_file, path)
+
+    @classmethod
+    def load(cls, path):
+        """读取快照，不存在或损坏时返回None"""
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            return cls.from_entries(data["voices"], data.get("fetched"), source="snapshot")
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+
+def catalog_path(cache_dir=None):
+    """语音目录快照的路径，默认在合成缓存目录中"""
+    return os.path.join(cache_dir or default_cache_dir(), CATALOG_FILE)
+
+
+async def fetch_catalog(timeout=FETCH_TIMEOUT):
+    """从Edge-TTS在线获取完整的语音目录"""
+    import asyncio
+    import edge_tts
+    entries = await asyncio.wait_for(edge_tts.list_voices(), timeout)
+    return VoiceCatalog.from_entries(entries, time.time())
+
+
+def refresh_in_background(path, log=None):
+    """在后台线程中在线获取语音目录并更新快照，返回线程（守护线程，不阻止进程退出）"""
+    log = log or (lambda message, level="INFO": None)
+
+    def run():
+        import asyncio
+        try:
+            catalog = asyncio.run(fetch_catalog())
+        except Exception as e:
+            log(f"后台更新语音列表失败: {e}", "WARNING")
+            return
+        save_catalog(catalog, path, log)
+
+    thread = threading.Thread(target=run, name="voice-catalog-refresh", daemon=True)
+    thread.start()
+    return thread
+
+
+def load_catalog(cache_dir=None, ttl=CATALOG_TTL, refresh=False, offline=False, log=None):
+    """加载语音目录并设为当前目录
+
+    优先使用未过期的本地快照；快照不存在或refresh为True时在线获取并更新快照，
+    获取失败（如离线）时退回到旧快照或内置目录。快照已过期时直接使用旧快照，
+    同时在后台更新，离线时不会等待联网超时。offline为True时从不联网。
+    """
+    log = log or (lambda message, level="INFO": None)
+    path = catalog_path(cache_dir)
+    catalog = VoiceCatalog.load(path)
+    if not offline and not refresh and catalog is not None and catalog.is_stale(ttl):
+        log("语音列表快照已过期，先使用快照并在后台更新（--refresh 可等待在线获取）", "WARNING")
+        refresh_in_background(path, log)
+    elif not offline and (refresh or catalog is None):
+        import asyncio
+        try:
+            catalog = asyncio.run(fetch_catalog())
+        except Exception as e:
+            log(f"获取在线语音列表失败，使用{'本地快照' if catalog else '内置列表'}: {e}", "WARNING")
+        else:
+            save_catalog(catalog, path, log)
+    if catalog is None:
+        catalog = VoiceCatalog.builtin()
+    set_catalog(catalog)
+    return catalog
+
+
+def save_catalog(catalog, path, log=None):
+    """写出快照，失败时只记录警告"""
+    try:
+        catalog.save(path)
+    except OSError as e:
+        if log is not None:
+            log(f"保存语音列表快照失败: {path}: {e}", "WARNING")
+
+
+_catalog = None
+
+
+def get_catalog():
+    """当前使用的语音目录，未加载时为内置目录"""
+    global _catalog
+    if _catalog is None:
+        _catalog = VoiceCatalog.builtin()
+    return _catalog
+
+
+def set_catalog(catalog):
+    global _catalog
+    _catalog = catalog
+
+
+def get_voice_suffix(voice_id):
+    """获取语音ID对应的英文文件名后缀"""
+    return get_catalog().suffix(voice_id)
+
+
+def get_output_filename(input_file, voice_id, extension="mp3"):
+    """根据规则生成输出文件名：[原文件名]_[英文语音名].[扩展名]"""
+    # 获取原文件名（不含扩展名）
+    base_name = os.path.splitext(os.path.basename(input_file))[0]
+    return f"{base_name}_{get_voice_suffix(voice_id)}.{extension}"
+
+
+def resolve_voice(name):
+    """把显示名称、语音ID或英文短名（如Xiaoxiao）解析为语音ID"""
+    return get_catalog().resolve(name)
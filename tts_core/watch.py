@@ -0,0 +1,179 @@
+"""监视文件夹
+
+定期扫描文件夹，发现新增或修改过的文本文件后自动转换。
+文件在一段时间内大小和修改时间都不再变化才会转换，避免处理尚未写完的文件；
+内容未变的文件和分段由任务清单和合成缓存跳过，只有变化的部分会重新合成。
+
+扫描只记录每个文件的大小和修改时间，常驻内存与文件夹中的文件数成正比，与文件大小无关。
+"""
+import fnmatch
+import os
+import time
+
+from .converter import TextToSpeechConverter
+from .loop import LoopThread
+
+# 默认的扫描间隔与文件稳定等待时间（秒）
+DEFAULT_POLL_INTERVAL = 2.0
+DEFAULT_SETTLE_TIME = 3.0
+# 转换失败的文件多久后重试（秒）
+DEFAULT_RETRY_DELAY = 60.0
+
+DEFAULT_PATTERNS = ("*.txt",)
+
+
+class FolderWatcher:
+    """扫描文件夹，返回新增或修改后已稳定的文件"""
+
+    def __init__(self, folder, patterns=DEFAULT_PATTERNS, recursive=False,
+                 settle_time=DEFAULT_SETTLE_TIME):
+        self.folder = folder
+        self.patterns = tuple(patterns)
+        self.recursive = recursive
+        self.settle_time = settle_time
+        # 已处理的文件：路径 -> (大小, 修改时间)
+        self._known = {}
+        # 有变化、等待稳定的文件：路径 -> ((大小, 修改时间), 最后一次变化的时间)
+        self._changing = {}
+        # 延后重试的文件：路径 -> 重试时间
+        self._deferred = {}
+
+    def _matches(self, name):
+        return any(fnmatch.fnmatch(name, pattern) for pattern in self.patterns)
+
+    def _scan_dir(self, path, found):
+        try:
+            entries = list(os.scandir(path))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if self.recursive and not entry.name.startswith("."):
+                        self._scan_dir(entry.path, found)
+                elif entry.is_file() and self._matches(entry.name):
+                    stat = entry.stat()
+                    found[entry.path] = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                continue
+
+    def scan(self):
+        """返回当前匹配的文件：路径 -> (大小, 修改时间)"""
+        found = {}
+        self._scan_dir(self.folder, found)
+        return found
+
+    def mark_known(self, paths, snapshot=None):
+        """把文件记为已处理，之后只有再次修改才会返回"""
+        if snapshot is None:
+            snapshot = self.scan()
+        for path in paths:
+            if path in snapshot:
+                self._known[path] = snapshot[path]
+            self._deferred.pop(path, None)
+
+    def defer(self, path, delay):
+        """delay秒后再次返回该文件（用于失败重试）"""
+        self._deferred[path] = time.monotonic() + delay
+
+    def poll(self):
+        """扫描一次，返回已稳定、需要转换的文件列表"""
+        now = time.monotonic()
+        snapshot = self.scan()
+        ready = []
+
+        # 已删除的文件不再跟踪
+        for table in (self._known, self._changing, self._deferred):
+            for path in [path for path in table if path not in snapshot]:
+                del table[path]
+
+        for path, signature in snapshot.items():
+            retry_at = self._deferred.get(path)
+            if retry_at is not None:
+                if now >= retry_at and self._known.get(path) == signature:
+                    del self._deferred[path]
+                    ready.append(path)
+                    continue
+                if self._known.get(path) == signature:
+                    continue
+            elif self._known.get(path) == signature:
+                continue
+
+            previous = self._changing.get(path)
+            if previous is None or previous[0] != signature:
+                # 新文件或仍在写入：重新开始计时
+                self._changing[path] = (signature, now)
+            elif now - previous[1] >= self.settle_time:
+                del self._changing[path]
+                self._known[path] = signature
+                self._deferred.pop(path, None)
+                ready.append(path)
+        return sorted(ready)
+
+    def __len__(self):
+        return len(self._known) + len(self._changing)
+
+
+class WatchService:
+    """监视文件夹并自动转换的常驻服务"""
+
+    def __init__(self, folder, output_dir, converter_options=None, patterns=DEFAULT_PATTERNS,
+                 recursive=False, poll_interval=DEFAULT_POLL_INTERVAL,
+                 settle_time=DEFAULT_SETTLE_TIME, retry_delay=DEFAULT_RETRY_DELAY,
+                 skip_existing=False, log=None):
+        self.output_dir = output_dir
+        # 每批新建TextToSpeechConverter时使用的参数（语音、并发、缓存等）
+        self.converter_options = dict(converter_options or {})
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.log = log or (lambda message, level="INFO": None)
+        self.watcher = FolderWatcher(folder, patterns, recursive, settle_time)
+        if skip_existing:
+            # 只处理启动之后新增或修改的文件
+            snapshot = self.watcher.scan()
+            self.watcher.mark_known(snapshot, snapshot)
+
+        # 运行期间所有批次共用一个常驻事件循环
+        self.loop_thread = None
+
+        self.batches = 0
+        self.converted = 0
+        self.failed = 0
+
+    def convert(self, input_files):
+        """转换一批文件，失败的文件稍后重试"""
+        self.batches += 1
+        self.log(f"检测到 {len(input_files)} 个新增或修改的文件，开始转换")
+        # 每批新建转换器，已分配的输出文件名等状态不会随运行时间累积
+        converter = TextToSpeechConverter(self.output_dir, log=self.log, **self.converter_options)
+        results = converter.run_batch(input_files, loop_thread=self.loop_thread)
+        for input_file, success in zip(input_files, results):
+            if success:
+                self.converted += 1
+            else:
+                self.failed += 1
+                self.watcher.defer(input_file, self.retry_delay)
+                self.log(f"转换失败，{self.retry_delay:.0f}秒后重试: {os.path.basename(input_file)}",
+                         "WARNING")
+        return results
+
+    def run_once(self):
+        """扫描一次并转换已稳定的文件，返回转换的文件数"""
+        ready = self.watcher.poll()
+        if ready:
+            self.convert(ready)
+        return len(ready)
+
+    def run(self, should_continue=None):
+        """持续监视，直到should_continue()返回False"""
+        self.log(f"开始监视: {self.watcher.folder}（{', '.join(self.watcher.patterns)}），"
+                 f"输出到: {self.output_dir}")
+        self.loop_thread = LoopThread()
+        try:
+            while should_continue is None or should_continue():
+                if not self.run_once():
+                    time.sleep(self.poll_interval)
+        finally:
+            self.loop_thread.stop()
+            self.loop_thread = None
+        self.log(f"停止监视: 共 {self.batches} 批，转换 {self.converted} 个文件，失败 {self.failed} 个")